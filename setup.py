@@ -5,18 +5,26 @@ from setuptools import setup, find_packages
 setup(
     name="medical_ai_xinhe",  # 项目名（必须唯一）
     version="0.1.0",    # 版本号（企业必填）
-    packages=find_packages(),  # 自动发现所有Python模块
+    package_dir={"": "src"},  # 代码在 src/ 下（src 布局）
+    packages=find_packages("src"),  # 自动发现 scripts / aitools 包
     install_requires=[      
         "requests==2.32.5",   # 指定精确版本（避免依赖冲突）
         "pandas==2.3.2",      # 用==锁定版本（生产环境必须）
+        "numpy==2.3.2",       # 向量库、索引、去重等直接使用（不只是 pandas 的间接依赖）
         "python-dotenv",      # 后续会用于管理API密钥
         "beautifulsoup4==4.13.5",
         "lxml==6.0.1",         # 医药XML解析必备（处理NLM DTD）
         "tqdm==4.67.1"
     ],
+    extras_require={  # 可选依赖：pip install medical_ai_xinhe[parquet]
+        "parquet": ["pyarrow==21.0.0"],  # 列式存储（Parquet/Arrow）
+        "embedding": ["sentence-transformers==5.1.0"],  # 本地向量化
+        "extraction": ["langextract==1.0.9"],  # 批量实体抽取
+    },
     entry_points={  # 生成可执行命令
         "console_scripts": [
-            "medical-crawler=scripts.crawler:main"  # 定义命令：medical-crawler
+            "medical-crawler=scripts.crawler:main",  # 定义命令：medical-crawler
+            "medical-ai=scripts.cli:main",  # 统一入口：medical-ai <子命令>（依赖按子命令懒加载）
         ]
     },
     author="Axel",
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from aitools.extraction_report import JsonlWriter
+
+# ===== 批量抽取配置 =====
+BATCH_EXTRACT_CONFIG = {
+    "WORKERS": 4,           # 并发请求数；Ollama 需相应设置 OLLAMA_NUM_PARALLEL
+    "QUEUE_FACTOR": 2,      # 在途文档数 = WORKERS × 2，保证模型服务端始终有请求排队
+    "CACHE_PATH": "data/extraction_cache.sqlite",
+    "OUTPUT": "data/extractions.jsonl",
+}
+
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key      TEXT PRIMARY KEY,   -- hash(文本, 提示词, 示例, 模型, 温度)
+    document TEXT NOT NULL       -- AnnotatedDocument 的 JSON（不含 document_id）
+);
+"""
+
+
+def _examples_fingerprint(examples) -> str:
+    """示例数据的稳定序列化（示例一改，缓存即失效）"""
+    return json.dumps([dataclasses.asdict(e) if dataclasses.is_dataclass(e) else e for e in examples],
+                      ensure_ascii=False, sort_keys=True, default=str)
+
+
+def cache_key(text: str, prompt: str, examples, model_id: str, temperature: float) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (text, prompt, _examples_fingerprint(examples), model_id, repr(temperature)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """已完成抽取结果的持久化缓存（SQLite），重跑时跳过已处理的文档"""
+
+    def __init__(self, path: str = BATCH_EXTRACT_CONFIG["CACHE_PATH"]):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_CACHE_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def get(self, key: str) -> Optional[dict]:
+        found = self.conn.execute("SELECT document FROM extractions WHERE key = ?", (key,)).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def put(self, key: str, document: dict):
+        self.conn.execute("INSERT OR REPLACE INTO extractions (key, document) VALUES (?, ?)",
+                          (key, json.dumps(document, ensure_ascii=False)))
+
+
+def _document_text(record: dict) -> str:
+    return f"{record['title']}\n{record['abstract']}".strip()
+
+
+def extract_corpus(records: Iterable[dict], output_path: str, extract_fn: Callable[[str], dict],
+                   cache: ExtractionCache, key_fn: Callable[[str], str],
+                   workers: int = BATCH_EXTRACT_CONFIG["WORKERS"], progress: bool = True) -> dict:
+    """并发抽取整个语料，结果按完成顺序逐行写入 JSONL
+
+    extract_fn(text) 返回 langextract 的文档字典（extractions/text）；
+    命中缓存的文档直接写出，不再请求模型。
+    """
+    from tqdm import tqdm
+    stats = {"documents": 0, "cached": 0, "extracted": 0, "failed": 0}
+    start = time.perf_counter()
+    max_in_flight = workers * BATCH_EXTRACT_CONFIG["QUEUE_FACTOR"]
+    in_flight = {}
+
+    with JsonlWriter(output_path) as writer, \
+            ThreadPoolExecutor(max_workers=workers) as pool, \
+            tqdm(desc="抽取", unit="doc", disable=not progress) as bar:
+
+        def emit(pmid: str, document: dict):
+            writer.write({**document, "document_id": f"pmid_{pmid}"})  # 逐行落盘：中断时已完成的结果不丢失
+            bar.update(1)
+
+        def collect(done):
+            for future in done:
+                pmid, key = in_flight.pop(future)
+                try:
+                    document = future.result()
+                except Exception as exc:
+                    stats["failed"] += 1
+                    bar.write(f"❌ PMID {pmid} 抽取失败: {exc!r}")
+                    continue
+                cache.put(key, document)
+                cache.conn.commit()
+                stats["extracted"] += 1
+                emit(pmid, document)
+
+        for record in records:
+            text = _document_text(record)
+            if not text:
+                continue
+            stats["documents"] += 1
+            key = key_fn(text)
+            cached = cache.get(key)
+            if cached is not None:
+                stats["cached"] += 1
+                emit(record["pmid"], cached)
+                continue
+            if len(in_flight) >= max_in_flight:
+                collect(wait(in_flight, return_when=FIRST_COMPLETED)[0])
+            in_flight[pool.submit(extract_fn, text)] = (record["pmid"], key)
+        collect(wait(in_flight)[0])
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def langextract_fn(model_id: str, model_url: str, temperature: float) -> Callable[[str], dict]:
+    """基于 langextract_about 的提示词与示例构造抽取函数"""
+    from langextract import data_lib
+    from aitools.langextract_about import extract_medications
+
+    def extract(text: str) -> dict:
+        result = extract_medications(text, model_id, model_url, temperature)
+        document = data_lib.annotated_document_to_dict(result)
+        document.pop("document_id", None)  # 由驱动按 PMID 指定
+        return document
+    return extract
+
+
+def main(argv: Optional[List[str]] = None):
+    from scripts.metrics import add_metrics_arguments, run_metrics
+
+    parser = argparse.ArgumentParser(description="langextract 批量抽取（并发队列 + 持久化缓存 + JSONL 流式输出）")
+    parser.add_argument("dataset", help="解析产物：.xml.gz / CSV / Parquet 数据集 / PMID 索引 .sqlite")
+    parser.add_argument("--output", default=BATCH_EXTRACT_CONFIG["OUTPUT"])
+    parser.add_argument("--cache", default=BATCH_EXTRACT_CONFIG["CACHE_PATH"])
+    parser.add_argument("--workers", type=int, default=BATCH_EXTRACT_CONFIG["WORKERS"])
+    parser.add_argument("--model-id", default=None)
+    parser.add_argument("--model-url", default=None)
+    parser.add_argument("--temperature", type=float, default=None)
+    parser.add_argument("--max-records", type=int, default=None)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from aitools.langextract_about import EXTRACT_CONFIG, examples, prompt_description
+    from scripts.dataset import iter_dataset
+
+    model_id = args.model_id or EXTRACT_CONFIG["MODEL_ID"]
+    model_url = args.model_url or EXTRACT_CONFIG["MODEL_URL"]
+    temperature = EXTRACT_CONFIG["TEMPERATURE"] if args.temperature is None else args.temperature
+
+    with run_metrics("batch_extract", args.metrics, args.profile) as metrics, ExtractionCache(args.cache) as cache:
+        with metrics.stage("extract"):
+            stats = extract_corpus(
+                metrics.track("read", iter_dataset(args.dataset, args.max_records)), args.output,
+                langextract_fn(model_id, model_url, temperature), cache,
+                lambda text: cache_key(text, prompt_description, examples, model_id, temperature),
+                args.workers)
+        metrics.count("extract", records=stats["documents"])
+        metrics.extra["extraction"] = stats
+        print(f"✅ 抽取完成: {stats['documents']} 篇（缓存命中 {stats['cached']}，新抽取 {stats['extracted']}，"
+              f"失败 {stats['failed']}），耗时 {stats['seconds']:.1f}s → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, List, Optional
+
+from aitools.upsert import TransientError, is_transient
+
+# numpy / requests 在用到时再导入，`medical-ai embed-dashscope --help` 不加载
+if TYPE_CHECKING:
+    import numpy as np
+
+# ===== DashScope 向量化配置 =====
+DASHSCOPE_CONFIG = {
+    "BASE_URL": "https://dashscope.aliyuncs.com",  # 可改为本地假服务或其他地域的入口
+    "ENDPOINT": "/api/v1/services/embeddings/multimodal-embedding/multimodal-embedding",
+    "MODEL": "multimodal-embedding-v1",
+    "DIM": 1024,
+    "BATCH_SIZE": 20,        # 每个请求的 contents 条数（接口上限）
+    "CONCURRENCY": 8,
+    "RPS": 10.0,             # 令牌桶：每秒请求数
+    "BURST": 10,             # 令牌桶容量
+    "MAX_RETRIES": 6,
+    "BACKOFF_BASE": 1.0,
+    "BACKOFF_MAX": 60.0,
+    "TIMEOUT": 60,
+}
+
+
+class TokenBucket:
+    """线程安全的令牌桶：rate 个/秒匀速补充，最多积攒 capacity 个"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After：秒数或 HTTP 日期（RFC 9110），无法解析时返回 None（改用指数退避）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class UsageTracker:
+    """累计接口返回的 usage，用于核算每千篇文档的 token 与费用"""
+
+    def __init__(self, price_per_1k_tokens: float = 0.0):
+        self.price_per_1k_tokens = price_per_1k_tokens
+        self._lock = threading.Lock()
+        self.requests = self.documents = self.input_tokens = self.retries = 0
+
+    def add(self, documents: int, usage: dict):
+        with self._lock:
+            self.requests += 1
+            self.documents += documents
+            self.input_tokens += int(usage.get("input_tokens", 0))
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def summary(self) -> dict:
+        per_1k = 1000 / self.documents if self.documents else 0.0
+        tokens_per_1k = self.input_tokens * per_1k
+        return {"requests": self.requests, "documents": self.documents, "input_tokens": self.input_tokens,
+                "retries": self.retries, "tokens_per_1k_docs": tokens_per_1k,
+                "cost_per_1k_docs": tokens_per_1k / 1000 * self.price_per_1k_tokens}
+
+
+class DashScopeEncoder:
+    """DashScope 多模态向量接口的批量客户端
+
+    encode(texts) 把文本按 BATCH_SIZE 打包，在令牌桶限速下并发请求，结果按输入顺序返回（已 L2 归一化），
+    可直接作为 embed_records 的 encode 参数，写入与本地模型相同的 EmbeddingStore。
+    """
+
+    def __init__(self, api_key: Optional[str] = None, model: str = DASHSCOPE_CONFIG["MODEL"],
+                 base_url: str = DASHSCOPE_CONFIG["BASE_URL"], batch_size: int = DASHSCOPE_CONFIG["BATCH_SIZE"],
+                 concurrency: int = DASHSCOPE_CONFIG["CONCURRENCY"], rps: float = DASHSCOPE_CONFIG["RPS"],
+                 burst: Optional[float] = DASHSCOPE_CONFIG["BURST"], dim: int = DASHSCOPE_CONFIG["DIM"],
+                 price_per_1k_tokens: float = 0.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.api_key = api_key or os.environ.get("DASHSCOPE_API_KEY", "")
+        self.model = model
+        self.model_name = f"dashscope:{model}"  # EmbeddingStore 用它区分不同来源的向量
+        self.url = base_url.rstrip("/") + DASHSCOPE_CONFIG["ENDPOINT"]
+        self.batch_size = batch_size
+        self.dim = dim
+        self.bucket = TokenBucket(rps, burst)
+        self.usage = UsageTracker(price_per_1k_tokens)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def _post(self, texts: List[str]) -> dict:
+        self.bucket.acquire()
+        response = self.session.post(
+            self.url, timeout=DASHSCOPE_CONFIG["TIMEOUT"],
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            json={"model": self.model, "input": {"contents": [{"text": t} for t in texts]}})
+        if response.status_code == 429 or response.status_code >= 500:
+            error = TransientError(f"{response.status_code} {response.text[:200]}")
+            error.retry_after = response.headers.get("Retry-After")
+            raise error
+        if response.status_code != 200:
+            raise RuntimeError(f"DashScope 请求失败 {response.status_code}: {response.text[:500]}")
+        return response.json()
+
+    def _embed_batch(self, texts: List[str]) -> "np.ndarray":
+        """单个请求：限流 / 5xx / 网络错误按指数退避 + 抖动重试；Retry-After 作为最短等待时间"""
+        import numpy as np
+        import requests
+        for attempt in range(DASHSCOPE_CONFIG["MAX_RETRIES"] + 1):
+            try:
+                body = self._post(texts)
+                break
+            except (TransientError, requests.RequestException) as exc:
+                if attempt == DASHSCOPE_CONFIG["MAX_RETRIES"] or not is_transient(exc):
+                    raise
+                self.usage.add_retry()
+                backoff = min(DASHSCOPE_CONFIG["BACKOFF_MAX"], DASHSCOPE_CONFIG["BACKOFF_BASE"] * 2 ** attempt)
+                backoff *= random.uniform(0.5, 1.0)
+                retry_after = retry_after_seconds(getattr(exc, "retry_after", None))
+                time.sleep(backoff if retry_after is None else max(retry_after, backoff))
+
+        embeddings = sorted(body["output"]["embeddings"], key=lambda e: e["index"])
+        if len(embeddings) != len(texts):
+            raise RuntimeError(f"返回 {len(embeddings)} 条向量，请求了 {len(texts)} 条")
+        self.usage.add(len(texts), body.get("usage") or {})
+        vectors = np.asarray([e["embedding"] for e in embeddings], dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.concatenate(list(self.pool.map(self._embed_batch, batches)))
+
+    def close(self):
+        self.pool.shutdown()
+        self.session.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    from scripts.metrics import add_metrics_arguments, run_metrics
+
+    parser = argparse.ArgumentParser(description="DashScope 多模态向量接口批量向量化（令牌桶限流 + 重试 + 用量统计）")
+    parser.add_argument("dataset", help="解析产物：.xml.gz / CSV / Parquet 数据集 / PMID 索引 .sqlite")
+    parser.add_argument("--store", default="data/embeddings_dashscope", help="EmbeddingStore 目录")
+    parser.add_argument("--base-url", default=DASHSCOPE_CONFIG["BASE_URL"])
+    parser.add_argument("--model", default=DASHSCOPE_CONFIG["MODEL"])
+    parser.add_argument("--dim", type=int, default=DASHSCOPE_CONFIG["DIM"])
+    parser.add_argument("--batch-size", type=int, default=DASHSCOPE_CONFIG["BATCH_SIZE"])
+    parser.add_argument("--concurrency", type=int, default=DASHSCOPE_CONFIG["CONCURRENCY"])
+    parser.add_argument("--rps", type=float, default=DASHSCOPE_CONFIG["RPS"], help="每秒请求数上限")
+    parser.add_argument("--price-per-1k-tokens", type=float, default=0.0, help="单价（元/千 token），用于估算费用")
+    parser.add_argument("--max-records", type=int, default=None)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from aitools.embedding import EmbeddingStore, embed_records
+    from scripts.dataset import iter_dataset
+
+    encoder = DashScopeEncoder(model=args.model, base_url=args.base_url, batch_size=args.batch_size,
+                               concurrency=args.concurrency, rps=args.rps, dim=args.dim,
+                               price_per_1k_tokens=args.price_per_1k_tokens)
+    with run_metrics("dashscope_embed", args.metrics, args.profile) as metrics:
+        try:
+            with EmbeddingStore(args.store, encoder.model_name, encoder.dim) as store, metrics.stage("embed"):
+                stats = embed_records(metrics.track("read", iter_dataset(args.dataset, args.max_records)), store,
+                                      metrics.timed("encode", encoder.encode))
+            metrics.count("embed", records=stats["records"])
+        finally:
+            encoder.close()
+        usage = encoder.usage.summary()
+        metrics.extra["usage"] = usage
+        print(f"✅ 向量化完成: 新编码 {stats['encoded']}，复用 {stats['copied']}，未变 {stats['unchanged']}，"
+              f"耗时 {stats['seconds']:.1f}s → {args.store}")
+        print(f"💰 请求 {usage['requests']} 次（重试 {usage['retries']}），输入 {usage['input_tokens']} token，"
+              f"每千篇 {usage['tokens_per_1k_docs']:.0f} token ≈ {usage['cost_per_1k_docs']:.4f} 元")
+
+
+if __name__ == "__main__":
+    main()
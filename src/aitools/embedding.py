@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional
+
+# numpy 在函数内导入：upsert / query 在解析参数前就要读 EMBED_CONFIG
+if TYPE_CHECKING:
+    import numpy as np
+
+# ===== 向量化配置 =====
+EMBED_CONFIG = {
+    "MODEL": "all-MiniLM-L6-v2",   # 与 Pinecone 示例相同（384 维）
+    "BATCH_SIZE": 256,             # 模型每次前向的文本数
+    "READ_BATCH": 8192,            # 每次从数据集读取并查缓存的记录数
+    "DTYPE": "float32",            # 可选 float16，磁盘与内存减半
+    "STORE_DIR": "data/embeddings",
+}
+
+_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    pmid         INTEGER PRIMARY KEY,
+    row          INTEGER NOT NULL UNIQUE,   -- 在向量矩阵中的行号
+    content_hash BLOB    NOT NULL           -- hash(模型, 文本)：文本不变则不再编码
+);
+CREATE INDEX IF NOT EXISTS idx_rows_hash ON rows(content_hash);
+"""
+
+
+def record_text(record: dict) -> str:
+    """参与向量化的文本：标题 + 摘要"""
+    return f"{record['title']}\n{record['abstract']}".strip()
+
+
+class EmbeddingStore:
+    """与 PMID 对齐的内存映射向量矩阵
+
+    目录结构：
+      vectors.bin  (capacity × dim) float32/float16 原始矩阵，np.memmap 打开
+      pmids.bin    (capacity,) int64，第 i 行向量对应的 PMID（已删除为 -1）
+      rows.sqlite  PMID → 行号 / 内容哈希（缓存）
+      meta.json    模型名、维度、dtype、已用行数
+    """
+
+    def __init__(self, directory: str = EMBED_CONFIG["STORE_DIR"], model_name: Optional[str] = None,
+                 dim: Optional[int] = None, dtype: str = EMBED_CONFIG["DTYPE"]):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta_path = self.dir / "meta.json"
+        if meta_path.exists():
+            self.meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if model_name and model_name != self.meta["model"]:
+                raise ValueError(f"向量库由 {self.meta['model']} 生成，不能混入 {model_name} 的向量")
+        else:
+            if not (model_name and dim):
+                raise ValueError(f"新建向量库需要 model_name 与 dim: {self.dir}")
+            self.meta = {"model": model_name, "dim": dim, "dtype": dtype, "count": 0, "capacity": 0}
+        self.conn = sqlite3.connect(self.dir / "rows.sqlite")
+        self.conn.executescript(_STORE_SCHEMA)
+        self._map(self.meta["capacity"])
+
+    # ----- 矩阵管理 -----
+    @property
+    def dim(self) -> int:
+        return self.meta["dim"]
+
+    def _map(self, capacity: int):
+        """按容量映射文件（文件不存在或容量为 0 时不映射）"""
+        import numpy as np
+        self.meta["capacity"] = capacity
+        if capacity == 0:
+            self._vectors = np.zeros((0, self.dim), dtype=self.meta["dtype"])
+            self._pmids = np.zeros(0, dtype=np.int64)
+            return
+        self._vectors = np.memmap(self.dir / "vectors.bin", dtype=self.meta["dtype"], mode="r+",
+                                  shape=(capacity, self.dim))
+        self._pmids = np.memmap(self.dir / "pmids.bin", dtype=np.int64, mode="r+", shape=(capacity,))
+
+    def _reserve(self, count: int):
+        """容量不足时按倍数扩容（文件截断扩展 + 重新映射，已有数据不复制）"""
+        import numpy as np
+        if count <= self.meta["capacity"]:
+            return
+        capacity = max(count, self.meta["capacity"] * 2, 1024)
+        self.flush()
+        itemsize = np.dtype(self.meta["dtype"]).itemsize
+        for name, size in (("vectors.bin", capacity * self.dim * itemsize), ("pmids.bin", capacity * 8)):
+            with open(self.dir / name, "ab") as f:
+                f.truncate(size)
+        self._map(capacity)
+
+    def flush(self):
+        import numpy as np
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+            self._pmids.flush()
+        self.conn.commit()
+        (self.dir / "meta.json").write_text(json.dumps(self.meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----- 读取 -----
+    @property
+    def vectors(self) -> "np.ndarray":
+        """已用部分的向量矩阵（memmap 视图，不复制）"""
+        return self._vectors[:self.meta["count"]]
+
+    @property
+    def pmids(self) -> "np.ndarray":
+        return self._pmids[:self.meta["count"]]
+
+    def row_of(self, pmid: int) -> Optional[int]:
+        found = self.conn.execute("SELECT row FROM rows WHERE pmid = ?", (pmid,)).fetchone()
+        return found[0] if found else None
+
+    # ----- 写入 -----
+    def content_hash(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.meta['model']}\x1f{text}".encode("utf-8"), digest_size=16).digest()
+
+    def plan(self, items: List[tuple]) -> tuple:
+        """items 为 [(pmid, hash)]；返回 (需要编码的下标, 可复制已有向量的 [(下标, 源行)])"""
+        existing = {}
+        for i in range(0, len(items), 900):  # SQLite 单条语句变量上限
+            chunk = [pmid for pmid, _ in items[i:i + 900]]
+            rows = self.conn.execute(
+                f"SELECT pmid, content_hash FROM rows WHERE pmid IN ({','.join('?' * len(chunk))})", chunk)
+            existing.update(rows)
+
+        changed = [i for i, (pmid, digest) in enumerate(items) if existing.get(pmid) != digest]  # 内容未变的跳过
+        digests = list({items[i][1] for i in changed})
+        sources = {}
+        for i in range(0, len(digests), 900):
+            chunk = digests[i:i + 900]
+            rows = self.conn.execute(
+                f"SELECT content_hash, MIN(row) FROM rows WHERE content_hash IN ({','.join('?' * len(chunk))})"
+                " GROUP BY content_hash", chunk)
+            sources.update(rows)
+
+        to_encode, to_copy = [], []
+        for i in changed:
+            source = sources.get(items[i][1])
+            if source is not None:
+                to_copy.append((i, source))  # 其他 PMID 有相同文本：直接复制向量
+            else:
+                to_encode.append(i)
+        return to_encode, to_copy
+
+    def put(self, pmid: int, digest: bytes, vector: "np.ndarray"):
+        """写入/覆盖一条向量：已有 PMID 原位覆盖，新 PMID 追加到末尾"""
+        row = self.row_of(pmid)
+        if row is None:
+            row = self.meta["count"]
+            self._reserve(row + 1)
+            self.meta["count"] = row + 1
+            self.conn.execute("INSERT INTO rows (pmid, row, content_hash) VALUES (?, ?, ?)", (pmid, row, digest))
+        else:
+            self.conn.execute("UPDATE rows SET content_hash = ? WHERE pmid = ?", (digest, pmid))
+        self._vectors[row] = vector
+        self._pmids[row] = pmid
+
+    def delete(self, pmid: int):
+        """删除 PMID：行保留但向量清零、PMID 置 -1（下游索引据此跳过）"""
+        row = self.row_of(pmid)
+        if row is not None:
+            self._vectors[row] = 0
+            self._pmids[row] = -1
+            self.conn.execute("DELETE FROM rows WHERE pmid = ?", (pmid,))
+
+
+class Encoder:
+    """SentenceTransformer 封装：模型只加载一次；workers > 1 时使用多进程池占满所有核"""
+
+    def __init__(self, model_name: str = EMBED_CONFIG["MODEL"], batch_size: int = EMBED_CONFIG["BATCH_SIZE"],
+                 workers: int = 1):
+        from sentence_transformers import SentenceTransformer
+        import torch
+
+        torch.set_num_threads(os.cpu_count() or 1)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.pool = self.model.start_multi_process_pool(["cpu"] * workers) if workers > 1 else None
+
+    def encode(self, texts: List[str]) -> "np.ndarray":
+        # 归一化后内积即余弦相似度，便于后续向量索引
+        import numpy as np
+        if self.pool is not None:
+            vectors = self.model.encode_multi_process(texts, self.pool, batch_size=self.batch_size,
+                                                      normalize_embeddings=True)
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                        normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+
+def embed_records(records: Iterable[dict], store: EmbeddingStore, encode: Callable[[List[str]], "np.ndarray"],
+                  read_batch: int = EMBED_CONFIG["READ_BATCH"], text_fn: Callable[[dict], str] = record_text) -> dict:
+    """流式向量化：按批查内容哈希缓存，只编码新增或变化的文本"""
+    import numpy as np
+    stats = {"records": 0, "encoded": 0, "copied": 0, "unchanged": 0, "deleted": 0}
+    records = iter(records)
+    start = time.perf_counter()
+    while True:
+        batch = list(islice(records, read_batch))
+        if not batch:
+            break
+        stats["records"] += len(batch)
+
+        live = []
+        for record in batch:
+            if not str(record["pmid"]).isdigit():
+                continue
+            if record.get("deleted"):  # 来自 PmidIndex.changed_since 的删除事件
+                store.delete(int(record["pmid"]))
+                stats["deleted"] += 1
+            else:
+                live.append(record)
+
+        texts = [text_fn(r) for r in live]
+        items = [(int(r["pmid"]), store.content_hash(t)) for r, t in zip(live, texts)]
+        to_encode, to_copy = store.plan(items)
+
+        # 先取出待复制的源向量：源行可能属于本批内容已变的 PMID，写入新向量后再读就错了
+        copies = np.array(store.vectors[[row for _, row in to_copy]])
+        unique = {}
+        for i in to_encode:
+            unique.setdefault(items[i][1], i)  # 同一批内重复的文本只编码一次
+        if unique:
+            vectors = dict(zip(unique, encode([texts[i] for i in unique.values()])))
+            for i in to_encode:
+                store.put(*items[i], vectors[items[i][1]])
+        for (i, _), vector in zip(to_copy, copies):
+            store.put(*items[i], vector)
+        stats["encoded"] += len(unique)
+        stats["copied"] += len(to_copy) + len(to_encode) - len(unique)
+        stats["unchanged"] += len(items) - len(to_encode) - len(to_copy)
+        store.flush()  # 每批落盘，中断后重跑只需补齐剩余部分
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    from scripts.dataset import iter_dataset
+    from scripts.metrics import add_metrics_arguments, run_metrics
+
+    parser = argparse.ArgumentParser(description="摘要批量向量化（内存映射矩阵 + 内容哈希缓存）")
+    parser.add_argument("dataset", help="解析产物：.xml.gz / CSV / Parquet 数据集 / PMID 索引 .sqlite")
+    parser.add_argument("--store", default=EMBED_CONFIG["STORE_DIR"], help="向量库目录")
+    parser.add_argument("--model", default=EMBED_CONFIG["MODEL"])
+    parser.add_argument("--batch-size", type=int, default=EMBED_CONFIG["BATCH_SIZE"])
+    parser.add_argument("--workers", type=int, default=1, help="编码进程数（>1 时启用多进程池）")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=EMBED_CONFIG["DTYPE"])
+    parser.add_argument("--max-records", type=int, default=None)
+    parser.add_argument("--skip-duplicates", default=None, help="scripts.dedup 输出的重复列表 CSV，跳过其中的 PMID")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with run_metrics("embedding", args.metrics, args.profile) as metrics:
+        records = iter_dataset(args.dataset, args.max_records)
+        if args.skip_duplicates:
+            from scripts.dedup import iter_unique, load_duplicates
+            records = iter_unique(records, load_duplicates(args.skip_duplicates))
+
+        with metrics.stage("load_model"):
+            encoder = Encoder(args.model, args.batch_size, args.workers)
+        try:
+            with EmbeddingStore(args.store, encoder.model_name, encoder.dim, args.dtype) as store:
+                # embed 含 read 与 encode；两者之差即查缓存与写 memmap 的开销
+                with metrics.stage("embed"):
+                    stats = embed_records(metrics.track("read", records), store,
+                                          metrics.timed("encode", encoder.encode))
+                metrics.count("embed", records=stats["records"])
+        finally:
+            encoder.close()
+        print(f"✅ 向量化完成: 新编码 {stats['encoded']}，复用 {stats['copied']}，未变 {stats['unchanged']}，"
+              f"删除 {stats['deleted']}，耗时 {stats['seconds']:.1f}s → {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import html
+import json
+from collections import Counter, defaultdict
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+# ===== 抽取结果输出配置 =====
+REPORT_CONFIG = {
+    "HTML_DIR": "data/extraction_html",
+    "PAGE_SIZE": 200,      # 每个 HTML 分页的文档数（单页保持在几 MB 以内）
+    "TOP_GROUPS": 20,
+}
+
+_PALETTE = ["#ffd54f", "#81c784", "#64b5f6", "#e57373", "#ba68c8", "#4db6ac", "#ff8a65", "#a1887f"]
+
+
+class JsonlWriter:
+    """逐文档追加写入 JSONL（每行 flush），内存中不保留已写出的结果"""
+
+    def __init__(self, path: str, append: bool = False):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._f = open(path, "a" if append else "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, document: dict):
+        self._f.write(json.dumps(document, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.count += 1
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_documents(path: str) -> Iterator[dict]:
+    """流式读取 JSONL（langextract 的 AnnotatedDocument 字典），跳过空行"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def medication_groups(extractions: Iterable[dict]) -> dict:
+    """按 medication_group 属性分组；缺少该属性的抽取归到 None 组"""
+    groups = defaultdict(list)
+    for extraction in extractions:
+        attributes = extraction.get("attributes") or {}
+        groups[attributes.get("medication_group")].append(extraction)
+    return groups
+
+
+def aggregate_groups(documents: Iterable[dict]) -> dict:
+    """在文档流上汇总：每个药物组出现的文档数、各类抽取数；内存只与不同药物组的数量有关"""
+    group_docs, class_counts, stats = Counter(), Counter(), {"documents": 0, "ungrouped": 0}
+    for document in documents:
+        stats["documents"] += 1
+        groups = medication_groups(document.get("extractions") or [])
+        stats["ungrouped"] += len(groups.pop(None, []))
+        group_docs.update(groups.keys())
+        for extractions in groups.values():
+            class_counts.update(e["extraction_class"] for e in extractions)
+    return {**stats, "groups": group_docs, "classes": class_counts}
+
+
+# ----- 分页静态可视化 -----
+def _render_document(document: dict, colors: dict) -> str:
+    """把带 char_interval 的抽取高亮为 <mark>；重叠的区间只保留靠前的一个"""
+    text = document.get("text") or ""
+    spans = []
+    for e in document.get("extractions") or []:
+        interval = e.get("char_interval")
+        if interval and interval.get("start_pos") is not None and interval.get("end_pos") is not None:
+            spans.append((interval["start_pos"], interval["end_pos"], e))
+    spans.sort(key=lambda s: (s[0], -s[1]))
+
+    parts, cursor = [], 0
+    for start, end, e in spans:
+        if start < cursor:
+            continue
+        color = colors.setdefault(e["extraction_class"], _PALETTE[len(colors) % len(_PALETTE)])
+        title = "; ".join(f"{k}: {v}" for k, v in (e.get("attributes") or {}).items())
+        parts.append(html.escape(text[cursor:start]))
+        parts.append(f'<mark style="background:{color}" title="{html.escape(e["extraction_class"] + " " + title)}">'
+                     f"{html.escape(text[start:end])}</mark>")
+        cursor = end
+    parts.append(html.escape(text[cursor:]))
+    return (f'<section><h3>{html.escape(str(document.get("document_id", "")))}</h3>'
+            f'<p>{"".join(parts)}</p></section>')
+
+
+def _page(title: str, body: str, nav: str) -> str:
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            '<style>body{font-family:sans-serif;max-width:960px;margin:auto}p{white-space:pre-wrap;line-height:1.6}'
+            'section{border-bottom:1px solid #ddd;padding:8px 0}mark{border-radius:3px;padding:0 2px}</style>'
+            f"</head><body>{nav}{body}{nav}</body></html>")
+
+
+def write_html_pages(documents: Iterable[dict], output_dir: str = REPORT_CONFIG["HTML_DIR"],
+                     page_size: int = REPORT_CONFIG["PAGE_SIZE"]) -> int:
+    """每 page_size 篇文档写一个 HTML 分页，并生成 index.html；返回页数"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    documents = iter(documents)
+    colors, entries = {}, []
+    page = 0
+    chunk = list(islice(documents, page_size))
+    while chunk:
+        following = list(islice(documents, page_size))  # 预读下一页，决定是否需要"下一页"链接
+        page += 1
+        name = f"page_{page:05d}.html"
+        links = [f'<a href="page_{page - 1:05d}.html">← 上一页</a>'] if page > 1 else []
+        links.append('<a href="index.html">目录</a>')
+        if following:
+            links.append(f'<a href="page_{page + 1:05d}.html">下一页 →</a>')
+        body = "".join(_render_document(d, colors) for d in chunk)
+        (output_dir / name).write_text(_page(name, body, f"<nav>{' '.join(links)}</nav>"), encoding="utf-8")
+        entries.append((name, chunk[0].get("document_id", ""), chunk[-1].get("document_id", ""), len(chunk)))
+        chunk = following
+
+    legend = " ".join(f'<mark style="background:{c}">{html.escape(k)}</mark>' for k, c in colors.items())
+    rows = "".join(f'<li><a href="{n}">{n}</a>：{html.escape(str(a))} … {html.escape(str(b))}（{c} 篇）</li>'
+                   for n, a, b, c in entries)
+    (output_dir / "index.html").write_text(_page("抽取结果", f"<p>{legend}</p><ol>{rows}</ol>", ""), encoding="utf-8")
+    return page
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="抽取结果汇总与分页可视化（流式读取 JSONL）")
+    parser.add_argument("results", help="抽取结果 JSONL")
+    parser.add_argument("--html-dir", default=REPORT_CONFIG["HTML_DIR"])
+    parser.add_argument("--page-size", type=int, default=REPORT_CONFIG["PAGE_SIZE"])
+    parser.add_argument("--top", type=int, default=REPORT_CONFIG["TOP_GROUPS"])
+    parser.add_argument("--no-html", action="store_true", help="只输出汇总，不生成 HTML")
+    args = parser.parse_args(argv)
+
+    summary = aggregate_groups(iter_documents(args.results))
+    print(f"📊 {summary['documents']} 篇文档，{len(summary['groups'])} 个药物组，"
+          f"{summary['ungrouped']} 条抽取缺少 medication_group")
+    for name, count in summary["groups"].most_common(args.top):
+        print(f"  * {name}: {count} 篇")
+    print("  类别: " + "，".join(f"{k} {v}" for k, v in summary["classes"].most_common()))
+
+    if not args.no_html:
+        pages = write_html_pages(iter_documents(args.results), args.html_dir, args.page_size)
+        print(f"✅ 可视化已分 {pages} 页保存: {Path(args.html_dir) / 'index.html'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+# numpy / tqdm 在函数内导入：`medical-ai index --help` 只需 argparse
+if TYPE_CHECKING:
+    import numpy as np
+
+# ===== 关键词索引配置 =====
+KEYWORD_CONFIG = {
+    "INDEX_DIR": "data/keyword_index",
+    "K1": 1.2,            # BM25 词频饱和参数
+    "B": 0.75,            # BM25 文档长度归一化参数
+    "MAX_TF": 255,        # 词频以 uint8 存储
+}
+
+# 希腊字母统一为英文名：β-blocker 与 beta-blocker 检索结果一致
+GREEK_LETTERS = {
+    "α": "alpha", "β": "beta", "γ": "gamma", "δ": "delta", "ε": "epsilon", "ζ": "zeta", "η": "eta",
+    "θ": "theta", "ι": "iota", "κ": "kappa", "λ": "lambda", "μ": "mu", "ν": "nu", "ξ": "xi",
+    "π": "pi", "ρ": "rho", "σ": "sigma", "ς": "sigma", "τ": "tau", "υ": "upsilon", "φ": "phi",
+    "χ": "chi", "ψ": "psi", "ω": "omega",
+}
+_GREEK_RE = re.compile("|".join(GREEK_LETTERS))
+
+# 剂量单位别名（NFKC 之后微符号 µ 已变为希腊字母 μ）
+_UNIT_ALIASES = {"μg": "mcg", "ug": "mcg", "units": "u", "unit": "u", "iu": "iu", "cc": "ml"}
+
+# 剂量（500 mg、0,5mg、10 mg/kg）作为一个词；小数（p < 0.05、1.5）作为一个词；
+# 其余按字母数字切分，连字符复合词单独保留
+TOKEN_RE = re.compile(
+    r"(?P<dose>\d+(?:[.,]\d+)?)\s?(?P<unit>mg/kg|mg/dl|mmol/l|mcg|μg|ug|mg|ng|kg|g|ml|cc|iu|units?|mmol|%)(?![^\W_])"
+    r"|(?P<number>\d+(?:\.\d+)+)(?![^\W_])"
+    r"|(?P<word>[^\W_]+(?:-[^\W_]+)*)")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with "
+    "we our not no than".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """医学文本分词：NFKC + 小写，希腊字母转英文名，剂量归一（500 mg → 500mg），
+    连字符复合词同时输出各部分与去连字符形式（β-blocker → beta, blocker, betablocker）"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for m in TOKEN_RE.finditer(text):
+        if m.group("dose"):
+            unit = _UNIT_ALIASES.get(m.group("unit"), m.group("unit"))
+            tokens.append(m.group("dose").replace(",", ".") + unit)
+            continue
+        if m.group("number"):
+            tokens.append(m.group("number"))
+            continue
+        word = _GREEK_RE.sub(lambda g: GREEK_LETTERS[g.group()], m.group("word"))
+        if "-" in word:
+            parts = [p for p in word.split("-") if p]
+            tokens.extend(p for p in parts if p not in STOPWORDS)
+            tokens.append("".join(parts))
+        elif word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+def term_hash(term: str) -> int:
+    """词项的 64 位哈希：词表按哈希排序，查询时一次 searchsorted 定位"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little") >> 1
+
+
+# ----- 倒排表压缩：文档号差分 + 变长字节（LEB128），编解码均为 NumPy 向量化 -----
+def _varint_sizes(values: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        sizes += values >= (1 << shift)
+    return sizes
+
+
+def encode_varints(values: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = _varint_sizes(values)
+    ends = np.cumsum(sizes)
+    out = np.empty(int(ends[-1]) if len(ends) else 0, dtype=np.uint8)
+    starts = ends - sizes
+    remaining = values.copy()
+    for i in range(int(sizes.max()) if len(sizes) else 0):
+        active = sizes > i
+        pos = starts[active] + i
+        byte = (remaining[active] & np.uint64(0x7F)).astype(np.uint8)
+        more = sizes[active] > i + 1
+        out[pos] = byte | (more.astype(np.uint8) << 7)
+        remaining[active] >>= np.uint64(7)
+    return out
+
+
+def decode_varints(data: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    data = np.asarray(data)
+    if not len(data) or data.max() < 0x80:  # 常见情形：全部是单字节
+        return data.astype(np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    shifts = (np.arange(len(data)) - np.repeat(starts, lengths)) * 7
+    parts = (data & 0x7F).astype(np.int64) << shifts
+    return np.add.reduceat(parts, starts)
+
+
+class _Shard:
+    """一个只读分片：所有数组均以 mmap 打开（转为普通 ndarray 视图，避免 memmap 子类的切片开销）"""
+
+    def __init__(self, directory: Path):
+        import numpy as np
+        self.dir = directory
+        self.meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        load = lambda name: np.load(directory / f"{name}.npy", mmap_mode="r").view(np.ndarray)
+        self.hashes = load("hashes")          # (terms,) 升序
+        self.dfs = load("dfs")                # (terms,) 文档频率
+        self.post_offsets = load("post_offsets")  # (terms+1,) postings.bin 字节偏移
+        self.tf_offsets = load("tf_offsets")  # (terms+1,) tfs 下标偏移
+        self.tfs = load("tfs")
+        self.doclen = load("doclen")
+        self.pmids = load("pmids")
+        # live：分片内部的有效文档（同一文件中被后续事件覆盖/删除的为 False）；
+        # tombstones：该文件中 DeleteCitation 删除的 PMID，使较旧分片中的副本失效。旧版本分片没有这两个文件
+        self.live = np.load(directory / "live.npy") if (directory / "live.npy").exists() \
+            else np.ones(len(self.pmids), dtype=bool)
+        self.tombstones = load("tombstones") if (directory / "tombstones.npy").exists() \
+            else np.zeros(0, dtype=np.int64)
+        self.alive = np.load(directory / "alive.npy")
+        self.postings = np.memmap(directory / "postings.bin", dtype=np.uint8, mode="r").view(np.ndarray) \
+            if self.post_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self.has_deletes = not bool(self.alive.all())
+        self._norm = (None, None)  # (参数, 每篇文档的 BM25 长度归一项)
+
+    def norm(self, k1: float, b: float, avgdl: float) -> "np.ndarray":
+        """k1·(1 - b + b·dl/avgdl)，全局统计不变时复用"""
+        import numpy as np
+        params = (k1, b, avgdl)
+        if self._norm[0] != params:
+            self._norm = (params, (k1 * (1 - b + b * self.doclen / avgdl)).astype(np.float32))
+        return self._norm[1]
+
+    def lookup(self, h: int) -> int:
+        import numpy as np
+        i = int(np.searchsorted(self.hashes, h))
+        return i if i < len(self.hashes) and self.hashes[i] == h else -1
+
+    def postings_of(self, term_id: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        import numpy as np
+        start, end = self.post_offsets[term_id], self.post_offsets[term_id + 1]
+        docs = np.cumsum(decode_varints(self.postings[start:end]))
+        return docs, self.tfs[self.tf_offsets[term_id]:self.tf_offsets[term_id + 1]]
+
+
+def build_shard(records: Iterable[dict], shard_dir: Path) -> dict:
+    """从记录流构建一个分片（先写临时目录再原子重命名）
+
+    记录按文件顺序处理，同一 PMID 以最后一个事件为准；带 "deleted": True 的记录是删除事件（墓碑），
+    既删除本分片中先前的副本，也让较旧分片中的副本失效。
+    """
+    import numpy as np
+    postings = defaultdict(list)  # term → [(文档号, 词频)]，文档号递增
+    pmids, doclen = [], []
+    latest, dead, tombstones = {}, set(), set()  # PMID → 最新文档号；被覆盖/删除的文档号；删除的 PMID
+    for record in records:
+        pmid = str(record["pmid"])
+        if not pmid.isdigit():
+            continue
+        previous = latest.pop(int(pmid), None)
+        if previous is not None:
+            dead.add(previous)
+        if record.get("deleted"):
+            tombstones.add(int(pmid))
+            continue
+        counts = Counter(tokenize(f"{record['title']}\n{record['abstract']}"))
+        doc = len(pmids)
+        latest[int(pmid)] = doc
+        pmids.append(int(pmid))
+        doclen.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings[term].append((doc, tf))
+
+    terms = list(postings)
+    hashes = np.fromiter((term_hash(t) for t in terms), dtype=np.int64, count=len(terms))
+    order = np.argsort(hashes, kind="stable")
+    dfs = np.fromiter((len(postings[terms[i]]) for i in order), dtype=np.uint32, count=len(terms))
+    tf_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(dfs, out=tf_offsets[1:])
+
+    docs = np.empty(int(tf_offsets[-1]), dtype=np.int64)
+    tfs = np.empty(int(tf_offsets[-1]), dtype=np.uint8)
+    for k, i in enumerate(order):
+        pairs = np.asarray(postings[terms[i]], dtype=np.int64)
+        start, end = tf_offsets[k], tf_offsets[k + 1]
+        docs[start:end] = np.diff(pairs[:, 0], prepend=0)  # 每个词项内部差分
+        tfs[start:end] = np.minimum(pairs[:, 1], KEYWORD_CONFIG["MAX_TF"])
+
+    # 逐词项的字节偏移：先算每个差分值的编码长度
+    sizes = _varint_sizes(docs)
+    post_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.add.reduceat(sizes, tf_offsets[:-1]) if len(terms) else [], out=post_offsets[1:])
+
+    tmp_dir = shard_dir.with_name(f".{shard_dir.name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    encode_varints(docs).tofile(tmp_dir / "postings.bin")
+    live = np.ones(len(pmids), dtype=bool)
+    live[list(dead)] = False
+    for name, array in (("hashes", hashes[order]), ("dfs", dfs), ("post_offsets", post_offsets),
+                        ("tf_offsets", tf_offsets), ("tfs", tfs), ("doclen", np.asarray(doclen, dtype=np.uint32)),
+                        ("pmids", np.asarray(pmids, dtype=np.int64)), ("live", live), ("alive", live),
+                        ("tombstones", np.asarray(sorted(tombstones), dtype=np.int64))):
+        np.save(tmp_dir / f"{name}.npy", array)
+    meta = {"docs": len(pmids), "terms": len(terms), "total_len": int(sum(doclen)), "deletes": len(tombstones)}
+    (tmp_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    os.replace(tmp_dir, shard_dir)
+    return meta
+
+
+def _iter_file_events(path: Path) -> Iterable[dict]:
+    """输入文件 → 记录流；MEDLINE XML 中的 DeleteCitation 转为 {"pmid", "deleted": True} 墓碑"""
+    if path.name.endswith((".xml", ".xml.gz")):
+        from scripts.medline import iter_update_events
+        for kind, value in iter_update_events(path):
+            yield {"pmid": value, "deleted": True} if kind == "delete" else value
+        return
+    from scripts.dataset import iter_dataset
+    yield from iter_dataset(path)
+
+
+def _build_file_shard(path: Path, shard_dir: Path) -> dict:
+    """子进程任务：一个输入文件 → 一个分片"""
+    return build_shard(_iter_file_events(path), shard_dir)
+
+
+def shard_name(path: Path) -> str:
+    """分片名 = 文件名 + 绝对路径的短哈希：不同目录下的同名文件各自成片，排序仍由文件名决定"""
+    digest = hashlib.blake2b(str(path.resolve()).encode("utf-8"), digest_size=4).hexdigest()
+    return f"{path.name}.{digest}"
+
+
+class KeywordIndex:
+    """分片 BM25 倒排索引
+
+    目录结构：manifest.json（分片列表，按源文件名排序）+ shards/<文件名>.<路径哈希>/。
+    分片的新旧由源文件名决定（medline19n0001 < medline19n0002 < 每日更新文件），与加入顺序无关；
+    同一 PMID 出现在较新的分片中、或被较新文件的 DeleteCitation 删除时，旧分片中的副本被标记删除（alive.npy），
+    df / 平均长度仍按全部文档统计，与 Lucene 合并段之前的行为一致。
+    """
+
+    def __init__(self, directory: str = KEYWORD_CONFIG["INDEX_DIR"]):
+        self.dir = Path(directory)
+        manifest = self.dir / "manifest.json"
+        self.manifest = json.loads(manifest.read_text(encoding="utf-8")) if manifest.exists() \
+            else {"k1": KEYWORD_CONFIG["K1"], "b": KEYWORD_CONFIG["B"], "shards": []}
+        self.shards = [_Shard(self.dir / "shards" / s["name"]) for s in self.manifest["shards"]]
+
+    @property
+    def num_docs(self) -> int:
+        return sum(s["docs"] for s in self.manifest["shards"])
+
+    def _save_manifest(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / "manifest.json").write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2),
+                                                encoding="utf-8")
+
+    # ----- 构建 -----
+    def add_shard(self, name: str, meta: dict, source: Optional[str] = None):
+        """登记一个已构建好的分片，并按源文件名顺序重新确定各分片中哪些 PMID 有效
+
+        source 为源文件的绝对路径，add_files 据此判断文件是否已建过索引。
+        """
+        import numpy as np
+        replaced = any(s["name"] == name for s in self.manifest["shards"])
+        self.manifest["shards"] = [s for s in self.manifest["shards"] if s["name"] != name]
+        self.shards = [s for s in self.shards if s.dir.name != name]
+        shard = _Shard(self.dir / "shards" / name)
+        self.manifest["shards"].append({"name": name, **meta, **({"source": source} if source else {})})
+        self.shards.append(shard)
+        self.manifest["shards"].sort(key=lambda s: s["name"])
+        self.shards.sort(key=lambda s: s.dir.name)
+
+        if not replaced and self.shards[-1] is shard:
+            # 常见情形：追加最新的文件，只需在旧分片中标记被它覆盖的 PMID
+            superseded = np.concatenate([shard.pmids, shard.tombstones])
+            for old in self.shards[:-1]:
+                self._set_alive(old, old.alive & ~np.isin(old.pmids, superseded))
+        else:
+            self._recompute_alive()
+        self._save_manifest()
+
+    def _recompute_alive(self):
+        """重建或补入较旧的文件：从最新分片往回，PMID 只在最新出现（或被删除）处有效"""
+        import numpy as np
+        seen = np.zeros(0, dtype=np.int64)
+        for current in reversed(self.shards):
+            self._set_alive(current, current.live & ~np.isin(current.pmids, seen))
+            seen = np.union1d(seen, np.concatenate([current.pmids, current.tombstones]))
+
+    @staticmethod
+    def _set_alive(shard: _Shard, alive: "np.ndarray"):
+        import numpy as np
+        if not np.array_equal(alive, shard.alive):
+            shard.alive = alive
+            np.save(shard.dir / "alive.npy", alive)
+        shard.has_deletes = not bool(alive.all())
+
+    def add_files(self, inputs: List[Path], workers: Optional[int] = None, force: bool = False) -> int:
+        """增量构建：每个输入文件一个分片，多进程并行；已建过的文件（按绝对路径）跳过。返回新增文档数"""
+        from tqdm import tqdm
+        # 旧版本的分片以文件名命名、没有 source，按文件名匹配
+        done = {s.get("source") or s["name"] for s in self.manifest["shards"]}
+        todo = [p for p in inputs if force or not {str(p.resolve()), p.name} & done]
+        if len(todo) < len(inputs):
+            print(f"⏭️ 跳过已建索引的文件: {len(inputs) - len(todo)} 个")
+        if not todo:
+            return 0
+        (self.dir / "shards").mkdir(parents=True, exist_ok=True)
+        results = {}
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(_build_file_shard, p, self.dir / "shards" / shard_name(p)): p for p in todo}
+            with tqdm(total=len(futures), desc="构建倒排索引", unit="shard") as bar:
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    bar.update(1)
+        # 旧版本（以文件名命名）的分片已按新名称重建：先移除，最后整体重算有效标记
+        legacy = {p.name for p in todo} & {s["name"] for s in self.manifest["shards"] if "source" not in s}
+        for name in legacy:
+            self.manifest["shards"] = [s for s in self.manifest["shards"] if s["name"] != name]
+            self.shards = [s for s in self.shards if s.dir.name != name]
+            shutil.rmtree(self.dir / "shards" / name, ignore_errors=True)
+        for path in sorted(todo, key=shard_name):  # 新旧由文件名决定，add_shard 内部也按此排序
+            self.add_shard(shard_name(path), results[path], str(path.resolve()))
+        if legacy:
+            self._recompute_alive()
+            self._save_manifest()
+        return sum(meta["docs"] for meta in results.values())
+
+    # ----- 查询 -----
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """BM25 top-k：返回 [(pmid, score)]，按分数降序"""
+        import numpy as np
+        terms = [(t, term_hash(t)) for t in dict.fromkeys(tokenize(query))]
+        if not terms or not self.shards:
+            return []
+        # 先在所有分片中定位词项，得到全局 df
+        located = [[shard.lookup(h) for _, h in terms] for shard in self.shards]
+        dfs = np.zeros(len(terms))
+        for shard, ids in zip(self.shards, located):
+            for j, term_id in enumerate(ids):
+                if term_id >= 0:
+                    dfs[j] += shard.dfs[term_id]
+        n = self.num_docs
+        idf = np.log1p((n - dfs + 0.5) / (dfs + 0.5))
+        avgdl = sum(s["total_len"] for s in self.manifest["shards"]) / max(n, 1)
+        k1, b = self.manifest["k1"], self.manifest["b"]
+
+        candidates = []
+        for shard, ids in zip(self.shards, located):
+            doc_parts, score_parts = [], []
+            norm = shard.norm(k1, b, avgdl)
+            for j, term_id in enumerate(ids):
+                if term_id < 0:
+                    continue
+                docs, tfs = shard.postings_of(term_id)
+                tfs = tfs.astype(np.float32)
+                doc_parts.append(docs)
+                score_parts.append(np.float32(idf[j] * (k1 + 1)) * tfs / (tfs + norm[docs]))
+            if not doc_parts:
+                continue
+            if len(doc_parts) == 1:
+                docs, scores = doc_parts[0], score_parts[0]
+            else:  # 多个词项：按文档号合并得分
+                docs = np.concatenate(doc_parts)
+                scores = np.concatenate(score_parts)
+                order = np.argsort(docs, kind="stable")
+                docs = docs[order]
+                starts = np.flatnonzero(np.concatenate(([True], docs[1:] != docs[:-1])))
+                docs, scores = docs[starts], np.add.reduceat(scores[order], starts)
+            if shard.has_deletes:
+                keep = shard.alive[docs]
+                docs, scores = docs[keep], scores[keep]
+            if len(docs) > top_k:
+                top = np.argpartition(scores, -top_k)[-top_k:]
+                docs, scores = docs[top], scores[top]
+            candidates.extend(zip(scores.tolist(), shard.pmids[docs].tolist()))
+        return [(str(pmid), score) for score, pmid in heapq.nlargest(top_k, candidates)]
+
+
+def main(argv: Optional[List[str]] = None):
+    from scripts.crawler import expand_inputs
+
+    parser = argparse.ArgumentParser(description="BM25 关键词倒排索引：增量、按文件分片并行构建")
+    parser.add_argument("inputs", nargs="*", help="数据集文件或通配符（每个文件一个分片）")
+    parser.add_argument("--index", default=KEYWORD_CONFIG["INDEX_DIR"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="重建已有分片")
+    parser.add_argument("--query", "-q", action="append", default=[], help="构建后执行查询（可重复）")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    index = KeywordIndex(args.index)
+    if args.inputs:
+        start = time.perf_counter()
+        added = index.add_files(expand_inputs(args.inputs), args.workers, args.force)
+        print(f"✅ 新增 {added} 篇文档，用时 {time.perf_counter() - start:.1f}s；"
+              f"索引共 {len(index.shards)} 个分片、{index.num_docs} 篇文档")
+    for query in args.query:
+        start = time.perf_counter()
+        hits = index.search(query, args.top_k)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"🔎 {query!r}（{elapsed:.2f} ms）")
+        for pmid, score in hits:
+            print(f"  {pmid}\t{score:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
 import langextract as lx
 
+# ===== 模型配置（批量驱动 batch_extract 共用） =====
+EXTRACT_CONFIG = {
+    "MODEL_ID": "gemma2:2b",
+    "MODEL_URL": "http://localhost:11434",  # 本地 Ollama
+    "TEMPERATURE": 0.3,
+}
+
 # Text with interleaved medication mentions
 input_text = """
 The patient was prescribed Lisinopril and Metformin last month.
@@ -63,54 +70,62 @@ examples = [
     )
 ]
 
-result = lx.extract(
-    text_or_documents=input_text,
-    prompt_description=prompt_description,
-    examples=examples,
-    model_id="gemma2:2b",
-    model_url="http://localhost:11434",
-    format_type=lx.data.FormatType.JSON,
-    temperature=0.3,
-    use_schema_constraints=True,
-)
-
-# Display grouped medications
-print(f"Input text: {input_text.strip()}\n")
-print("Extracted Medications:")
-
-# Group by medication
-medication_groups = {}
-for extraction in result.extractions:
-    if not extraction.attributes or "medication_group" not in extraction.attributes:
-        print(f"Warning: Missing medication_group for {extraction.extraction_text}")
-        continue
-
-    group_name = extraction.attributes["medication_group"]
-    medication_groups.setdefault(group_name, []).append(extraction)
-
-# Print each medication group
-for med_name, extractions in medication_groups.items():
-    print(f"\n* {med_name}")
-    for extraction in extractions:
-        position_info = ""
-        if extraction.char_interval:
-            start, end = extraction.char_interval.start_pos, extraction.char_interval.end_pos
-            position_info = f" (pos: {start}-{end})"
-        print(f"  • {extraction.extraction_class.capitalize()}: {extraction.extraction_text}{position_info}")
-
-# Save and visualize the results
-lx.io.save_annotated_documents(
-    [result],
-    output_name="medical_relationship_extraction.jsonl",
-    output_dir="."
-)
-
-# Generate the interactive visualization
-html_content = lx.visualize("medical_relationship_extraction.jsonl")
-with open("medical_relationship_visualization.html", "w", encoding='utf-8') as f:
-    if hasattr(html_content, 'data'):
-        f.write(html_content.data)  # For Jupyter/Colab
-    else:
-        f.write(html_content)
-
-print("Interactive visualization saved to medical_relationship_visualization.html")
\ No newline at end of file
+
+def extract_medications(text, model_id=EXTRACT_CONFIG["MODEL_ID"], model_url=EXTRACT_CONFIG["MODEL_URL"],
+                        temperature=EXTRACT_CONFIG["TEMPERATURE"]):
+    """对一段文本运行药物抽取（提示词与示例为本模块定义的版本）"""
+    return lx.extract(
+        text_or_documents=text,
+        prompt_description=prompt_description,
+        examples=examples,
+        model_id=model_id,
+        model_url=model_url,
+        format_type=lx.data.FormatType.JSON,
+        temperature=temperature,
+        use_schema_constraints=True,
+    )
+
+
+def main():
+    from langextract import data_lib
+    from aitools.extraction_report import JsonlWriter, iter_documents, medication_groups
+
+    result = extract_medications(input_text)
+
+    # Save results incrementally (one JSON line per document)
+    with JsonlWriter("medical_relationship_extraction.jsonl") as writer:
+        writer.write(data_lib.annotated_document_to_dict(result))
+
+    # Display grouped medications, streaming documents back from the JSONL
+    print(f"Input text: {input_text.strip()}\n")
+    print("Extracted Medications:")
+
+    for document in iter_documents("medical_relationship_extraction.jsonl"):
+        groups = medication_groups(document["extractions"])
+        for extraction in groups.pop(None, []):
+            print(f"Warning: Missing medication_group for {extraction['extraction_text']}")
+
+        # Print each medication group
+        for med_name, extractions in groups.items():
+            print(f"\n* {med_name}")
+            for extraction in extractions:
+                position_info = ""
+                if extraction.get("char_interval"):
+                    start, end = extraction["char_interval"]["start_pos"], extraction["char_interval"]["end_pos"]
+                    position_info = f" (pos: {start}-{end})"
+                print(f"  • {extraction['extraction_class'].capitalize()}: {extraction['extraction_text']}"
+                      f"{position_info}")
+
+    # Generate the interactive visualization
+    html_content = lx.visualize("medical_relationship_extraction.jsonl")
+    with open("medical_relationship_visualization.html", "w", encoding='utf-8') as f:
+        if hasattr(html_content, 'data'):
+            f.write(html_content.data)  # For Jupyter/Colab
+        else:
+            f.write(html_content)
+
+    print("Interactive visualization saved to medical_relationship_visualization.html")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# numpy 在函数内导入：`medical-ai query --help` 不加载
+if TYPE_CHECKING:
+    import numpy as np
+
+# ===== 查询服务配置 =====
+SERVICE_CONFIG = {
+    "PORT": 8765,
+    "RRF_K": 60,              # 倒数排名融合常数：score = Σ 1 / (k + rank)
+    "CANDIDATES": 50,         # 每路召回的候选数
+    "EMBED_CACHE": 10000,     # 查询向量 LRU 容量
+    "RESULT_CACHE": 5000,     # 查询结果 LRU 容量
+    "BATCH_WINDOW_MS": 5,     # 合批等待窗口：窗口内到达的并发查询一次编码
+    "MAX_BATCH": 64,
+    "DENSE_BUDGET_MS": 200,   # 单次查询向量一路（编码 + 检索）的时间预算，超时退化为只用 BM25 结果
+    "DENSE_WORKERS": 16,      # 执行向量一路的线程数
+    "LATENCY_WINDOW": 10000,  # 延迟统计保留最近 N 次
+}
+SEARCH_MODES = ("hybrid", "dense", "lexical")
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存，记录命中/未命中次数"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+
+class LatencyStats:
+    """按阶段记录最近 N 次耗时（毫秒），输出 p50/p99"""
+
+    def __init__(self, window: int = SERVICE_CONFIG["LATENCY_WINDOW"]):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float):
+        with self._lock:
+            self._samples[stage].append(ms)
+
+    def snapshot(self) -> dict:
+        import numpy as np
+        with self._lock:
+            samples = {stage: np.fromiter(values, dtype=float) for stage, values in self._samples.items()}
+        return {stage: {"count": len(v), "p50_ms": float(np.percentile(v, 50)), "p99_ms": float(np.percentile(v, 99))}
+                for stage, v in samples.items() if len(v)}
+
+
+class MicroBatcher:
+    """把并发到达的查询合成一批调用 encode：等待 window_ms 或凑满 max_batch 即发车"""
+
+    def __init__(self, encode: Callable[[List[str]], "np.ndarray"], window_ms: float = SERVICE_CONFIG["BATCH_WINDOW_MS"],
+                 max_batch: int = SERVICE_CONFIG["MAX_BATCH"], stats: Optional[LatencyStats] = None):
+        self.encode = encode
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = stats
+        self.batches = self.queries = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            start = time.perf_counter()
+            try:
+                vectors = self.encode([text for text, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            if self.stats:
+                self.stats.record("encode_batch", (time.perf_counter() - start) * 1000)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[str]], k: int = SERVICE_CONFIG["RRF_K"]) -> List[tuple]:
+    """rankings: {来源: [id, ...]（按相关度降序）} → [(id, 融合分, {来源: 名次})]，按融合分降序"""
+    scores, ranks = defaultdict(float), defaultdict(dict)
+    for source, ids in rankings.items():
+        for rank, doc_id in enumerate(ids, 1):
+            scores[doc_id] += 1.0 / (k + rank)
+            ranks[doc_id][source] = rank
+    return [(doc_id, score, ranks[doc_id]) for doc_id, score in sorted(scores.items(), key=lambda x: -x[1])]
+
+
+def _copy_results(results: List[dict]) -> List[dict]:
+    return [{**r, "ranks": dict(r["ranks"])} for r in results]
+
+
+class QueryService:
+    """常驻内存的混合检索服务：编码模型、向量索引、关键词索引只加载一次
+
+    vector_index 需提供 Pinecone 风格的 query(vector, top_k)（LocalIndex 或 Pinecone Index），
+    keyword_index 需提供 search(query, top_k) → [(id, score)]（KeywordIndex）；任一为 None 则只走另一路。
+    """
+
+    def __init__(self, encode: Optional[Callable[[List[str]], "np.ndarray"]] = None, vector_index=None,
+                 keyword_index=None, candidates: int = SERVICE_CONFIG["CANDIDATES"],
+                 embed_cache: int = SERVICE_CONFIG["EMBED_CACHE"], result_cache: int = SERVICE_CONFIG["RESULT_CACHE"],
+                 batch_window_ms: float = SERVICE_CONFIG["BATCH_WINDOW_MS"],
+                 dense_budget_ms: Optional[float] = SERVICE_CONFIG["DENSE_BUDGET_MS"]):
+        if vector_index is not None and encode is None:
+            raise ValueError("向量检索需要提供 encode")
+        self.vector_index = vector_index
+        self.keyword_index = keyword_index
+        self.candidates = candidates
+        self.stats = LatencyStats()
+        self.embed_cache = LRUCache(embed_cache)
+        self.result_cache = LRUCache(result_cache)
+        self.batcher = MicroBatcher(encode, batch_window_ms, stats=self.stats) if vector_index is not None else None
+        self.dense_budget = None if dense_budget_ms is None else dense_budget_ms / 1000
+        self._dense_pool = (ThreadPoolExecutor(SERVICE_CONFIG["DENSE_WORKERS"], thread_name_prefix="dense")
+                            if vector_index is not None else None)
+        self._lock = threading.Lock()
+        self.fallbacks = 0  # 向量一路超出预算、退化为只用 BM25 的查询数
+
+    def _timed(self, stage: str, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.stats.record(stage, (time.perf_counter() - start) * 1000)
+        return result
+
+    def embed(self, text: str) -> "np.ndarray":
+        vector = self.embed_cache.get(text)
+        if vector is None:
+            vector = self._timed("encode", lambda: self.batcher.submit(text).result())
+            self.embed_cache.put(text, vector)
+        return vector
+
+    def _dense(self, text: str) -> List[str]:
+        vector = self.embed(text)
+        # 关键字参数 + 列表，兼容 Pinecone Index.query
+        matches = self._timed("dense", lambda: self.vector_index.query(vector=vector.tolist(),
+                                                                       top_k=self.candidates))["matches"]
+        return [m["id"] for m in matches]
+
+    def _lexical(self, text: str) -> List[str]:
+        return [doc_id for doc_id, _ in self._timed("lexical", self.keyword_index.search, text, self.candidates)]
+
+    def search(self, text: str, top_k: int = 10, mode: str = "hybrid") -> List[dict]:
+        """mode: hybrid（RRF 融合）/ dense / lexical；返回 [{"id", "score", "ranks"}]
+
+        向量一路在线程池中执行，超出 dense_budget 且有关键词索引时不再等待，
+        直接返回 BM25 结果（退化结果不进缓存）。返回的是副本，调用方修改不影响缓存。
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"未知检索模式 {mode!r}，可选: {'/'.join(SEARCH_MODES)}")
+        start = time.perf_counter()
+        key = (text, top_k, mode)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            self.stats.record("total_cached", (time.perf_counter() - start) * 1000)
+            return _copy_results(cached)
+
+        rankings = {}
+        dense = None
+        if mode in ("hybrid", "dense") and self.vector_index is not None:
+            dense = self._dense_pool.submit(self._dense, text)  # 与 BM25 并行
+        if mode in ("hybrid", "lexical") and self.keyword_index is not None:
+            rankings["lexical"] = self._lexical(text)
+        degraded = False
+        if dense is not None:
+            timeout = None  # 没有关键词索引可退化时只能等向量结果
+            if self.dense_budget is not None and self.keyword_index is not None:
+                timeout = max(0.0, self.dense_budget - (time.perf_counter() - start))
+            try:
+                rankings["dense"] = dense.result(timeout=timeout)
+            except FutureTimeout:  # 后台仍会算完，编码结果照常进入 embed_cache
+                degraded = True
+                with self._lock:
+                    self.fallbacks += 1
+                if "lexical" not in rankings:
+                    rankings["lexical"] = self._lexical(text)
+        results = [{"id": doc_id, "score": score, "ranks": ranks}
+                   for doc_id, score, ranks in reciprocal_rank_fusion(rankings)[:top_k]]
+
+        if not degraded:
+            self.result_cache.put(key, _copy_results(results))
+        self.stats.record("total", (time.perf_counter() - start) * 1000)
+        return results
+
+    def metrics(self) -> dict:
+        batching = {}
+        if self.batcher is not None and self.batcher.batches:
+            batching = {"batches": self.batcher.batches, "mean_batch_size": self.batcher.queries / self.batcher.batches}
+        return {"latency": self.stats.snapshot(), "batching": batching, "dense_fallbacks": self.fallbacks,
+                "embed_cache": {"hits": self.embed_cache.hits, "misses": self.embed_cache.misses},
+                "result_cache": {"hits": self.result_cache.hits, "misses": self.result_cache.misses}}
+
+
+def make_handler(service: QueryService):
+    """HTTP 接口：GET /search?q=...&k=10&mode=hybrid，GET /metrics"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/metrics":
+                self._send(200, service.metrics())
+            elif url.path == "/search" and params.get("q"):
+                try:
+                    results = service.search(params["q"], int(params.get("k", 10)), params.get("mode", "hybrid"))
+                except ValueError as exc:  # 参数错误：未知 mode、k 不是整数
+                    self._send(400, {"error": str(exc)})
+                    return
+                except Exception as exc:
+                    self._send(500, {"error": repr(exc)})
+                    return
+                self._send(200, {"query": params["q"], "results": results})
+            else:
+                self._send(404, {"error": "用法: /search?q=...&k=10&mode=hybrid|dense|lexical 或 /metrics"})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main(argv: Optional[List[str]] = None):
+    from aitools.embedding import EMBED_CONFIG
+    from aitools.keyword_index import KEYWORD_CONFIG, KeywordIndex
+    from aitools.vectorstore import INDEX_CONFIG, LocalIndex
+
+    parser = argparse.ArgumentParser(description="常驻混合检索服务（向量 + BM25，RRF 融合）")
+    parser.add_argument("--vector-index", default=INDEX_CONFIG["INDEX_DIR"], help="LocalIndex 目录（空字符串表示不用）")
+    parser.add_argument("--keyword-index", default=KEYWORD_CONFIG["INDEX_DIR"], help="KeywordIndex 目录（空字符串表示不用）")
+    parser.add_argument("--model", default=EMBED_CONFIG["MODEL"])
+    parser.add_argument("--port", type=int, default=SERVICE_CONFIG["PORT"])
+    parser.add_argument("--batch-window-ms", type=float, default=SERVICE_CONFIG["BATCH_WINDOW_MS"])
+    parser.add_argument("--dense-budget-ms", type=float, default=SERVICE_CONFIG["DENSE_BUDGET_MS"],
+                        help="向量一路的时间预算，超时只返回 BM25 结果（≤0 表示不限）")
+    args = parser.parse_args(argv)
+
+    vector_index = encode = None
+    if args.vector_index:
+        from aitools.embedding import Encoder
+        vector_index = LocalIndex.load(args.vector_index)
+        encode = Encoder(args.model).encode
+    keyword_index = KeywordIndex(args.keyword_index) if args.keyword_index else None
+
+    service = QueryService(encode, vector_index, keyword_index, batch_window_ms=args.batch_window_ms,
+                           dense_budget_ms=args.dense_budget_ms if args.dense_budget_ms > 0 else None)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(service))
+    print(f"🚀 检索服务已启动: http://127.0.0.1:{args.port}/search?q=metformin（/metrics 查看延迟）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
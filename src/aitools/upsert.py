@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+# ===== 批量写入配置 =====
+UPSERT_CONFIG = {
+    "BATCH_SIZE": 200,                  # 每个请求的向量数（Pinecone 上限 1000）
+    "MAX_BATCH_BYTES": 2 * 1024 * 1024, # 每个请求的估算负载上限（Pinecone 上限 2MB）
+    "CONCURRENCY": 8,                   # 同时在途的请求数，也是内存中最多保留的批次数
+    "MAX_RETRIES": 5,
+    "BACKOFF_BASE": 0.5,                # 指数退避：0.5s, 1s, 2s ...（带随机抖动）
+    "BACKOFF_MAX": 30.0,
+}
+
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class TransientError(Exception):
+    """可重试的临时错误（限流、超时、服务端 5xx）"""
+
+
+def _network_errors() -> tuple:
+    """网络类异常：内置的连接 / 超时错误，加上 requests / urllib3 的对应异常（它们不继承内置类型）
+
+    只查 sys.modules：库还没被导入，就不可能抛出它的异常，判断本身不触发导入。
+    """
+    errors = [TransientError, ConnectionError, TimeoutError]
+    requests = sys.modules.get("requests")
+    if requests is not None:
+        errors += [requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError]
+    urllib3 = sys.modules.get("urllib3")
+    if urllib3 is not None:
+        errors += [urllib3.exceptions.ProtocolError, urllib3.exceptions.TimeoutError]
+    return tuple(errors)
+
+
+def is_transient(exc: Exception) -> bool:
+    """判断异常是否值得重试：网络类异常，或带 408/429/5xx 状态码的 SDK / HTTP 异常"""
+    if isinstance(exc, _network_errors()):
+        return True
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    if status is None:  # requests.HTTPError 的状态码在 response 上
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status in _TRANSIENT_STATUS
+
+
+def _payload_bytes(item: dict) -> int:
+    """估算一条向量序列化后的大小：每个浮点数约 12 字节 + 元数据 JSON"""
+    metadata = item.get("metadata")
+    return len(item["id"]) + 12 * len(item["values"]) + (len(json.dumps(metadata, ensure_ascii=False)) if metadata else 0)
+
+
+def iter_batches(vectors: Iterable[dict], batch_size: int = UPSERT_CONFIG["BATCH_SIZE"],
+                 max_bytes: int = UPSERT_CONFIG["MAX_BATCH_BYTES"]) -> Iterator[List[dict]]:
+    """按条数与估算字节数两个上限切分批次（惰性，不会一次性展开全部向量）"""
+    batch, size = [], 0
+    for item in vectors:
+        item_bytes = _payload_bytes(item)
+        if batch and (len(batch) >= batch_size or size + item_bytes > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(item)
+        size += item_bytes
+    if batch:
+        yield batch
+
+
+def iter_store_vectors(store, records: Optional[Iterable[dict]] = None,
+                       read_batch: int = 1000) -> Iterator[dict]:
+    """从 EmbeddingStore 流式生成 Pinecone 格式的向量
+
+    records 为空时按行遍历整个向量库（无元数据）；否则按数据集记录顺序取向量，
+    元数据带上标题，库中没有向量的记录跳过。
+    """
+    if records is None:
+        pmids = store.pmids
+        for start in range(0, len(pmids), read_batch):
+            block = store.vectors[start:start + read_batch]
+            for pmid, values in zip(pmids[start:start + read_batch], block):
+                if pmid >= 0:
+                    yield {"id": str(pmid), "values": values.tolist()}
+        return
+
+    records = iter(records)
+    while True:
+        batch = [r for r in islice(records, read_batch) if str(r["pmid"]).isdigit()]
+        if not batch:
+            break
+        rows = {}
+        pmids = [int(r["pmid"]) for r in batch]
+        for i in range(0, len(pmids), 900):  # SQLite 单条语句变量上限
+            chunk = pmids[i:i + 900]
+            rows.update(store.conn.execute(
+                f"SELECT pmid, row FROM rows WHERE pmid IN ({','.join('?' * len(chunk))})", chunk))
+        for record, pmid in zip(batch, pmids):
+            row = rows.get(pmid)
+            if row is not None:
+                yield {"id": str(pmid), "values": store.vectors[row].tolist(),
+                       "metadata": {"title": record["title"]}}
+
+
+def _upsert_with_retry(index, batch: List[dict], max_retries: int, stats: dict, lock: threading.Lock) -> int:
+    """单批写入：临时错误按指数退避 + 抖动重试，其余错误直接抛出"""
+    for attempt in range(max_retries + 1):
+        try:
+            index.upsert(vectors=batch)
+            return len(batch)
+        except Exception as exc:
+            if attempt == max_retries or not is_transient(exc):
+                raise
+            with lock:
+                stats["retries"] += 1
+            delay = min(UPSERT_CONFIG["BACKOFF_MAX"], UPSERT_CONFIG["BACKOFF_BASE"] * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def bulk_upsert(index, vectors: Iterable[dict], batch_size: int = UPSERT_CONFIG["BATCH_SIZE"],
+                concurrency: int = UPSERT_CONFIG["CONCURRENCY"], max_retries: int = UPSERT_CONFIG["MAX_RETRIES"],
+                max_bytes: int = UPSERT_CONFIG["MAX_BATCH_BYTES"], progress: bool = True) -> dict:
+    """并发批量写入向量
+
+    - 在途批次数不超过 concurrency：上游生成器只有在有空位时才继续产出（背压），
+      内存中最多同时存在 concurrency 个批次
+    - 重试耗尽或不可重试的批次记为失败（记录其 id），不影响其余批次
+    """
+    from tqdm import tqdm
+    stats = {"vectors": 0, "batches": 0, "retries": 0, "failed_batches": 0, "failed_ids": []}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    bar = tqdm(desc="写入向量", unit="vec", disable=not progress)
+
+    def collect(done):
+        for future in done:
+            batch = in_flight.pop(future)
+            try:
+                stats["vectors"] += future.result()
+                stats["batches"] += 1
+                bar.update(len(batch))
+            except Exception as exc:
+                stats["failed_batches"] += 1
+                stats["failed_ids"].extend(item["id"] for item in batch)
+                bar.write(f"❌ 批次写入失败（{len(batch)} 条）: {exc!r}")
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in iter_batches(vectors, batch_size, max_bytes):
+            if len(in_flight) >= concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight[pool.submit(_upsert_with_retry, index, batch, max_retries, stats, lock)] = batch
+        collect(wait(in_flight)[0])
+    bar.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["vectors_per_sec"] = stats["vectors"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+class MockVectorService:
+    """本地模拟的远程向量服务：包装 LocalIndex，注入网络延迟与随机的临时失败，便于离线压测"""
+
+    def __init__(self, index, latency: float = 0.05, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.index = index
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+
+    def upsert(self, vectors: List[dict], **kwargs) -> dict:
+        with self._rng_lock:
+            self.requests += 1
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(self.latency)  # 模拟往返延迟（释放 GIL，体现并发收益）
+        if fail:
+            raise TransientError("503 Service Unavailable (mock)")
+        return self.index.upsert(vectors=vectors)
+
+    def query(self, *args, **kwargs) -> dict:
+        return self.index.query(*args, **kwargs)
+
+
+def main(argv: Optional[List[str]] = None):
+    from aitools.embedding import EMBED_CONFIG, EmbeddingStore
+    from aitools.vectorstore import INDEX_CONFIG, LocalIndex
+    from scripts.metrics import add_metrics_arguments, run_metrics
+
+    parser = argparse.ArgumentParser(description="将向量库并发批量写入向量服务（Pinecone 或本地模拟服务），或直接建本地索引")
+    parser.add_argument("--store", default=EMBED_CONFIG["STORE_DIR"], help="EmbeddingStore 目录")
+    parser.add_argument("--dataset", default=None, help="可选：数据集路径，用于附带标题元数据")
+    parser.add_argument("--target", choices=["local", "pinecone", "mock"], default="local",
+                        help="local：在向量库的内存映射矩阵上直接建索引并保存；mock：写入本地模拟服务（压测）")
+    parser.add_argument("--index-name", default="quickstart", help="Pinecone 索引名")
+    parser.add_argument("--output", default=INDEX_CONFIG["INDEX_DIR"], help="本地索引保存目录（--target local）")
+    parser.add_argument("--batch-size", type=int, default=UPSERT_CONFIG["BATCH_SIZE"])
+    parser.add_argument("--concurrency", type=int, default=UPSERT_CONFIG["CONCURRENCY"])
+    parser.add_argument("--max-retries", type=int, default=UPSERT_CONFIG["MAX_RETRIES"])
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务的单次请求延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="模拟服务的临时失败概率")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from scripts.dataset import iter_dataset
+
+    with run_metrics("upsert", args.metrics, args.profile) as metrics:
+        store = EmbeddingStore(args.store)
+        try:
+            if args.target == "local":
+                # 不经过逐条写入：索引直接引用 vectors.bin，保存时只记录其路径
+                with metrics.stage("index"):
+                    titles = None
+                    if args.dataset:
+                        titles = {str(r["pmid"]): {"title": r["title"]}
+                                  for r in metrics.track("read", iter_dataset(args.dataset))}
+                    local = LocalIndex.from_embedding_store(store, metadata=titles)
+                    local.save(args.output)
+                count = int((store.pmids >= 0).sum())
+                metrics.count("index", records=count)
+                print(f"✅ 本地索引已保存: {args.output}（{count} 条向量）")
+                return
+
+            if args.target == "pinecone":
+                from pinecone import Pinecone
+                index = Pinecone(api_key=os.environ["PINECONE_API_KEY"]).Index(args.index_name)
+            else:
+                index = MockVectorService(LocalIndex(store.dim), args.latency, args.failure_rate)
+            records = iter_dataset(args.dataset) if args.dataset else None
+            with metrics.stage("upsert"):
+                vectors = metrics.track("read", iter_store_vectors(store, records))
+                stats = bulk_upsert(index, vectors, args.batch_size, args.concurrency, args.max_retries)
+            metrics.count("upsert", records=stats["vectors"])
+        finally:
+            store.close()
+        print(f"✅ 写入 {stats['vectors']} 条向量（{stats['batches']} 批，重试 {stats['retries']} 次），"
+              f"{stats['vectors_per_sec']:.0f} vec/s，耗时 {stats['seconds']:.1f}s")
+        if stats["failed_batches"]:
+            print(f"⚠️ {stats['failed_batches']} 批写入失败，共 {len(stats['failed_ids'])} 条，可重新运行补写")
+    if stats["failed_batches"]:
+        sys.exit(1)  # 部分批次失败：让调用方脚本感知
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+# numpy 在函数内导入：upsert / query 在解析参数前就要读 INDEX_CONFIG
+if TYPE_CHECKING:
+    import numpy as np
+
+# ===== 本地向量索引配置 =====
+INDEX_CONFIG = {
+    "INDEX_DIR": "data/vector_index",
+    "METRIC": "cosine",          # cosine（向量归一化后做内积）或 dotproduct
+    "NPROBE": 16,                # 查询时探查的倒排桶数：越大召回越高、延迟越高
+    "TRAIN_SAMPLE_PER_LIST": 64, # k-means 训练样本 = nlist × 64
+    "KMEANS_ITERATIONS": 10,
+    "CHUNK_ROWS": 65536,         # 分块矩阵乘，控制峰值内存
+}
+
+
+def _normalize(vectors: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def default_nlist(count: int) -> int:
+    """倒排桶数经验值：约 4√N"""
+    import numpy as np
+    return max(1, min(count, int(4 * np.sqrt(count))))
+
+
+class LocalIndex:
+    """进程内向量索引（IVF 倒排 + 精确重排），接口与 Pinecone Index 的 upsert/query 一致
+
+    - 向量可以是内存数组，也可以直接是 EmbeddingStore 的 memmap 矩阵（不复制）
+    - build() 训练 k-means 粗聚类；查询只扫描最近的 nprobe 个桶
+    - build() 之后 upsert 的向量先放在增量区，查询时暴力扫描，下次 build() 合并
+    """
+
+    def __init__(self, dimension: int, metric: str = INDEX_CONFIG["METRIC"]):
+        import numpy as np
+        if metric not in ("cosine", "dotproduct"):
+            raise ValueError(f"不支持的度量: {metric}（可选 cosine / dotproduct）")
+        self.dim = dimension
+        self.metric = metric
+        self._base = np.zeros((0, dimension), dtype=np.float32)  # 主体向量（可为 memmap）
+        self._base_ids: np.ndarray = np.zeros(0, dtype=str)
+        self._base_meta: List[Optional[str]] = []
+        self._extra: List[np.ndarray] = []      # build() 之后新增的向量
+        self._extra_ids: List[str] = []
+        self._extra_meta: List[Optional[str]] = []
+        self._alive = np.zeros(0, dtype=bool)  # 被覆盖/删除的行置 False
+        self._row_of: Optional[dict] = None    # id → 行号（首次 upsert 时才建立）
+        self._source: Optional[dict] = None    # 外部 memmap 来源（持久化时只记录路径）
+        self._ivf = None                       # (centroids, order, offsets)
+        self._lock = threading.Lock()          # 允许多个线程并发 upsert/delete
+
+    # ----- 构造 -----
+    @classmethod
+    def from_arrays(cls, vectors: "np.ndarray", ids: "np.ndarray", metric: str = "cosine",
+                    alive: Optional["np.ndarray"] = None) -> "LocalIndex":
+        """在已有（已归一化的）向量矩阵上建索引，vectors 可以是 memmap，不会复制"""
+        import numpy as np
+        index = cls(vectors.shape[1], metric)
+        index._base = vectors
+        index._base_ids = np.asarray(ids).astype(str)
+        index._base_meta = [None] * len(vectors)
+        index._alive = np.ones(len(vectors), dtype=bool) if alive is None else np.asarray(alive, dtype=bool)
+        return index
+
+    @classmethod
+    def from_embedding_store(cls, store, metric: str = "cosine",
+                             metadata: Optional[dict] = None) -> "LocalIndex":
+        """直接在 EmbeddingStore 的内存映射矩阵上建索引，id 为 PMID；metadata 为可选的 {PMID: 元数据}"""
+        import numpy as np
+        pmids = np.asarray(store.pmids)
+        index = cls.from_arrays(store.vectors, pmids, metric, alive=pmids >= 0)
+        if metadata:
+            index._base_meta = [json.dumps(metadata[pmid], ensure_ascii=False) if pmid in metadata else None
+                                for pmid in index._base_ids.tolist()]
+        index._source = {"path": str((store.dir / "vectors.bin").resolve()),
+                         "dtype": store.meta["dtype"], "count": int(store.meta["count"])}
+        return index
+
+    @property
+    def vectors(self) -> "np.ndarray":
+        """主体向量矩阵（不含 build() 之后的增量区）"""
+        return self._base
+
+    @property
+    def count(self) -> int:
+        return len(self._base) + len(self._extra_ids)
+
+    def _ids_at(self, rows: "np.ndarray") -> List[str]:
+        base = len(self._base)
+        return [str(self._base_ids[r]) if r < base else self._extra_ids[r - base] for r in rows]
+
+    def _meta_at(self, row: int) -> dict:
+        base = len(self._base)
+        raw = self._base_meta[row] if row < base else self._extra_meta[row - base]
+        return json.loads(raw) if raw else {}
+
+    # ----- 写入 -----
+    def upsert(self, vectors: Iterable[dict]) -> dict:
+        """vectors: [{"id": str, "values": [...], "metadata": {...}}]，同 id 覆盖旧值"""
+        with self._lock:
+            return self._upsert(vectors)
+
+    def _upsert(self, vectors: Iterable[dict]) -> dict:
+        import numpy as np
+        if self._row_of is None:
+            self._row_of = {str(i): r for r, i in enumerate(self._base_ids) if self._alive[r]}
+            self._row_of.update((i, len(self._base) + r) for r, i in enumerate(self._extra_ids))
+        count = 0
+        new_rows, stale = [], []
+        for item in vectors:
+            values = np.asarray(item["values"], dtype=np.float32)
+            if values.shape != (self.dim,):
+                raise ValueError(f"向量维度应为 {self.dim}，实际 {values.shape}")
+            old = self._row_of.get(item["id"])
+            if old is not None:
+                stale.append(old)  # 可能是本批内的行，等 alive 扩展后再置 False
+            row = self.count  # _extra_ids 已包含本批之前的行
+            self._row_of[item["id"]] = row
+            self._extra_ids.append(item["id"])
+            metadata = item.get("metadata")
+            self._extra_meta.append(json.dumps(metadata, ensure_ascii=False) if metadata else None)
+            new_rows.append(values)
+            count += 1
+        if new_rows:
+            block = np.stack(new_rows)
+            self._extra.append(_normalize(block) if self.metric == "cosine" else block)
+            alive = np.concatenate([self._alive, np.ones(len(new_rows), dtype=bool)])
+            alive[stale] = False
+            self._alive = alive
+        return {"upserted_count": count}
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            self._delete(ids)
+
+    def _delete(self, ids: Iterable[str]):
+        import numpy as np
+        for i in ids:
+            row = (self._row_of or {}).get(i)
+            if row is None:
+                rows = np.flatnonzero((self._base_ids == i) & self._alive[:len(self._base)])
+                row = rows[0] if len(rows) else None
+            if row is not None:
+                self._alive[row] = False
+
+    def _extra_matrix(self) -> "np.ndarray":
+        """增量区合并成一个矩阵（调用方需持有 _lock，否则会丢掉并发 upsert 刚追加的块）"""
+        import numpy as np
+        if len(self._extra) > 1:
+            self._extra = [np.concatenate(self._extra)]
+        return self._extra[0] if self._extra else np.zeros((0, self.dim), dtype=np.float32)
+
+    def _snapshot(self):
+        """查询用的一致视图：(增量区矩阵, alive, 总行数) 在同一把锁下读取，三者行数一致"""
+        with self._lock:
+            return self._extra_matrix(), self._alive, self.count
+
+    # ----- IVF 训练 -----
+    def build(self, nlist: Optional[int] = None, iterations: int = INDEX_CONFIG["KMEANS_ITERATIONS"],
+              seed: int = 0) -> "LocalIndex":
+        """合并增量区并训练 IVF：球面 k-means 粗聚类 → 每行分配到最近的桶"""
+        import numpy as np
+        if self._extra:
+            # 合并增量区，顺带丢弃被覆盖/删除的行
+            keep = np.flatnonzero(self._alive)
+            merged = np.concatenate([np.asarray(self._base, dtype=np.float32), self._extra_matrix()])[keep]
+            ids = np.concatenate([self._base_ids, np.array(self._extra_ids, dtype=str)])[keep]
+            meta = list(self._base_meta) + self._extra_meta
+            self._base, self._base_ids, self._base_meta = merged, ids, [meta[r] for r in keep]
+            self._extra, self._extra_ids, self._extra_meta = [], [], []
+            self._alive = np.ones(len(keep), dtype=bool)
+            self._source = None  # 已变为自有向量
+            self._row_of = None
+
+        alive_rows = np.flatnonzero(self._alive)
+        if len(alive_rows) == 0:
+            self._ivf = None
+            return self
+        nlist = min(nlist or default_nlist(len(alive_rows)), len(alive_rows))
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(alive_rows), nlist * INDEX_CONFIG["TRAIN_SAMPLE_PER_LIST"])
+        sample = np.asarray(self._base[np.sort(rng.choice(alive_rows, sample_size, replace=False))],
+                            dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            nonempty = counts > 0
+            starts = (np.cumsum(counts) - counts)[nonempty]
+            sums = centroids.copy()  # 空桶保持原中心
+            sums[nonempty] = np.add.reduceat(sample[np.argsort(assign, kind="stable")], starts, axis=0)
+            centroids = _normalize(sums)
+
+        assign = np.empty(len(self._base), dtype=np.int32)
+        for start in range(0, len(self._base), INDEX_CONFIG["CHUNK_ROWS"]):
+            block = np.asarray(self._base[start:start + INDEX_CONFIG["CHUNK_ROWS"]], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        self._ivf = (centroids.astype(np.float32), order, offsets)
+        return self
+
+    # ----- 查询 -----
+    def _prepare_query(self, vector) -> "np.ndarray":
+        import numpy as np
+        q = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return _normalize(q) if self.metric == "cosine" else q
+
+    def _top_k(self, rows: "np.ndarray", scores: "np.ndarray", top_k: int):
+        import numpy as np
+        if len(scores) > top_k:
+            keep = np.argpartition(-scores, top_k)[:top_k]
+            rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores)
+        return rows[order], scores[order]
+
+    def _candidates(self, q: "np.ndarray", nprobe: int) -> "np.ndarray":
+        import numpy as np
+        centroids, order, offsets = self._ivf
+        nprobe = min(nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ q), nprobe - 1)[:nprobe]
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+
+    def search(self, vector, top_k: int = 10, nprobe: int = INDEX_CONFIG["NPROBE"], exact: bool = False):
+        """返回 (行号数组, 分数数组)；exact=True 或未 build 时做全量暴力扫描"""
+        import numpy as np
+        q = self._prepare_query(vector)
+        extra, alive, count = self._snapshot()
+        if exact or self._ivf is None:
+            rows_list, scores_list = [], []
+            for start in range(0, len(self._base), INDEX_CONFIG["CHUNK_ROWS"]):
+                block = self._base[start:start + INDEX_CONFIG["CHUNK_ROWS"]]
+                scores = np.asarray(block @ q, dtype=np.float32)
+                scores[~alive[start:start + len(block)]] = -np.inf  # 已删除的行不参与排名
+                rows, scores = self._top_k(np.arange(start, start + len(block)), scores, top_k)
+                rows_list.append(rows)
+                scores_list.append(scores)
+            rows = np.concatenate(rows_list) if rows_list else np.zeros(0, dtype=np.int64)
+            scores = np.concatenate(scores_list) if scores_list else np.zeros(0, dtype=np.float32)
+        else:
+            rows = np.sort(self._candidates(q, nprobe))  # 排序后按文件顺序读取 memmap
+            scores = np.asarray(self._base[rows] @ q, dtype=np.float32)
+
+        if len(extra):
+            rows = np.concatenate([rows, np.arange(len(self._base), count)])
+            scores = np.concatenate([scores, extra @ q])
+
+        keep = alive[rows]
+        return self._top_k(rows[keep], scores[keep], top_k)
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False,
+              nprobe: int = INDEX_CONFIG["NPROBE"]) -> dict:
+        """与 Pinecone 相同的返回结构：{"matches": [{"id", "score", "metadata"}]}"""
+        rows, scores = self.search(vector, top_k, nprobe)
+        matches = []
+        for row, match_id, score in zip(rows, self._ids_at(rows), scores):
+            match = {"id": match_id, "score": float(score)}
+            if include_metadata:
+                match["metadata"] = self._meta_at(int(row))
+            matches.append(match)
+        return {"matches": matches}
+
+    # ----- 持久化 -----
+    def save(self, directory: str = INDEX_CONFIG["INDEX_DIR"]):
+        """保存到目录；向量来自 EmbeddingStore 时只记录其路径，不复制矩阵"""
+        import numpy as np
+        if self._extra:
+            self.build()  # 合并增量区后再保存
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        meta = {"dim": self.dim, "metric": self.metric, "count": len(self._base), "source": self._source}
+        if self._source is None:
+            np.save(directory / "vectors.npy", np.asarray(self._base, dtype=np.float32))
+        np.save(directory / "ids.npy", self._base_ids)
+        np.save(directory / "alive.npy", self._alive)
+        with open(directory / "metadata.jsonl", "w", encoding="utf-8") as f:
+            f.writelines(f"{raw or ''}\n" for raw in self._base_meta)
+        if self._ivf is not None:
+            centroids, order, offsets = self._ivf
+            np.save(directory / "centroids.npy", centroids)
+            np.save(directory / "order.npy", order)
+            np.save(directory / "offsets.npy", offsets)
+        (directory / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: str = INDEX_CONFIG["INDEX_DIR"]) -> "LocalIndex":
+        """快速加载：向量与倒排表均以 mmap 方式打开，无需重新训练"""
+        import numpy as np
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        index = cls(meta["dim"], meta["metric"])
+        source = meta["source"]
+        if source:
+            index._base = np.memmap(source["path"], dtype=source["dtype"], mode="r",
+                                    shape=(source["count"], meta["dim"]))
+        else:
+            index._base = np.load(directory / "vectors.npy", mmap_mode="r")
+        index._source = source
+        index._base_ids = np.load(directory / "ids.npy", mmap_mode="r")
+        index._alive = np.load(directory / "alive.npy")
+        with open(directory / "metadata.jsonl", encoding="utf-8") as f:
+            index._base_meta = [line.rstrip("\n") or None for line in f]
+        if (directory / "centroids.npy").exists():
+            index._ivf = (np.load(directory / "centroids.npy"),
+                          np.load(directory / "order.npy", mmap_mode="r"),
+                          np.load(directory / "offsets.npy"))
+        return index
+
+
+def benchmark_recall(index: LocalIndex, queries: "np.ndarray", top_k: int = 10,
+                     nprobes: Iterable[int] = (1, 2, 4, 8, 16, 32, 64)) -> List[dict]:
+    """召回率 vs 延迟：以暴力精确搜索为基准，逐个 nprobe 统计 recall@k 与 p50/p99 延迟"""
+    import numpy as np
+    import time
+
+    def timed(fn):
+        latencies, results = [], []
+        for q in queries:
+            start = time.perf_counter()
+            results.append(set(fn(q)[0].tolist()))
+            latencies.append((time.perf_counter() - start) * 1000)
+        return results, np.percentile(latencies, [50, 99])
+
+    truth, (p50, p99) = timed(lambda q: index.search(q, top_k, exact=True))
+    report = [{"method": "exact", "nprobe": None, "recall": 1.0, "p50_ms": p50, "p99_ms": p99}]
+    for nprobe in nprobes:
+        found, (p50, p99) = timed(lambda q: index.search(q, top_k, nprobe))
+        recall = float(np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)]))
+        report.append({"method": "ivf", "nprobe": nprobe, "recall": recall, "p50_ms": p50, "p99_ms": p99})
+    return report
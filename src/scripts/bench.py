@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from scripts import mockdata
+from scripts.medline import BACKENDS, iter_records
+from scripts.metrics import PROFILERS, compare, peak_rss_mb, run_metrics
+
+# ===== 基准测试配置 =====
+BENCH_CONFIG = {
+    "OUTPUT_DIR": "data/bench",
+    "SIZES": [1000, 100000, 1000000],  # 生成语料的文章数
+    "SEED": 42,
+}
+
+
+def ensure_corpus(output_dir: Path, size: int) -> Path:
+    """按规模生成（或复用）可复现的 MEDLINE 格式压测语料"""
+    corpus = output_dir / f"corpus_{size}.xml.gz"
+    if not corpus.exists():
+        print(f"⏳ 生成语料: {corpus}")
+        mockdata.write_shard(corpus, mockdata.CORPUS_CONFIG["START_PMID"], size, BENCH_CONFIG["SEED"])
+    return corpus
+
+
+def _run_parser(path: Path, backend: str) -> dict:
+    """在独立子进程中跑一次完整解析，保证峰值内存互不干扰"""
+    start = time.perf_counter()
+    count = sum(1 for _ in iter_records(path, backend=backend))
+    elapsed = time.perf_counter() - start
+    return {"records": count, "seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_parsers(sizes: List[int], backends: List[str], output_dir: Path) -> List[dict]:
+    """每个 (语料规模, 后端) 组合报告 records/sec 与峰值 RSS"""
+    results = []
+    spawn = multiprocessing.get_context("spawn")
+    for size in sizes:
+        corpus = ensure_corpus(output_dir, size)
+        for backend in backends:
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                run = pool.submit(_run_parser, corpus, backend).result()
+            run.update(size=size, backend=backend, records_per_sec=run["records"] / run["seconds"])
+            results.append(run)
+            print(f"  {size:>9} 篇 | {backend:<6} | {run['records_per_sec']:>10.0f} rec/s | "
+                  f"峰值 {run['peak_rss_mb'] or float('nan'):.1f} MB")
+    return results
+
+
+def _load_container(path: Path, container: str) -> dict:
+    """子进程任务：把整份语料解析进内存（dicts：原 list[dict] + DataFrame；lists：原 list[list]；
+    store：RecordStore + 零拷贝 DataFrame），报告峰值 RSS 及其相对导入后基线的增量。
+    三种容器的 PMID 都是解析出的原样字符串，内存差异只来自容器本身"""
+    import pandas as pd
+    from scripts.medline import RECORD_FIELDS
+    from scripts.recordstore import RecordStore
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if container == "dicts":
+        records = list(iter_records(path))
+        frame = pd.DataFrame.from_records(records, columns=RECORD_FIELDS)
+    elif container == "lists":
+        records = [[r["pmid"], r["title"], r["abstract"]] for r in iter_records(path)]
+        frame = None
+    else:
+        records = RecordStore.from_records(iter_records(path), RECORD_FIELDS)
+        frame = records.to_pandas()
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {"records": len(records), "seconds": elapsed, "peak_rss_mb": peak,
+            "delta_rss_mb": peak - baseline if peak and baseline else None,
+            "store_mb": records.nbytes / 2 ** 20 if container == "store" else None,
+            "dataframe": frame is not None}
+
+
+def bench_records(size: int, output_dir: Path, containers: List[str]) -> List[dict]:
+    """同一语料全部载入内存：list[dict] / list[list] 与紧凑 RecordStore 的峰值内存对比"""
+    corpus = ensure_corpus(output_dir, size)
+    spawn = multiprocessing.get_context("spawn")
+    results = []
+    for container in containers:
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+            run = pool.submit(_load_container, corpus, container).result()
+        run.update(size=size, container=container)
+        results.append(run)
+        store = f" | 缓冲区 {run['store_mb']:.1f} MB" if run["store_mb"] else ""
+        print(f"  {size:>9} 篇 | {container:<6} | 峰值 {run['peak_rss_mb'] or float('nan'):.1f} MB"
+              f"（增量 {run['delta_rss_mb'] or float('nan'):.1f} MB）| {run['seconds']:.1f}s{store}")
+    return results
+
+
+def _synthetic_vectors(path: Path, count: int, dim: int, seed: int = BENCH_CONFIG["SEED"]):
+    """生成带聚簇结构的归一化向量（模拟文本嵌入分布），分块写入 memmap，内存占用与规模无关"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 1000, 1), dim)).astype(np.float32)
+    vectors = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(count, dim))
+    for start in range(0, count, 65536):
+        n = min(65536, count - start)
+        block = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+        vectors[start:start + n] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    vectors.flush()
+    return np.load(path, mmap_mode="r")
+
+
+def bench_vectors(count: int, dim: int, num_queries: int, top_k: int, output_dir: Path,
+                  store_dir: Optional[str] = None) -> List[dict]:
+    """本地 IVF 索引 vs 暴力精确搜索：recall@k 与 p50/p99 延迟"""
+    import numpy as np
+    from aitools.vectorstore import LocalIndex, benchmark_recall
+
+    if store_dir:
+        from aitools.embedding import EmbeddingStore
+        index = LocalIndex.from_embedding_store(EmbeddingStore(store_dir))
+    else:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"vectors_{count}x{dim}.npy"
+        vectors = np.load(path, mmap_mode="r") if path.exists() else _synthetic_vectors(path, count, dim)
+        index = LocalIndex.from_arrays(vectors, np.arange(count))
+
+    start = time.perf_counter()
+    index.build()
+    print(f"⏳ IVF 训练完成: {index.count} 条向量，耗时 {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(BENCH_CONFIG["SEED"])
+    picks = np.sort(rng.choice(index.count, num_queries, replace=False))
+    queries = np.asarray(index.vectors[picks], dtype=np.float32) + 0.05 * rng.normal(size=(num_queries, index.dim))
+    report = benchmark_recall(index, queries.astype(np.float32), top_k)
+    for row in report:
+        print(f"  {row['method']:<5} nprobe={str(row['nprobe']):<4} | recall@{top_k} {row['recall']:.3f} | "
+              f"p50 {row['p50_ms']:.2f} ms | p99 {row['p99_ms']:.2f} ms")
+    return report
+
+
+def _synthetic_keyword_shard(shard_dir: Path, start_pmid: int, count: int, seed: int, vocab: int) -> dict:
+    """子进程任务：按 Zipf 分布生成词频接近真实语料的文档并直接建成一个分片"""
+    import numpy as np
+    from aitools.keyword_index import build_shard
+
+    rng = np.random.default_rng(seed)
+
+    def records():
+        for i in range(count):
+            words = rng.zipf(1.15, size=150)
+            yield {"pmid": str(start_pmid + i), "title": "",
+                   "abstract": " ".join(f"w{w}" for w in words[words < vocab])}
+    return build_shard(records(), shard_dir)
+
+
+def bench_keyword(count: int, num_queries: int, top_k: int, output_dir: Path, shard_size: int = 250000,
+                  vocab: int = 200000, workers: Optional[int] = None) -> dict:
+    """BM25 倒排索引：并行分片构建耗时、索引体积与两词查询的 p50/p99 延迟"""
+    import numpy as np
+    from aitools.keyword_index import KeywordIndex
+
+    index_dir = output_dir / f"keyword_{count}"
+    index = KeywordIndex(str(index_dir))
+    if index.num_docs != count:
+        (index_dir / "shards").mkdir(parents=True, exist_ok=True)
+        starts = list(range(0, count, shard_size))
+        names = [f"shard_{i:04d}" for i in range(len(starts))]
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_synthetic_keyword_shard, index_dir / "shards" / name, first + 1,
+                                   min(shard_size, count - first), BENCH_CONFIG["SEED"] + i, vocab)
+                       for i, (name, first) in enumerate(zip(names, starts))]
+            for name, future in zip(names, futures):
+                index.add_shard(name, future.result())
+        print(f"⏳ 索引构建完成: {count} 篇，{len(starts)} 个分片，耗时 {time.perf_counter() - start:.1f}s")
+
+    size_mb = sum(f.stat().st_size for f in index_dir.rglob("*") if f.is_file()) / 2 ** 20
+    rng = np.random.default_rng(BENCH_CONFIG["SEED"])
+    # 查询词取中频段（排名 50~20000），近似药名、疾病名一类的检索词
+    queries = [f"w{a} w{b}" for a, b in rng.integers(50, 20000, size=(num_queries, 2))]
+    index.search(queries[0], top_k)  # 预热 mmap
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"  {count} 篇 | 索引 {size_mb:.1f} MB | p50 {p50:.3f} ms | p99 {p99:.3f} ms")
+    return {"docs": count, "shards": len(index.shards), "index_mb": size_mb, "p50_ms": p50, "p99_ms": p99}
+
+
+def bench_dedup(size: int, output_dir: Path, threshold: float, dim: int = 384,
+                embed_docs_per_sec: float = 200.0) -> dict:
+    """生成语料上的近重复检测：去重比例、检测耗时，以及可省下的向量化与索引开销（按 dim 维 float32 估算）"""
+    from scripts.dedup import find_duplicates
+
+    corpus = ensure_corpus(output_dir, size)
+    result = find_duplicates(iter_records(corpus), threshold=threshold)
+    stats = result["stats"]
+    saved = stats["duplicates"]
+    report = {**stats, "size": size, "threshold": threshold, "docs_per_sec": stats["documents"] / stats["seconds"],
+              "duplicate_ratio": saved / max(stats["documents"], 1),
+              "saved_embed_seconds": saved / embed_docs_per_sec,
+              "saved_vector_mb": saved * dim * 4 / 2 ** 20,
+              "saved_tokens_ratio": stats["duplicate_tokens"] / max(stats["tokens"], 1)}
+    print(f"  {size} 篇 | 近重复 {saved} 篇（{report['duplicate_ratio']:.1%}，{stats['clusters']} 簇）| "
+          f"检测 {report['docs_per_sec']:.0f} 篇/s")
+    print(f"  可省: 编码 {report['saved_embed_seconds']:.0f}s（按 {embed_docs_per_sec:.0f} 篇/s）| "
+          f"向量 {report['saved_vector_mb']:.1f} MB | 计费 token {report['saved_tokens_ratio']:.1%}")
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--output-dir", default=BENCH_CONFIG["OUTPUT_DIR"], help="语料与结果目录")
+    common.add_argument("--profile", choices=PROFILERS, default=None, help="同时剖析本次基准")
+    common.add_argument("--baseline", default=None, help="基线指标 JSON（上次的 metrics_<bench>.json），耗时退化则非零退出")
+
+    parser = argparse.ArgumentParser(description="管线基准测试")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("parsers", parents=[common], help="XML解析后端：records/sec 与峰值内存")
+    p.add_argument("--sizes", type=int, nargs="+", default=BENCH_CONFIG["SIZES"])
+    p.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+
+    p = sub.add_parser("vectors", parents=[common], help="本地向量索引：召回率 vs 延迟（对比暴力搜索）")
+    p.add_argument("--count", type=int, default=1000000, help="合成向量条数")
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--store", default=None, help="改用已有 EmbeddingStore 目录中的真实向量")
+
+    p = sub.add_parser("keyword", parents=[common], help="BM25 倒排索引：构建耗时与查询延迟")
+    p.add_argument("--count", type=int, default=1000000, help="合成文档数")
+    p.add_argument("--shard-size", type=int, default=250000)
+    p.add_argument("--queries", type=int, default=1000)
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--workers", type=int, default=None)
+
+    p = sub.add_parser("dedup", parents=[common], help="MinHash/LSH 近重复检测：去重比例与节省的向量化开销")
+    p.add_argument("--size", type=int, default=100000, help="生成语料的文章数")
+    p.add_argument("--threshold", type=float, default=0.8)
+    p.add_argument("--dim", type=int, default=384, help="估算向量体积所用维度")
+    p.add_argument("--embed-docs-per-sec", type=float, default=200.0, help="估算编码耗时所用的编码吞吐")
+
+    p = sub.add_parser("records", parents=[common], help="内存中的记录容器：list[dict] / list[list] vs RecordStore（各列均为字符串）峰值内存")
+    p.add_argument("--size", type=int, default=100000, help="生成语料的文章数")
+    p.add_argument("--containers", nargs="+", choices=["dicts", "lists", "store"], default=["dicts", "lists", "store"])
+
+    args = parser.parse_args(argv)
+    output_dir = Path(args.output_dir)
+
+    metrics_path = output_dir / f"metrics_{args.bench}.json"
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    with run_metrics(f"bench_{args.bench}", metrics_path, args.profile) as metrics, metrics.stage(args.bench):
+        if args.bench == "parsers":
+            results = bench_parsers(args.sizes, args.backends, output_dir)
+        elif args.bench == "keyword":
+            results = bench_keyword(args.count, args.queries, args.top_k, output_dir, args.shard_size,
+                                    workers=args.workers)
+        elif args.bench == "records":
+            results = bench_records(args.size, output_dir, args.containers)
+        elif args.bench == "dedup":
+            results = bench_dedup(args.size, output_dir, args.threshold, args.dim, args.embed_docs_per_sec)
+        else:
+            results = bench_vectors(args.count, args.dim, args.queries, args.top_k, output_dir, args.store)
+
+        result_path = output_dir / f"bench_{args.bench}.json"
+        result_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"✅ 基准结果已保存: {result_path}")
+
+    if baseline:
+        current = json.loads(metrics_path.read_text(encoding="utf-8"))
+        regressions = compare(baseline, current)
+        for r in regressions:
+            print(f"⚠️ 退化: {r['stage']} {r['baseline_seconds']:.2f}s → {r['current_seconds']:.2f}s（+{r['change']:.0%}）")
+        if regressions:
+            raise SystemExit(1)
+        print("✅ 与基线相比无明显退化")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from scripts.sections import SECTION_RE, normalize_label, section_label
+
+# ===== 分块配置 =====
+CHUNK_CONFIG = {
+    "MAX_TOKENS": 200,     # 每块的词数上限（按空白切分近似 token）
+    "OVERLAP_TOKENS": 40,  # 相邻块重叠的词数（以整句为单位回退）
+    "MIN_TOKENS": 64,      # 不足该长度的段落与下一段合并，避免浪费向量槽位
+    "OUTPUT_DIR": "data/chunks",
+}
+
+# 句末标点 + 空白 + 大写/数字/括号开头视为句子边界；常见缩写后不切
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\[\"'])")
+_ABBREVIATIONS = ("e.g.", "i.e.", "et al.", "vs.", "Fig.", "approx.", "Dr.", "No.", "ca.")
+_TOKEN_RE = re.compile(r"\S+")
+
+
+def _sentence_spans(text: str, offset: int) -> Iterator[Tuple[int, int]]:
+    """段落内的句子区间（相对整段摘要的字符偏移，已去掉首尾空白）"""
+    start = 0
+    for m in _SENTENCE_END_RE.finditer(text):
+        if text[:m.start()].endswith(_ABBREVIATIONS):
+            continue
+        yield offset + start, offset + m.start()
+        start = m.end()
+    end = len(text.rstrip())
+    if end > start:
+        yield offset + start, offset + end
+
+
+def _units(abstract: str, max_tokens: int) -> List[tuple]:
+    """摘要 → [(段落类别, 起, 止, 词数)] 句子单元；超长句子按词窗口硬切"""
+    units = []
+    for m in SECTION_RE.finditer(abstract):
+        body = m.group("text")
+        lead = len(body) - len(body.lstrip())
+        section = normalize_label(section_label(m))
+        for start, end in _sentence_spans(body.strip(), m.start("text") + lead):
+            tokens = list(_TOKEN_RE.finditer(abstract, start, end))
+            for i in range(0, len(tokens), max_tokens):
+                piece = tokens[i:i + max_tokens]
+                units.append((section, piece[0].start(), piece[-1].end(), len(piece)))
+    return units
+
+
+def chunk_record(record: dict, max_tokens: int = CHUNK_CONFIG["MAX_TOKENS"],
+                 overlap_tokens: int = CHUNK_CONFIG["OVERLAP_TOKENS"],
+                 min_tokens: int = CHUNK_CONFIG["MIN_TOKENS"]) -> Iterator[dict]:
+    """一篇摘要 → 若干检索块
+
+    以句子为最小单位贪心装箱：不跨越段落边界，除非当前块或剩余部分不足 min_tokens；
+    相邻块回退若干整句形成约 overlap_tokens 的重叠。start/end 为块在 record["abstract"] 中的字符区间，
+    text 为块内句子以空格拼接（跨段落时不含 "[LABEL]" 标记）。
+    没有摘要的记录输出一个 section 为 "TITLE" 的标题块（start = end = 0），避免仅有标题的文献在检索中消失。
+    """
+    abstract = record["abstract"] or ""
+    units = _units(abstract, max_tokens)
+    if not units:
+        title = (record["title"] or "").strip()
+        if title:
+            yield {"chunk_id": f"{record['pmid']}#0", "pmid": record["pmid"], "title": record["title"],
+                   "section": "TITLE", "start": 0, "end": 0, "tokens": len(_TOKEN_RE.findall(title)),
+                   "text": title}
+        return
+    remaining = [0] * (len(units) + 1)  # remaining[j] = 第 j 句及之后的总词数
+    for k in range(len(units) - 1, -1, -1):
+        remaining[k] = remaining[k + 1] + units[k][3]
+    i, n = 0, 0
+    while i < len(units):
+        j, tokens = i, 0
+        while j < len(units):
+            if j > i and tokens + units[j][3] > max_tokens:
+                break
+            if j > i and units[j][0] != units[j - 1][0] and tokens >= min_tokens and remaining[j] >= min_tokens:
+                break
+            tokens += units[j][3]
+            j += 1
+        piece = units[i:j]
+        sections = list(dict.fromkeys(u[0] for u in piece))
+        yield {"chunk_id": f"{record['pmid']}#{n}", "pmid": record["pmid"], "title": record["title"],
+               "section": "+".join(sections), "start": piece[0][1], "end": piece[-1][2], "tokens": tokens,
+               "text": " ".join(abstract[u[1]:u[2]] for u in piece)}
+        n += 1
+        if j >= len(units):
+            break
+        # 回退整句形成重叠，但至少前进一句，且不回退到上一个段落
+        back, overlap = j, 0
+        while back - 1 > i and overlap + units[back - 1][3] <= overlap_tokens \
+                and units[back - 1][0] == units[j][0]:
+            back -= 1
+            overlap += units[back][3]
+        i = back
+
+
+def iter_chunks(records: Iterable[dict], **options) -> Iterator[dict]:
+    """记录流 → 块流（惰性，不会整体载入语料）"""
+    for record in records:
+        yield from chunk_record(record, **options)
+
+
+def _chunk_file(path: Path, output_path: Path, options: dict) -> Tuple[int, int]:
+    """子进程任务：一个数据集文件 → 一个块 JSONL（先写临时文件再原子重命名）"""
+    from scripts.dataset import iter_dataset
+
+    records = chunks = 0
+    tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in iter_dataset(path):
+            records += 1
+            for chunk in chunk_record(record, **options):
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                chunks += 1
+    os.replace(tmp_path, output_path)
+    return records, chunks
+
+
+def chunk_corpus(inputs: List[Path], output_dir: Path, workers: Optional[int] = None, **options) -> dict:
+    """多进程分块：每个输入文件一个任务，输出 <output_dir>/<文件名>.chunks.jsonl，已存在的跳过"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    todo = [(p, output_dir / f"{p.name}.chunks.jsonl") for p in inputs]
+    todo = [(p, out) for p, out in todo if not out.exists()]
+    if len(todo) < len(inputs):
+        print(f"⏭️ 跳过已分块文件: {len(inputs) - len(todo)} 个")
+
+    stats = {"records": 0, "chunks": 0}
+    start = time.perf_counter()
+    if todo:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from tqdm import tqdm
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(_chunk_file, p, out, options): p for p, out in todo}
+            with tqdm(total=len(futures), desc="分块", unit="file") as bar:
+                for future in as_completed(futures):
+                    records, chunks = future.result()
+                    stats["records"] += records
+                    stats["chunks"] += chunks
+                    elapsed = time.perf_counter() - start
+                    bar.set_postfix(chunks_per_sec=f"{stats['chunks'] / elapsed:.0f}")
+                    bar.update(1)
+    stats["seconds"] = time.perf_counter() - start
+    stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    from scripts.crawler import expand_inputs
+    from scripts.metrics import add_metrics_arguments, path_bytes, run_metrics
+
+    parser = argparse.ArgumentParser(description="摘要分块：按段落与句子切分为检索大小的片段")
+    parser.add_argument("inputs", nargs="+", help="数据集文件或通配符（.xml.gz / CSV / Parquet / .sqlite）")
+    parser.add_argument("--output-dir", default=CHUNK_CONFIG["OUTPUT_DIR"])
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_CONFIG["MAX_TOKENS"])
+    parser.add_argument("--overlap-tokens", type=int, default=CHUNK_CONFIG["OVERLAP_TOKENS"])
+    parser.add_argument("--min-tokens", type=int, default=CHUNK_CONFIG["MIN_TOKENS"])
+    parser.add_argument("--workers", type=int, default=None)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    inputs = expand_inputs(args.inputs)
+    with run_metrics("chunking", args.metrics, args.profile) as metrics:
+        with metrics.stage("chunk", bytes_in=sum(path_bytes(p) for p in inputs)):
+            stats = chunk_corpus(inputs, Path(args.output_dir), args.workers, max_tokens=args.max_tokens,
+                                 overlap_tokens=args.overlap_tokens, min_tokens=args.min_tokens)
+        metrics.count("chunk", records=stats["chunks"], bytes_out=path_bytes(args.output_dir))
+        print(f"✅ {stats['records']} 篇摘要 → {stats['chunks']} 个块，{stats['chunks_per_sec']:.0f} chunks/s，"
+              f"耗时 {stats['seconds']:.1f}s → {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+# 子命令 → (模块, 说明)。模块只在执行对应子命令时才导入：
+# `medical-ai --help` 与轻量子命令不会加载 pandas / lxml / sentence-transformers / langextract
+COMMANDS = {
+    "download": ("scripts.downloader", "并发下载 MEDLINE 文件（断点续传 + MD5 校验）"),
+    "parse": ("scripts.crawler", "解析 MEDLINE XML → CSV / Parquet（--batch 多文件并行）"),
+    "delta": ("scripts.delta", "按 PMID 增量应用 baseline / 每日更新文件"),
+    "generate-mock": ("scripts.mockdata", "生成模拟 PubMed 数据或大规模压测语料"),
+    "dedup": ("scripts.dedup", "MinHash + LSH 近重复检测"),
+    "chunk": ("scripts.chunking", "摘要按段落与句子分块"),
+    "embed": ("aitools.embedding", "本地模型批量向量化（sentence-transformers）"),
+    "embed-dashscope": ("aitools.dashscope_embed", "DashScope 接口批量向量化"),
+    "index": ("aitools.keyword_index", "构建 / 查询 BM25 关键词索引"),
+    "upsert": ("aitools.upsert", "向量批量写入 Pinecone 或本地索引"),
+    "extract": ("aitools.batch_extract", "langextract 批量实体抽取"),
+    "query": ("aitools.query_service", "常驻混合检索服务（向量 + BM25）"),
+    "bench": ("scripts.bench", "管线基准测试"),
+    "metrics": ("scripts.metrics", "查看 / 比较运行指标 JSON"),
+}
+
+
+def main(argv: Optional[List[str]] = None):
+    epilog = "子命令:\n" + "\n".join(f"  {name:<17}{help_text}" for name, (_, help_text) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="medical-ai", description="医疗 AI 数据管线统一入口（各子命令的参数见 medical-ai <子命令> --help）",
+        epilog=epilog, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS, metavar="<子命令>")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    sys.argv[0] = f"medical-ai {args.command}"  # 子命令 argparse 的 prog 取自 argv[0]
+    return module.main(args.args)
+
+
+if __name__ == "__main__":
+    main()
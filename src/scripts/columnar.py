@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+# ===== 列式存储配置 =====
+PARQUET_CONFIG = {
+    "COMPRESSION": "zstd",    # zstd 压缩率高；追求速度可改 snappy
+    "BATCH_SIZE": 10000,      # 每攒够 1 万条写一个 RecordBatch
+    "PARTITION_KEY": "source_file",
+}
+
+
+def _require_pyarrow():
+    """pyarrow 为可选依赖：pip install medical_ai_xinhe[parquet]"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet 输出需要 pyarrow：pip install medical_ai_xinhe[parquet]") from e
+    return pa, pq
+
+
+def partition_path(root: Path, source_file: str) -> Path:
+    """Hive 风格分区目录：<root>/source_file=<文件名>/part-0.parquet"""
+    return Path(root) / f"{PARQUET_CONFIG['PARTITION_KEY']}={source_file}" / "part-0.parquet"
+
+
+def write_partition(records: Iterable[dict], root: Path, source_file: str,
+                    columns: Optional[Sequence[str]] = None,
+                    compression: str = PARQUET_CONFIG["COMPRESSION"],
+                    batch_size: int = PARQUET_CONFIG["BATCH_SIZE"]) -> int:
+    """边解析边写：按批追加 RecordBatch 到该源文件的分区，全程只保留一批在内存
+
+    先写临时文件再原子重命名，分区文件存在即代表完整（供断点续跑判断）；
+    给定 columns 时即使没有记录也会写出空分区
+    """
+    pa, pq = _require_pyarrow()
+    out_path = partition_path(root, source_file)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(f".{out_path.name}.tmp")  # "." 开头的文件 pyarrow 读取时会忽略
+
+    def open_writer(names):
+        # 所有字段统一为字符串（pmid 可能是 "N/A"）
+        schema = pa.schema([(name, pa.string()) for name in names])
+        return pq.ParquetWriter(tmp_path, schema, compression=compression)
+
+    records = iter(records)
+    writer = open_writer(columns) if columns else None
+    total = 0
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            if writer is None:
+                writer = open_writer(batch[0])
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=writer.schema))
+            total += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        return 0  # 空文件不生成分区
+    os.replace(tmp_path, out_path)
+    return total
+
+
+def read_columns(root: Path, columns: Optional[Sequence[str]] = ("pmid", "title"),
+                 source_files: Optional[List[str]] = None):
+    """只读取需要的列（列裁剪 + 分区裁剪），返回 DataFrame"""
+    _, pq = _require_pyarrow()
+    filters = [(PARQUET_CONFIG["PARTITION_KEY"], "in", source_files)] if source_files else None
+    table = pq.read_table(root, columns=list(columns) if columns else None,
+                          partitioning="hive", filters=filters)
+    return table.to_pandas()
+
+
+def iter_rows(root: Path, columns: Optional[Sequence[str]] = None,
+              batch_size: int = PARQUET_CONFIG["BATCH_SIZE"]) -> Iterator[dict]:
+    """按批流式读取数据集的每一行（dict），内存中只保留一批"""
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    for batch in dataset.to_batches(columns=list(columns) if columns else None, batch_size=batch_size):
+        yield from batch.to_pylist()
@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*- 
 
+import argparse
+import glob
 import os
-import gzip
+import sys
 import shutil
 from pathlib import Path
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup  
-from tqdm import tqdm # 进度条
+from typing import TYPE_CHECKING, Iterator, List, Optional
+
+from scripts.columnar import partition_path, write_partition
+from scripts.medline import BACKENDS, DEFAULT_BACKEND, RECORD_FIELDS, iter_records
+from scripts.metrics import add_metrics_arguments, path_bytes, run_metrics
+
+# pandas / requests / BeautifulSoup / tqdm 在用到的函数里再导入：
+# expand_inputs 等被多个脚本复用，导入本模块不应付出数百毫秒的依赖加载
+if TYPE_CHECKING:
+    import pandas as pd
+    from scripts.recordstore import RecordStore
 
 # ===== 企业级配置（避免硬编码）=====
 CONFIG = {
@@ -18,51 +27,170 @@ CONFIG = {
 }
 
 
-def parse_medline_xml(xml_path: str, max_records: int) -> pd.DataFrame:
-    """精准解析PubMed XML（医药数据关键）"""
-    records = []
-    #open(xml_path, 'rb').read(3)  # 检查BOM头
-    with open(xml_path, 'rb') as f:  # 显式指定UTF-8
-        soup = BeautifulSoup(f, 'lxml-xml')  # 用lxml解析XML
-        
-        for i, article in enumerate(soup.find_all('PubmedArticle')):
-            if i >= max_records:
-                break
-            
-            # 企业级字段提取（医药场景关键）
-            pmid = article.find('PMID').text if article.find('PMID') else "N/A"
-            title = article.find('ArticleTitle').text if article.find('ArticleTitle') else "N/A"
-            abstract = ""
-            
-            # 处理多段摘要（PubMed常见结构）
-            if article.find('Abstract'):
-                for abstract_text in article.find('Abstract').find_all('AbstractText'):
-                    label = abstract_text.get('Label', '')
-                    text = abstract_text.text
-                    abstract += f"[{label}] {text}\n" if label else text + "\n"
-            
-            records.append({
-                "pmid": pmid,
-                "title": title.strip(),
-                "abstract": abstract.strip()
-            })
-    
-    return pd.DataFrame(records)
-
-def main():
-    # 1. 下载压缩文件
-    os.makedirs(CONFIG["OUTPUT_DIR"], exist_ok=True)
-    download_path = Path(CONFIG["OUTPUT_DIR"]) / CONFIG["TARGET_FILE"]
-    # download_file(CONFIG["BASE_URL"] + CONFIG["TARGET_FILE"], download_path)
-    
-    # 2. 解压文件
-    xml_path = Path(CONFIG["OUTPUT_DIR"]) /"medline19n0001.xml"
-    
-    # 3. 解析XML → CSV
-    df = parse_medline_xml(xml_path, CONFIG["MAX_RECORDS"])
-    output_csv = Path(CONFIG["OUTPUT_DIR"]) / "pubmed_sample.csv"
-    df.to_csv(output_csv, index=False)
-    print(f"✅ 生成样本数据: {output_csv} (共{len(df)}条)")
+def iter_medline_records(xml_path: str, max_records: Optional[int] = None,
+                         backend: str = DEFAULT_BACKEND) -> Iterator[dict]:
+    """流式解析PubMed XML：逐条产出记录，处理完立即释放节点（内存不随文件增长）"""
+    return iter_records(xml_path, max_records, backend)
+
+
+def load_medline_records(xml_path: str, max_records: Optional[int],
+                         backend: str = DEFAULT_BACKEND) -> "RecordStore":
+    """边解析边写入紧凑的列式容器（每列一段 UTF-8 缓冲 + 偏移量），不生成中间的 dict 列表"""
+    from scripts.recordstore import RecordStore
+    return RecordStore.from_records(iter_medline_records(xml_path, max_records, backend), RECORD_FIELDS)
+
+
+def parse_medline_xml(xml_path: str, max_records: Optional[int],
+                      backend: str = DEFAULT_BACKEND) -> "pd.DataFrame":
+    """精准解析PubMed XML（医药数据关键）；各列均为字符串（pmid 保持原样），
+    装有 pyarrow 时 DataFrame 直接引用 RecordStore 的缓冲区"""
+    return load_medline_records(xml_path, max_records, backend).to_pandas()
+
+def expand_inputs(patterns: List[str]) -> List[Path]:
+    """展开文件列表/通配符（如 data/medline19n*.xml.gz），去重并排序"""
+    paths = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        paths.update(Path(m) for m in (matches or ([pattern] if os.path.exists(pattern) else [])))
+    return sorted(paths)
+
+
+def _part_path(parts_dir: Path, xml_path: Path, fmt: str = "csv") -> Path:
+    """单个源文件对应的分片输出（medline19n0001.xml.gz → medline19n0001.csv / Parquet分区）"""
+    if fmt == "parquet":
+        return partition_path(parts_dir, xml_path.name)
+    name = xml_path.name
+    for suffix in (".gz", ".xml"):
+        name = name[:-len(suffix)] if name.endswith(suffix) else name
+    return parts_dir / f"{name}.csv"
+
+
+def _parse_to_part(xml_path: Path, part_path: Path, max_records: Optional[int], fmt: str = "csv",
+                   backend: str = DEFAULT_BACKEND) -> int:
+    """子进程任务：解析一个文件 → 写分片（先写临时文件再原子重命名，保证分片完整）"""
+    if fmt == "parquet":
+        # 分区目录即数据集根目录的下两级：<root>/source_file=<name>/part-0.parquet
+        records = iter_medline_records(xml_path, max_records, backend)
+        return write_partition(records, part_path.parent.parent, xml_path.name, columns=RECORD_FIELDS)
+    df = parse_medline_xml(xml_path, max_records, backend)
+    df.insert(0, "source_file", xml_path.name)
+    tmp_path = part_path.with_suffix(".csv.tmp")
+    df.to_csv(tmp_path, index=False, na_rep="N/A")
+    os.replace(tmp_path, part_path)
+    return len(df)
+
+
+def merge_parts(part_paths: List[Path], output_csv: Path) -> None:
+    """按顺序拼接分片CSV为一个数据集（只保留第一个表头，不整体载入内存）"""
+    with open(output_csv, "wb") as out:
+        for i, part_path in enumerate(part_paths):
+            with open(part_path, "rb") as part:
+                header = part.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(part, out)
+
+
+def parse_batch(inputs: List[Path], output: Path, max_records: Optional[int] = None,
+                workers: Optional[int] = None, fmt: str = "csv", backend: str = DEFAULT_BACKEND) -> int:
+    """多进程批量解析：每个文件一个任务，已完成的分片直接跳过（可断点续跑）
+
+    fmt="csv"：分片CSV合并为 output；fmt="parquet"：output 为按源文件分区的 Parquet 数据集目录
+    """
+    parts_dir = output if fmt == "parquet" else output.parent / f"{output.stem}_parts"
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    part_paths = [_part_path(parts_dir, p, fmt) for p in inputs]
+
+    todo = [(p, part) for p, part in zip(inputs, part_paths) if not part.exists()]
+    skipped = len(inputs) - len(todo)
+    if skipped:
+        print(f"⏭️ 跳过已完成文件: {skipped} 个")
+
+    workers = workers or os.cpu_count() or 1
+    total = 0
+    if todo:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from tqdm import tqdm  # 进度条
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(_parse_to_part, p, part, max_records, fmt, backend): p for p, part in todo}
+            with tqdm(total=len(futures), desc="解析MEDLINE", unit="file") as bar:
+                for future in as_completed(futures):
+                    total += future.result()
+                    bar.set_postfix(file=futures[future].name, records=total)
+                    bar.update(1)
+
+    if fmt == "csv":
+        merge_parts(part_paths, output)
+    return total
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="PubMed MEDLINE 下载与解析")
+    parser.add_argument("--batch", nargs="+", metavar="PATTERN",
+                        help="批量模式：文件列表或通配符，如 'data/medline19n*.xml.gz'")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认=CPU核数）")
+    parser.add_argument("--max-records", type=int, default=None, help="每个文件最多解析的记录数")
+    parser.add_argument("--output", default=None, help="输出路径（CSV文件或Parquet数据集目录）")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="输出格式：parquet 为按源文件分区的 zstd 列式存储")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="XML解析后端")
+    parser.add_argument("--download-all", action="store_true",
+                        help="并发下载 BASE_URL 目录下全部 .xml.gz 后批量解析")
+    parser.add_argument("--download", action="store_true",
+                        help="单文件模式下先从 BASE_URL 下载 TARGET_FILE（默认不联网，直接解析本地文件）")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with run_metrics("crawler", args.metrics, args.profile) as metrics:
+        if args.batch or args.download_all:
+            if args.download_all:
+                from scripts.downloader import download_all
+                with metrics.stage("download"):
+                    inputs, download_stats = download_all(CONFIG["BASE_URL"], CONFIG["OUTPUT_DIR"],
+                                                          workers=args.workers or 8)
+            else:
+                inputs = expand_inputs(args.batch)
+            if not inputs:
+                parser.error(f"没有匹配的输入文件: {args.batch or CONFIG['BASE_URL']}")
+            default_name = "pubmed_baseline.parquet" if args.format == "parquet" else "pubmed_baseline.csv"
+            output = Path(args.output or Path(CONFIG["OUTPUT_DIR"]) / default_name)
+            # 解压 + 解析 + 写分片都在子进程内完成，父进程按整体计时
+            with metrics.stage("parse", bytes_in=sum(path_bytes(p) for p in inputs)):
+                total = parse_batch(inputs, output, args.max_records, args.workers, args.format, args.backend)
+            metrics.count("parse", records=total, bytes_out=path_bytes(output))
+            print(f"✅ 批量解析完成: {output} (共{len(inputs)}个文件)")
+            if args.download_all and download_stats["failed"]:
+                sys.exit(1)  # 已解析下载成功的文件；失败的文件重新运行即可补齐
+            return
+
+        # 1. 下载压缩文件（可选：会覆盖本地的 data/<TARGET_FILE>）
+        os.makedirs(CONFIG["OUTPUT_DIR"], exist_ok=True)
+        download_path = Path(CONFIG["OUTPUT_DIR"]) / CONFIG["TARGET_FILE"]
+        if args.download:
+            from scripts.downloader import download_file
+            with metrics.stage("download"):
+                download_file(CONFIG["BASE_URL"] + CONFIG["TARGET_FILE"], download_path)
+            metrics.count("download", bytes_out=path_bytes(download_path))
+
+        # 2. 解析XML → CSV/Parquet（.gz 边解压边解析，无需先解压落盘）
+        max_records = CONFIG["MAX_RECORDS"] if args.max_records is None else args.max_records
+        if args.format == "parquet":
+            output = Path(args.output or Path(CONFIG["OUTPUT_DIR"]) / "pubmed_sample.parquet")
+            records = metrics.track("parse", iter_medline_records(download_path, max_records, args.backend))
+            with metrics.stage("write"):
+                total = write_partition(records, output, download_path.name, columns=RECORD_FIELDS)
+            metrics.count("write", records=total, bytes_out=path_bytes(output))
+            print(f"✅ 生成样本数据: {output} (共{total}条)")
+            return
+
+        with metrics.stage("parse", bytes_in=path_bytes(download_path)):
+            df = parse_medline_xml(download_path, max_records, args.backend)
+        metrics.count("parse", records=len(df))
+        output_csv = Path(args.output or Path(CONFIG["OUTPUT_DIR"]) / "pubmed_sample.csv")
+        with metrics.stage("write", records=len(df)):
+            df.to_csv(output_csv, index=False, na_rep="N/A")
+        metrics.count("write", bytes_out=path_bytes(output_csv))
+        print(f"✅ 生成样本数据: {output_csv} (共{len(df)}条)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
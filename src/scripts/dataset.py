@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import csv
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from scripts.sections import sections_from_pairs, split_sections
+
+# parse_pubmed 输出的列 → NLM 类别
+_PARSE_PUBMED_SECTIONS = {"Background": "BACKGROUND", "Method": "METHODS", "Results": "RESULTS"}
+
+
+def _from_row(row: dict) -> dict:
+    """统一 crawler（pmid/title/abstract）与 parse_pubmed（PMID/ArticleTitle/...）两种表格格式"""
+    if "PMID" in row:
+        pairs = [(label, row.get(column) or "") for column, label in _PARSE_PUBMED_SECTIONS.items()]
+        sections = sections_from_pairs(pairs)
+        abstract = "\n".join(f"[{label}] {text}" for label, text in sections.items())
+        return {"pmid": row["PMID"], "title": row["ArticleTitle"], "abstract": abstract, "sections": sections}
+    abstract = row.get("abstract") or ""
+    return {"pmid": str(row["pmid"]), "title": row.get("title") or "", "abstract": abstract,
+            "sections": split_sections(abstract)}
+
+
+def _iter_csv(path: Path) -> Iterator[dict]:
+    csv.field_size_limit(2 ** 31 - 1)  # 长摘要会超过默认的 128KB 字段上限
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield _from_row(row)
+
+
+def iter_dataset(path: Union[str, Path], max_records: Optional[int] = None) -> Iterator[dict]:
+    """按统一记录结构流式读取任意阶段的产物：.xml/.xml.gz、CSV、Parquet 数据集、PMID 索引(.sqlite)"""
+    if max_records is not None and max_records <= 0:
+        return
+    path = Path(path)
+    name = path.name
+    if name.endswith((".xml", ".xml.gz")):
+        from scripts.medline import iter_records
+        records = iter_records(path, max_records)
+        max_records = None  # iter_records 已自行截断
+    elif name.endswith(".csv"):
+        records = _iter_csv(path)
+    elif name.endswith(".sqlite"):
+        from scripts.delta import PmidIndex
+
+        def iter_index():
+            with PmidIndex(str(path)) as index:
+                for record in index.changed_since(0):
+                    if not record["deleted"]:
+                        record["sections"] = split_sections(record["abstract"])
+                        yield record
+        records = iter_index()
+    elif path.is_dir() or name.endswith(".parquet"):
+        from scripts.columnar import iter_rows
+        records = (_from_row(row) for row in iter_rows(path))
+    else:
+        raise ValueError(f"无法识别的数据集格式: {path}")
+
+    for i, record in enumerate(records, 1):
+        yield record
+        if max_records is not None and i >= max_records:
+            break
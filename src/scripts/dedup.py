@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import csv
+import re
+import time
+import zlib
+from functools import lru_cache
+from itertools import chain, islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Set
+
+# numpy / tqdm 在函数内导入：`medical-ai dedup --help` 与只用 iter_unique 的 embedding 都不必加载
+if TYPE_CHECKING:
+    import numpy as np
+
+# ===== 近重复检测配置 =====
+DEDUP_CONFIG = {
+    "NUM_PERM": 128,      # MinHash 签名长度（每篇 512 字节）
+    "BANDS": 16,          # LSH 分带数；每带 NUM_PERM / BANDS = 8 行，候选阈值约 (1/16)^(1/8) ≈ 0.71
+    "SHINGLE": 3,         # 词级 shingle 长度
+    "THRESHOLD": 0.8,     # 签名估计的 Jaccard 相似度 ≥ 该值视为近重复
+    "BATCH_SIZE": 1000,   # 每批文档一次性计算签名（矩阵 ≈ 批内 shingle 数 × NUM_PERM × 8 字节）
+    "SEED": 1,
+    "OUTPUT": "data/duplicates.csv",
+}
+
+_WORD_RE = re.compile(r"\w+")
+_LABEL_RE = re.compile(r"\[[A-Z ]+\]")  # 摘要中的 "[BACKGROUND]" 等段落标记不参与比较
+
+
+@lru_cache(maxsize=1 << 20)
+def _token_hash(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def record_tokens(record: dict) -> List[str]:
+    """参与比较的词序列：标题 + 摘要，小写、去段落标记"""
+    text = _LABEL_RE.sub(" ", f"{record['title']}\n{record['abstract'] or ''}")
+    return _WORD_RE.findall(text.lower())
+
+
+class MinHasher:
+    """词级 shingle 的 MinHash 签名，整批在 NumPy 中计算
+
+    每个 shingle 先合成一个 64 位哈希，再用 NUM_PERM 个 multiply-shift 哈希 ((a·x + b) mod 2^64) >> 32
+    模拟随机置换，按文档分段取最小值（np.minimum.reduceat）。同一 seed 的签名可跨进程、跨批次比较。
+    """
+
+    def __init__(self, num_perm: int = DEDUP_CONFIG["NUM_PERM"], shingle: int = DEDUP_CONFIG["SHINGLE"],
+                 seed: int = DEDUP_CONFIG["SEED"]):
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)  # 奇数乘子
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._mix = rng.integers(1, 2 ** 63, size=shingle, dtype=np.uint64) | np.uint64(1)
+
+    def _shingles(self, docs: List[List[str]]) -> tuple:
+        """一批文档 → (所有 shingle 哈希, 每篇起始下标)；不足 shingle 个词的文档整体算一个 shingle"""
+        import numpy as np
+        k = self.shingle
+        lengths = np.fromiter((max(len(d), k) for d in docs), dtype=np.int64, count=len(docs))
+        hashes = np.fromiter((_token_hash(t) for d in docs for t in chain(d, [""] * (k - len(d)))),
+                             dtype=np.uint64, count=int(lengths.sum()))
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        windows = len(hashes) - k + 1
+        shingles = np.zeros(windows, dtype=np.uint64)
+        for j in range(k):
+            shingles += hashes[j:j + windows] * self._mix[j]  # uint64 乘加自然回绕
+        # 跨越文档边界的窗口作废；每篇保留 length - k + 1 个
+        counts = lengths - k + 1
+        keep = np.repeat(starts, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+        return shingles[keep], np.cumsum(counts) - counts
+
+    def signatures(self, docs: List[List[str]]) -> "np.ndarray":
+        """词序列列表 → (n, NUM_PERM) uint32 签名；空文档的签名全为 0xFFFFFFFF"""
+        import numpy as np
+        out = np.full((len(docs), self.num_perm), 0xFFFFFFFF, dtype=np.uint32)
+        nonempty = [i for i, d in enumerate(docs) if d]
+        if not nonempty:
+            return out
+        shingles, starts = self._shingles([docs[i] for i in nonempty])
+        hashed = (shingles[:, None] * self.a[None, :] + self.b[None, :]) >> np.uint64(32)
+        out[nonempty] = np.minimum.reduceat(hashed & np.uint64(0xFFFFFFFF), starts, axis=0).astype(np.uint32)
+        return out
+
+
+def _band_keys(signatures: "np.ndarray", bands: int) -> "np.ndarray":
+    """(n, NUM_PERM) → (n, bands) uint64：每带的若干行合成一个桶键"""
+    import numpy as np
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    mix = np.random.default_rng(0).integers(1, 2 ** 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    blocks = signatures[:, :bands * rows].reshape(n, bands, rows).astype(np.uint64)
+    return (blocks * mix).sum(axis=2, dtype=np.uint64)
+
+
+def _union(n: int, left: "np.ndarray", right: "np.ndarray") -> "np.ndarray":
+    """向量化并查集：反复取边两端的最小标号并做指针跳转，返回每个节点所在簇的最小下标"""
+    import numpy as np
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        before = labels.copy()
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, before):
+            return labels
+
+
+def lsh_clusters(signatures: "np.ndarray", bands: int = DEDUP_CONFIG["BANDS"],
+                 threshold: float = DEDUP_CONFIG["THRESHOLD"], valid: Optional["np.ndarray"] = None) -> tuple:
+    """LSH 分桶 + 签名相似度复核 → (labels, similarity)
+
+    labels[i] 为 i 所在近重复簇中最早出现的文档下标（非重复文档为自身）；
+    similarity[i] 为 i 与簇中相邻候选的估计 Jaccard（非重复为 0）。
+    每个带内按桶键排序，只比较排序后相邻的同桶文档，候选对数与文档数成线性关系；
+    相似关系经并查集传递合并。valid=False 的文档（如空摘要）不参与。
+    """
+    import numpy as np
+    n = len(signatures)
+    keys = _band_keys(signatures, bands)
+    # 先剔除无效文档再排序：否则它们夹在同桶文档之间，会切断相邻比较链
+    candidates = np.arange(n) if valid is None else np.flatnonzero(valid)
+    pairs = []
+    for band in range(bands):
+        order = candidates[np.argsort(keys[candidates, band], kind="stable")]
+        sorted_keys = keys[order, band]
+        same = sorted_keys[1:] == sorted_keys[:-1]
+        pairs.append(np.stack([order[:-1][same], order[1:][same]], axis=1))
+    pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+    pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+
+    # 分块复核，避免一次展开 (候选对数 × NUM_PERM) 的比较矩阵
+    similarity = np.zeros(n, dtype=np.float32)
+    verified = []
+    for start in range(0, len(pairs), 65536):
+        chunk = pairs[start:start + 65536]
+        est = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+        hit = est >= threshold
+        verified.append(chunk[hit])
+        np.maximum.at(similarity, chunk[hit, 1], est[hit].astype(np.float32))
+        np.maximum.at(similarity, chunk[hit, 0], est[hit].astype(np.float32))
+    verified = np.concatenate(verified) if verified else np.zeros((0, 2), dtype=np.int64)
+    labels = _union(n, verified[:, 0], verified[:, 1])
+    similarity[labels == np.arange(n)] = 0.0  # 代表文档自身不算重复
+    return labels, similarity
+
+
+def find_duplicates(records: Iterable[dict], hasher: Optional[MinHasher] = None,
+                    bands: int = DEDUP_CONFIG["BANDS"], threshold: float = DEDUP_CONFIG["THRESHOLD"],
+                    batch_size: int = DEDUP_CONFIG["BATCH_SIZE"], progress: bool = True) -> dict:
+    """流式计算签名（内存只保留签名矩阵，每篇 NUM_PERM × 4 字节），再整体分桶聚簇
+
+    返回 {"pmids", "labels", "similarity", "tokens", "stats"}；重复文档即 labels[i] != i，
+    其代表文档为 pmids[labels[i]]（按输入顺序最早出现的那篇）。摘要为空的文档不参与判重，始终保留。
+    """
+    import numpy as np
+    from tqdm import tqdm
+    hasher = hasher or MinHasher()
+    records = iter(records)
+    pmids, blocks, tokens, has_abstract = [], [], [], []
+    start = time.perf_counter()
+    with tqdm(desc="MinHash", unit="doc", disable=not progress) as bar:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            docs = [record_tokens(r) for r in batch]
+            pmids.extend(str(r["pmid"]) for r in batch)
+            tokens.extend(len(d) for d in docs)
+            has_abstract.extend(bool(_WORD_RE.search(_LABEL_RE.sub(" ", r["abstract"] or ""))) for r in batch)
+            blocks.append(hasher.signatures(docs))
+            bar.update(len(batch))
+    signatures = np.concatenate(blocks) if blocks else np.zeros((0, hasher.num_perm), dtype=np.uint32)
+    tokens = np.asarray(tokens, dtype=np.int64)
+    hashed = time.perf_counter()
+
+    # 仅有标题的文献（勘误、"[Not Available]." 等）标题相同很常见，不据此判重
+    labels, similarity = lsh_clusters(signatures, bands, threshold, valid=np.asarray(has_abstract, dtype=bool))
+    duplicates = labels != np.arange(len(labels))
+    stats = {"documents": len(pmids), "duplicates": int(duplicates.sum()),
+             "clusters": int(len(np.unique(labels[duplicates]))),
+             "tokens": int(tokens.sum()), "duplicate_tokens": int(tokens[duplicates].sum()),
+             "minhash_seconds": hashed - start, "lsh_seconds": time.perf_counter() - hashed}
+    stats["seconds"] = stats["minhash_seconds"] + stats["lsh_seconds"]
+    return {"pmids": np.asarray(pmids, dtype=object), "labels": labels, "similarity": similarity,
+            "tokens": tokens, "stats": stats}
+
+
+def write_duplicates(result: dict, output_csv: Path) -> int:
+    """重复列表 CSV：pmid, duplicate_of（代表文档 PMID）, similarity"""
+    import numpy as np
+    pmids, labels, similarity = result["pmids"], result["labels"], result["similarity"]
+    rows = np.flatnonzero(labels != np.arange(len(labels)))
+    output_csv.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["pmid", "duplicate_of", "similarity"])
+        for i in rows:
+            writer.writerow([pmids[i], pmids[labels[i]], f"{similarity[i]:.3f}"])
+    return len(rows)
+
+
+def load_duplicates(path: str) -> Set[str]:
+    """读取 write_duplicates 的输出，返回需跳过的 PMID 集合"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["pmid"] for row in csv.DictReader(f)}
+
+
+def iter_unique(records: Iterable[dict], duplicates: Set[str]) -> Iterator[dict]:
+    """过滤掉近重复文档（保留每簇代表），可直接接入 embed_records / 关键词索引"""
+    for record in records:
+        if str(record["pmid"]) not in duplicates:
+            yield record
+
+
+def main(argv: Optional[List[str]] = None):
+    from scripts.crawler import expand_inputs
+    from scripts.dataset import iter_dataset
+    from scripts.metrics import add_metrics_arguments, path_bytes, run_metrics
+
+    parser = argparse.ArgumentParser(description="MinHash + LSH 近重复摘要检测（向量化之前去重）")
+    parser.add_argument("inputs", nargs="+", help="数据集文件或通配符（.xml.gz / CSV / Parquet / .sqlite），整体去重")
+    parser.add_argument("--output", default=DEDUP_CONFIG["OUTPUT"], help="重复列表 CSV")
+    parser.add_argument("--export", default=None, help="另存去重后的记录（与 crawler 的 CSV 列一致）")
+    parser.add_argument("--threshold", type=float, default=DEDUP_CONFIG["THRESHOLD"])
+    parser.add_argument("--num-perm", type=int, default=DEDUP_CONFIG["NUM_PERM"])
+    parser.add_argument("--bands", type=int, default=DEDUP_CONFIG["BANDS"])
+    parser.add_argument("--shingle", type=int, default=DEDUP_CONFIG["SHINGLE"])
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.num_perm % args.bands:
+        parser.error("--num-perm 必须是 --bands 的整数倍")
+
+    inputs = expand_inputs(args.inputs)
+    with run_metrics("dedup", args.metrics, args.profile) as metrics:
+        records = metrics.track("read", chain.from_iterable(iter_dataset(p) for p in inputs))
+        result = find_duplicates(records, MinHasher(args.num_perm, args.shingle), args.bands, args.threshold)
+        stats = result["stats"]
+        metrics.add("minhash", stats["minhash_seconds"], 1, stats["documents"])  # 含 read
+        metrics.add("lsh", stats["lsh_seconds"], 1, stats["documents"])
+        write_duplicates(result, Path(args.output))
+        print(f"✅ {stats['documents']} 篇中近重复 {stats['duplicates']} 篇（{stats['clusters']} 个簇，"
+              f"占 {stats['duplicates'] / max(stats['documents'], 1):.1%}），耗时 {stats['seconds']:.1f}s → {args.output}")
+
+        if args.export:
+            duplicates = load_duplicates(args.output)
+            count = 0
+            with metrics.stage("export"), open(args.export, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["pmid", "title", "abstract"])
+                for record in iter_unique(chain.from_iterable(iter_dataset(p) for p in inputs), duplicates):
+                    writer.writerow([record["pmid"], record["title"], record["abstract"]])
+                    count += 1
+            metrics.count("export", records=count, bytes_out=path_bytes(args.export))
+            print(f"✅ 导出去重后记录 {count} 条: {args.export}")
+
+if __name__ == "__main__":
+    main()
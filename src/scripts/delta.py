@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import csv
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from scripts.crawler import expand_inputs
+from scripts.medline import DEFAULT_BACKEND, iter_update_events
+
+# ===== 增量入库配置 =====
+DELTA_CONFIG = {
+    "INDEX_PATH": "data/pmid_index.sqlite",
+    "BATCH_SIZE": 5000,   # 每批查询/写入的事件数
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    pmid        INTEGER PRIMARY KEY,
+    fingerprint BLOB    NOT NULL,            -- 标题+摘要的内容指纹，未变化的记录不会被重写
+    title       TEXT    NOT NULL,
+    abstract    TEXT    NOT NULL,
+    source_file TEXT    NOT NULL,            -- 最后一次写入该记录的文件
+    version     INTEGER NOT NULL,            -- 最后一次变更所在文件的序号（下游按它增量拉取）
+    deleted     INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_articles_version ON articles(version);
+CREATE TABLE IF NOT EXISTS applied_files (
+    version    INTEGER PRIMARY KEY AUTOINCREMENT,
+    name       TEXT    NOT NULL UNIQUE,
+    applied_at TEXT    NOT NULL,
+    inserted   INTEGER NOT NULL,
+    updated    INTEGER NOT NULL,
+    unchanged  INTEGER NOT NULL,
+    deleted    INTEGER NOT NULL
+);
+"""
+
+_UPSERT_SQL = """
+INSERT INTO articles (pmid, fingerprint, title, abstract, source_file, version, deleted)
+VALUES (?, ?, ?, ?, ?, ?, 0)
+ON CONFLICT(pmid) DO UPDATE SET
+    fingerprint = excluded.fingerprint, title = excluded.title, abstract = excluded.abstract,
+    source_file = excluded.source_file, version = excluded.version, deleted = 0
+"""
+
+
+def fingerprint(record: dict) -> bytes:
+    """记录内容指纹（只看标题与摘要，与来源文件无关）"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(record["title"].encode("utf-8"))
+    digest.update(b"\x1f")
+    digest.update(record["abstract"].encode("utf-8"))
+    return digest.digest()
+
+
+class PmidIndex:
+    """以 PMID 为主键的持久化索引（SQLite）：增量 upsert / 删除，并记录已应用的更新文件"""
+
+    def __init__(self, path: str = DELTA_CONFIG["INDEX_PATH"]):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def is_applied(self, name: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM applied_files WHERE name = ?", (name,)).fetchone() is not None
+
+    def _existing(self, pmids: List[int]) -> dict:
+        """批量读取已有记录的 (指纹, 是否删除)；SQLite 单条语句变量上限 999，分段查询"""
+        found = {}
+        for i in range(0, len(pmids), 900):
+            chunk = pmids[i:i + 900]
+            rows = self.conn.execute(
+                f"SELECT pmid, fingerprint, deleted FROM articles WHERE pmid IN ({','.join('?' * len(chunk))})",
+                chunk)
+            found.update((pmid, (fp, deleted)) for pmid, fp, deleted in rows)
+        return found
+
+    def _apply_batch(self, batch: list, source: str, version: int, stats: dict):
+        """按文件内顺序处理一批事件：同一 PMID 多次出现时以最后一次为准"""
+        state = self._existing(list({pmid for _, pmid, _ in batch}))
+        upserts, deletes = {}, set()
+        for action, pmid, record in batch:
+            current = state.get(pmid)
+            if action == "delete":
+                if current and not current[1]:
+                    state[pmid] = (current[0], 1)
+                    upserts.pop(pmid, None)
+                    deletes.add(pmid)
+                    stats["deleted"] += 1
+                continue
+
+            fp = fingerprint(record)
+            if current == (fp, 0):
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if current else "inserted"] += 1
+            state[pmid] = (fp, 0)
+            deletes.discard(pmid)
+            upserts[pmid] = (pmid, fp, record["title"], record["abstract"], source, version)
+
+        self.conn.executemany(_UPSERT_SQL, upserts.values())
+        self.conn.executemany("UPDATE articles SET deleted = 1, version = ? WHERE pmid = ?",
+                              ((version, pmid) for pmid in deletes))
+
+    def apply_file(self, path: Path, force: bool = False, backend: str = DEFAULT_BACKEND) -> Optional[dict]:
+        """应用一个 baseline / 每日更新文件（单事务，失败则整体回滚）；已应用过的文件返回 None"""
+        path = Path(path)
+        if self.is_applied(path.name):
+            if not force:
+                return None
+            self.conn.execute("DELETE FROM applied_files WHERE name = ?", (path.name,))
+
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        with self.conn:  # 事务
+            cursor = self.conn.execute(
+                "INSERT INTO applied_files (name, applied_at, inserted, updated, unchanged, deleted) "
+                "VALUES (?, ?, 0, 0, 0, 0)", (path.name, datetime.now().isoformat(timespec="seconds")))
+            version = cursor.lastrowid
+
+            batch = []
+            for action, payload in iter_update_events(path, backend):
+                pmid = payload if action == "delete" else payload["pmid"]
+                if not pmid.isdigit():
+                    continue  # 没有合法 PMID 的记录无法建立索引
+                batch.append((action, int(pmid), payload))
+                if len(batch) >= DELTA_CONFIG["BATCH_SIZE"]:
+                    self._apply_batch(batch, path.name, version, stats)
+                    batch = []
+            if batch:
+                self._apply_batch(batch, path.name, version, stats)
+
+            self.conn.execute(
+                "UPDATE applied_files SET inserted = ?, updated = ?, unchanged = ?, deleted = ? WHERE version = ?",
+                (stats["inserted"], stats["updated"], stats["unchanged"], stats["deleted"], version))
+        return stats
+
+    def current_version(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(version), 0) FROM applied_files").fetchone()[0]
+
+    def changed_since(self, version: int) -> Iterator[dict]:
+        """version 之后新增/修改/删除的记录（下游嵌入、索引只需处理这些）"""
+        rows = self.conn.execute(
+            "SELECT pmid, title, abstract, fingerprint, deleted, version FROM articles "
+            "WHERE version > ? ORDER BY pmid", (version,))
+        for pmid, title, abstract, fp, deleted, row_version in rows:
+            yield {"pmid": str(pmid), "title": title, "abstract": abstract,
+                   "fingerprint": fp.hex(), "deleted": bool(deleted), "version": row_version}
+
+    def export_csv(self, output_csv: Path) -> int:
+        """导出当前有效记录（与 crawler 的 CSV 列一致），无需重新解析任何 XML"""
+        rows = self.conn.execute("SELECT pmid, title, abstract FROM articles WHERE deleted = 0 ORDER BY pmid")
+        count = 0
+        with open(output_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["pmid", "title", "abstract"])
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="按 PMID 增量应用 MEDLINE baseline / 每日更新文件")
+    parser.add_argument("inputs", nargs="+", help="更新文件列表或通配符（按文件名顺序应用）")
+    parser.add_argument("--index", default=DELTA_CONFIG["INDEX_PATH"], help="PMID 索引（SQLite）路径")
+    parser.add_argument("--force", action="store_true", help="重新应用已记录过的文件")
+    parser.add_argument("--export", default=None, help="应用完成后导出当前记录到 CSV")
+    args = parser.parse_args(argv)
+
+    with PmidIndex(args.index) as index:
+        for path in expand_inputs(args.inputs):
+            stats = index.apply_file(path, args.force)
+            if stats is None:
+                print(f"⏭️ 已应用，跳过: {path.name}")
+            else:
+                print(f"✅ {path.name}: 新增 {stats['inserted']}，更新 {stats['updated']}，"
+                      f"未变 {stats['unchanged']}，删除 {stats['deleted']}")
+        if args.export:
+            print(f"✅ 导出 {index.export_csv(Path(args.export))} 条记录: {args.export}")
+
+
+if __name__ == "__main__":
+    main()
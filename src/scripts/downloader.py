@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from urllib.parse import urljoin
+
+# requests / BeautifulSoup / tqdm / urllib3 在函数内导入：`medical-ai download --help` 只需 argparse
+if TYPE_CHECKING:
+    import requests
+
+# ===== 下载配置 =====
+DOWNLOAD_CONFIG = {
+    "FILE_PATTERN": r"\.xml\.gz$",  # 目录页中需要下载的文件
+    "WORKERS": 8,                   # 并发下载数（同时也是连接池大小）
+    "CHUNK_SIZE": 1 << 20,          # 每次写盘 1MB
+    "TIMEOUT": 60,
+}
+
+_MD5_RE = re.compile(r"\b([0-9a-fA-F]{32})\b")
+
+
+class ChecksumError(Exception):
+    """下载文件的MD5与服务器提供的不一致"""
+
+
+def make_session(pool_size: int = DOWNLOAD_CONFIG["WORKERS"]) -> "requests.Session":
+    """带连接池与自动重试的 Session（多线程共享，复用 TCP/TLS 连接）"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retry = Retry(total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET", "HEAD"))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def list_remote_files(session: "requests.Session", base_url: str,
+                      pattern: str = DOWNLOAD_CONFIG["FILE_PATTERN"]) -> List[str]:
+    """解析目录索引页，返回匹配的文件名（去重并排序）"""
+    from bs4 import BeautifulSoup
+    resp = session.get(base_url, timeout=DOWNLOAD_CONFIG["TIMEOUT"])
+    resp.raise_for_status()
+    soup = BeautifulSoup(resp.text, "html.parser")
+    regex = re.compile(pattern)
+    names = {a["href"].rsplit("/", 1)[-1] for a in soup.find_all("a", href=True)}
+    return sorted(name for name in names if regex.search(name))
+
+
+def fetch_md5(session: "requests.Session", url: str) -> Optional[str]:
+    """读取服务器上的 <文件>.md5（NCBI 格式: MD5(xxx.xml.gz)= <hex>），不存在时返回 None"""
+    resp = session.get(url + ".md5", timeout=DOWNLOAD_CONFIG["TIMEOUT"])
+    if resp.status_code != 200:
+        return None
+    match = _MD5_RE.search(resp.text)
+    return match.group(1).lower() if match else None
+
+
+def file_md5(path: Path) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CONFIG["CHUNK_SIZE"]), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _is_unchanged(session: "requests.Session", url: str, dest: Path, expected_md5: Optional[str]) -> bool:
+    """本地文件是否与远端一致：有MD5比MD5（结果缓存在 .md5 旁路文件），否则比 Content-Length"""
+    if not dest.exists():
+        return False
+    if expected_md5:
+        sidecar = dest.with_name(dest.name + ".md5")
+        if sidecar.exists() and sidecar.read_text().strip() == expected_md5:
+            return True
+        if file_md5(dest) == expected_md5:
+            sidecar.write_text(expected_md5)
+            return True
+        return False
+    resp = session.head(url, timeout=DOWNLOAD_CONFIG["TIMEOUT"], allow_redirects=True)
+    size = resp.headers.get("Content-Length")
+    return resp.ok and size is not None and int(size) == dest.stat().st_size
+
+
+def download_file(url: str, dest: Path, session: Optional["requests.Session"] = None,
+                  expected_md5: Optional[str] = None) -> str:
+    """下载单个文件：已存在且未变化则跳过；.part 断点续传（HTTP Range）；下载后校验MD5
+
+    返回 "skipped" 或 "downloaded"
+    """
+    session = session or make_session(1)
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if _is_unchanged(session, url, dest, expected_md5):
+        return "skipped"
+
+    part = dest.with_name(dest.name + ".part")
+    validator = part.with_name(part.name + ".etag")  # 开始下载 .part 时远端文件的 ETag / Last-Modified
+    offset = part.stat().st_size if part.exists() else 0
+    headers = {}
+    if offset and validator.exists():
+        # If-Range：远端文件已变化时服务器返回 200 全量内容，而不是把新文件的后半段拼到旧的 .part 上
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator.read_text().strip()}
+    elif offset and expected_md5:
+        headers = {"Range": f"bytes={offset}-"}  # 没有 ETag 时靠下载后的 MD5 校验兜底
+    # 既无 ETag 也无 MD5：无法确认 .part 属于当前文件，从头下载
+
+    with session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_CONFIG["TIMEOUT"]) as resp:
+        if resp.status_code == 416:  # .part 已是完整文件
+            pass
+        else:
+            resp.raise_for_status()
+            # 服务器不支持 Range（或 If-Range 不匹配）时返回 200 全量内容，需要从头写
+            mode = "ab" if resp.status_code == 206 else "wb"
+            if mode == "wb":
+                tag = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+                if tag:
+                    validator.write_text(tag)
+                elif validator.exists():
+                    validator.unlink()
+            with open(part, mode) as f:
+                for chunk in resp.iter_content(DOWNLOAD_CONFIG["CHUNK_SIZE"]):
+                    f.write(chunk)
+
+    if expected_md5:
+        actual = file_md5(part)
+        if actual != expected_md5:
+            part.unlink()  # 损坏的分段不能再续传
+            validator.unlink(missing_ok=True)
+            raise ChecksumError(f"{dest.name}: MD5 {actual} != {expected_md5}")
+        dest.with_name(dest.name + ".md5").write_text(expected_md5)
+    os.replace(part, dest)
+    validator.unlink(missing_ok=True)
+    return "downloaded"
+
+
+def download_all(base_url: str, output_dir: str, pattern: str = DOWNLOAD_CONFIG["FILE_PATTERN"],
+                 workers: int = DOWNLOAD_CONFIG["WORKERS"], limit: Optional[int] = None) -> Tuple[List[Path], dict]:
+    """并发下载目录下所有匹配文件（共享连接池）
+
+    返回 (本地路径列表, 统计)：路径只包含下载成功或已是最新的文件，失败的文件只计入 stats["failed"]
+    """
+    from tqdm import tqdm
+    if not base_url.endswith("/"):
+        base_url += "/"
+    session = make_session(workers)
+    names = list_remote_files(session, base_url, pattern)[:limit]
+    output_dir = Path(output_dir)
+
+    def task(name: str) -> str:
+        url = urljoin(base_url, name)
+        return download_file(url, output_dir / name, session, fetch_md5(session, url))
+
+    stats = {"downloaded": 0, "skipped": 0, "failed": 0}
+    ok = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(task, name): name for name in names}
+        with tqdm(total=len(futures), desc="下载MEDLINE", unit="file") as bar:
+            for future in as_completed(futures):
+                try:
+                    stats[future.result()] += 1
+                    ok.add(futures[future])
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"❌ 下载失败: {futures[future]} ({e})")
+                bar.set_postfix(stats)
+                bar.update(1)
+
+    print(f"✅ 下载完成: 新下载 {stats['downloaded']}，跳过 {stats['skipped']}，失败 {stats['failed']}")
+    return [output_dir / name for name in names if name in ok], stats
+
+
+def main(argv: Optional[List[str]] = None):
+    from scripts.crawler import CONFIG
+    from scripts.metrics import add_metrics_arguments, path_bytes, run_metrics
+
+    parser = argparse.ArgumentParser(description="并发下载 MEDLINE 目录下的全部文件（断点续传 + MD5 校验，已下载的跳过）")
+    parser.add_argument("--base-url", default=CONFIG["BASE_URL"])
+    parser.add_argument("--output-dir", default=CONFIG["OUTPUT_DIR"])
+    parser.add_argument("--pattern", default=DOWNLOAD_CONFIG["FILE_PATTERN"], help="目录页中需要下载的文件名正则")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_CONFIG["WORKERS"])
+    parser.add_argument("--limit", type=int, default=None, help="最多下载前 N 个文件")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with run_metrics("download", args.metrics, args.profile) as metrics:
+        with metrics.stage("download"):
+            paths, stats = download_all(args.base_url, args.output_dir, args.pattern, args.workers, args.limit)
+        metrics.count("download", records=len(paths), bytes_out=sum(path_bytes(p) for p in paths))
+    if stats["failed"]:
+        sys.exit(1)  # 部分文件失败：让调用方脚本感知，重新运行即可续传
+
+
+if __name__ == "__main__":
+    main()
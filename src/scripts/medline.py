@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import queue
+import threading
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+from scripts.sections import sections_from_pairs, split_sections
+
+# ===== 流式读取配置 =====
+READ_CHUNK_SIZE = 1 << 20   # 每次解压 1MB
+PREFETCH_DEPTH = 8          # 最多预取 8 块（内存上限约 8MB）
+
+
+class _PrefetchReader(io.RawIOBase):
+    """后台线程解压 + 主线程解析（zlib 解压时释放 GIL，两者真正并行）"""
+
+    def __init__(self, raw, chunk_size: int = READ_CHUNK_SIZE, depth: int = PREFETCH_DEPTH):
+        self._raw = raw
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=depth)  # 有界队列：解压不会跑在解析前面太多
+        self._stop = threading.Event()
+        self._pending = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+
+    def _pump(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._raw.read(self._chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except BaseException as e:  # 异常交给读取方抛出
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._pending and not self._eof:
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                raise item
+            if not item:
+                self._eof = True
+            self._pending = memoryview(item)
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]  # memoryview 切片不复制数据
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._raw.close()
+        super().close()
+
+
+def open_medline(path: Union[str, Path], prefetch: bool = True):
+    """打开MEDLINE文件（.xml 或 .xml.gz），返回二进制流；压缩文件边解压边读，不落盘"""
+    path = Path(path)
+    if path.suffix == ".gz":
+        raw = gzip.open(path, "rb")
+        return io.BufferedReader(_PrefetchReader(raw), READ_CHUNK_SIZE) if prefetch else raw
+    return open(path, "rb")
+
+
+def _limit(iterator: Iterator, max_records: Optional[int]) -> Iterator:
+    """最多产出 max_records 个元素，达到上限后不再向下游拉取（即停止读文件）"""
+    if max_records is None:
+        yield from iterator
+        return
+    for i, item in enumerate(iterator, 1):
+        yield item
+        if i >= max_records:
+            break
+
+
+def _iter_lxml_articles(f, tags=("PubmedArticle",)) -> Iterator:
+    from lxml import etree
+
+    # 只在目标节点结束时回调，避免构建整棵DOM
+    context = etree.iterparse(f, events=("end",), tag=tags, huge_tree=True)
+    for _, article in context:
+        yield article
+
+        # 释放已处理的节点及其前序兄弟（iterparse内存恒定的关键）
+        article.clear()
+        while article.getprevious() is not None:
+            del article.getparent()[0]
+    del context
+
+
+def _iter_etree_articles(f, tags=("PubmedArticle",)) -> Iterator:
+    import xml.etree.ElementTree as ET
+
+    # 标准库 expat：没有 getparent()，改为每篇处理完清空根节点
+    context = ET.iterparse(f, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event == "end" and elem.tag in tags:
+            yield elem
+            root.clear()
+
+
+def iter_pubmed_articles(path: Union[str, Path], max_records: Optional[int] = None,
+                         backend: str = "lxml") -> Iterator:
+    """逐个产出 PubmedArticle 节点（lxml 或 ElementTree），调用方处理完后节点即被释放"""
+    if max_records is not None and max_records <= 0:
+        return
+
+    iter_articles = _iter_etree_articles if backend == "etree" else _iter_lxml_articles
+    with open_medline(path) as f:
+        yield from _limit(iter_articles(f), max_records)
+
+
+# ===== 统一记录结构 =====
+# 每条记录: {"pmid", "title", "abstract", "sections"}
+#   abstract: 带标签段落为 "[Label] 正文"，逐段换行（与历史CSV一致）
+#   sections: {NLM类别: 正文}，见 scripts.sections
+RECORD_FIELDS = ["pmid", "title", "abstract"]  # 落盘（CSV/Parquet）的扁平字段
+
+BACKENDS = ("lxml", "etree", "bs4")
+DEFAULT_BACKEND = "lxml"
+
+
+def _element_text(elem) -> str:
+    """取节点全部文本（等价于BeautifulSoup的.text）"""
+    return "".join(elem.itertext()) if elem is not None else ""
+
+
+def _build_record(pmid: str, title: str, parts: list, raw_abstract: str) -> dict:
+    """parts 为 [(Label, NlmCategory, 正文)]；没有 AbstractText 时退回整段摘要文本"""
+    if parts:
+        abstract = "\n".join(f"[{label}] {text}" if label else text for label, _, text in parts).strip()
+        sections = sections_from_pairs((category or label, text) for label, category, text in parts)
+    else:
+        abstract = raw_abstract.strip()
+        sections = split_sections(abstract)
+    return {
+        "pmid": pmid.strip() or "N/A",
+        "title": title.strip() or "N/A",
+        "abstract": abstract,
+        "sections": sections,
+    }
+
+
+def _record_from_element(article) -> dict:
+    """lxml / ElementTree 节点 → 统一记录"""
+    pmid_elem = article.find(".//PMID")
+    title_elem = article.find(".//ArticleTitle")
+    abstract_elem = article.find(".//Abstract")
+    parts = []
+    if abstract_elem is not None:
+        parts = [(t.get("Label", ""), t.get("NlmCategory", ""), _element_text(t))
+                 for t in abstract_elem.iter("AbstractText")]
+    return _build_record(_element_text(pmid_elem), _element_text(title_elem), parts,
+                         _element_text(abstract_elem))
+
+
+def _record_from_soup(article) -> dict:
+    """BeautifulSoup 节点 → 统一记录（参照实现，仅用于对比与基准测试）"""
+    pmid_elem = article.find("PMID")
+    title_elem = article.find("ArticleTitle")
+    abstract_elem = article.find("Abstract")
+    parts = []
+    if abstract_elem is not None:
+        parts = [(t.get("Label", ""), t.get("NlmCategory", ""), t.text)
+                 for t in abstract_elem.find_all("AbstractText")]
+    return _build_record(pmid_elem.text if pmid_elem else "", title_elem.text if title_elem else "",
+                         parts, abstract_elem.text if abstract_elem else "")
+
+
+def iter_records(path: Union[str, Path], max_records: Optional[int] = None,
+                 backend: str = DEFAULT_BACKEND) -> Iterator[dict]:
+    """统一解析入口：流式产出记录，backend 可选 lxml / etree（标准库expat）/ bs4"""
+    if backend not in BACKENDS:
+        raise ValueError(f"未知解析后端: {backend}（可选 {', '.join(BACKENDS)}）")
+
+    if backend == "bs4":
+        from bs4 import BeautifulSoup
+        from lxml import etree
+
+        # lxml 负责流式切分，每篇文章交给 BeautifulSoup 提取字段
+        for article in iter_pubmed_articles(path, max_records):
+            soup = BeautifulSoup(etree.tostring(article, with_tail=False), "xml")
+            yield _record_from_soup(soup)
+        return
+
+    for article in iter_pubmed_articles(path, max_records, backend):
+        yield _record_from_element(article)
+
+
+def iter_update_events(path: Union[str, Path], backend: str = DEFAULT_BACKEND) -> Iterator[Tuple[str, object]]:
+    """按文件顺序产出更新事件：("upsert", 记录) 或 ("delete", pmid)
+
+    MEDLINE 每日更新文件在 PubmedArticle 之外还包含 DeleteCitation（待删除的 PMID 列表）
+    """
+    if backend not in ("lxml", "etree"):
+        raise ValueError(f"更新文件仅支持 lxml / etree 后端: {backend}")
+
+    iter_elements = _iter_etree_articles if backend == "etree" else _iter_lxml_articles
+    with open_medline(path) as f:
+        for elem in iter_elements(f, ("PubmedArticle", "DeleteCitation")):
+            if elem.tag == "DeleteCitation":
+                for pmid_elem in elem.iter("PMID"):
+                    yield "delete", _element_text(pmid_elem).strip()
+            else:
+                yield "upsert", _record_from_element(elem)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# ===== 运行指标配置 =====
+METRICS_CONFIG = {
+    "OUTPUT_DIR": "data/metrics",  # 未指定 --metrics 时剖析结果写 <OUTPUT_DIR>/<运行名>.prof / .folded
+    "PROFILE_TOP": 25,             # 剖析结果打印前 N 个函数 / 调用栈
+    "SAMPLE_INTERVAL": 0.005,      # 采样剖析间隔（秒）
+    "REGRESSION_TOLERANCE": 0.10,  # compare：阶段耗时增长超过 10% 视为退化
+    "REGRESSION_MIN_SECONDS": 1.0, # 基线耗时不足 1 秒的阶段噪声太大，不参与比较
+}
+PROFILERS = ("cprofile", "sample")
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """当前进程（或已结束子进程中最大者）的峰值常驻内存（MB）；无法获取时返回 None"""
+    try:
+        import resource
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # macOS 单位是字节
+    except ImportError:  # Windows
+        if children:
+            return None
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except ImportError:
+            return None
+
+
+def path_bytes(path) -> int:
+    """文件大小，或目录下所有文件的总大小（不存在为 0）"""
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+class RunMetrics:
+    """一次运行的分阶段指标：耗时、调用次数、记录数、输入/输出字节数
+
+    同名阶段多次进入时累加（线程安全），阶段可以嵌套，耗时各自独立统计（含子阶段）。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self._cpu_start = os.times()
+        self._lock = threading.Lock()
+        self.stages = defaultdict(lambda: {"seconds": 0.0, "calls": 0, "records": 0, "bytes_in": 0, "bytes_out": 0})
+        self.extra = {}
+
+    def add(self, stage: str, seconds: float = 0.0, calls: int = 0, records: int = 0,
+            bytes_in: int = 0, bytes_out: int = 0):
+        with self._lock:
+            s = self.stages[stage]
+            s["seconds"] += seconds
+            s["calls"] += calls
+            s["records"] += records
+            s["bytes_in"] += bytes_in
+            s["bytes_out"] += bytes_out
+
+    def count(self, stage: str, records: int = 0, bytes_in: int = 0, bytes_out: int = 0):
+        """只累加计数，不计时（如子进程返回的记录数、输出文件大小）"""
+        self.add(stage, records=records, bytes_in=bytes_in, bytes_out=bytes_out)
+
+    @contextmanager
+    def stage(self, stage: str, records: int = 0, bytes_in: int = 0):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(stage, time.perf_counter() - start, 1, records, bytes_in)
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        """包装批处理函数（如 encode）：每次调用计时，第一个参数的长度计为记录数"""
+        @functools.wraps(fn)
+        def wrapper(batch, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(batch, *args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start, 1, len(batch))
+        return wrapper
+
+    def track(self, stage: str, items: Iterable) -> Iterator:
+        """包装迭代器：只统计取下一个元素所花的时间（即上游生产耗时）与元素个数"""
+        iterator = iter(items)
+        seconds, records = 0.0, 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                records += 1
+                yield item
+        finally:
+            self.add(stage, seconds, 1, records)
+
+    def summary(self) -> dict:
+        wall = time.perf_counter() - self._start
+        cpu = os.times()
+        stages = {}
+        with self._lock:
+            for stage, s in self.stages.items():
+                s = dict(s)
+                s["records_per_sec"] = s["records"] / s["seconds"] if s["seconds"] and s["records"] else None
+                moved = max(s["bytes_in"], s["bytes_out"])
+                s["mb_per_sec"] = moved / 2 ** 20 / s["seconds"] if s["seconds"] and moved else None
+                stages[stage] = s
+        return {"run": self.name, "started": self.started, "wall_seconds": wall,
+                "cpu_seconds": (cpu.user - self._cpu_start.user) + (cpu.system - self._cpu_start.system),
+                "children_cpu_seconds": (cpu.children_user - self._cpu_start.children_user)
+                + (cpu.children_system - self._cpu_start.children_system),
+                "peak_rss_mb": peak_rss_mb(), "peak_rss_children_mb": peak_rss_mb(children=True),
+                "stages": stages, **self.extra}
+
+
+def format_table(summary: dict) -> str:
+    """阶段汇总表：耗时、占总时长比例、记录数与吞吐、字节数"""
+    wall = summary["wall_seconds"] or 1e-9
+    lines = [f"{'阶段':<16}{'耗时(s)':>10}{'占比':>8}{'次数':>8}{'记录数':>12}{'记录/s':>12}"
+             f"{'输入MB':>10}{'输出MB':>10}"]
+    for stage, s in summary["stages"].items():
+        rate = f"{s['records_per_sec']:.0f}" if s["records_per_sec"] else "-"
+        lines.append(f"{stage:<16}{s['seconds']:>10.2f}{s['seconds'] / wall:>8.1%}{s['calls']:>8}"
+                     f"{s['records']:>12}{rate:>12}{s['bytes_in'] / 2 ** 20:>10.1f}{s['bytes_out'] / 2 ** 20:>10.1f}")
+    rss = summary["peak_rss_mb"]
+    children = summary["peak_rss_children_mb"]
+    lines.append(f"总耗时 {summary['wall_seconds']:.2f}s | CPU {summary['cpu_seconds']:.2f}s"
+                 f"（子进程 {summary['children_cpu_seconds']:.2f}s）| 峰值内存 {rss or float('nan'):.1f} MB"
+                 + (f"（子进程 {children:.1f} MB）" if children else ""))
+    return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """轻量采样剖析：后台线程定期抓取目标线程的调用栈，按折叠栈计数（可直接喂给 flamegraph.pl）"""
+
+    def __init__(self, interval: float = METRICS_CONFIG["SAMPLE_INTERVAL"], thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, limit: int = METRICS_CONFIG["PROFILE_TOP"]) -> str:
+        """按叶子函数（自身耗时）汇总的热点"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return "\n".join(f"{count / total:>7.1%}  {name}" for name, count in leaves.most_common(limit))
+
+
+@contextmanager
+def run_metrics(name: str, output: Optional[str] = None, profile: Optional[str] = None,
+                quiet: bool = False) -> Iterator[RunMetrics]:
+    """包住一次运行：结束时打印阶段汇总表；给定 output 时写 JSON 指标文件；profile 为 cprofile / sample 时同时剖析
+
+    output 为空时不写文件（各脚本的 --metrics 需显式指定）。
+    剖析结果写在指标文件旁（.prof / .folded），未指定 output 时写在 <METRICS_CONFIG["OUTPUT_DIR"]> 下。
+    """
+    metrics = RunMetrics(name)
+    output = Path(output) if output else None
+    profiler = None
+    if profile == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == "sample":
+        profiler = SamplingProfiler()
+        profiler.start()
+    try:
+        yield metrics
+    finally:
+        report = ""
+        if profile:
+            profile_path = (output or Path(METRICS_CONFIG["OUTPUT_DIR"]) / name).with_suffix(".prof" if profile == "cprofile" else ".folded")
+            profile_path.parent.mkdir(parents=True, exist_ok=True)
+            metrics.extra["profile"] = str(profile_path)
+        if profile == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(metrics.extra["profile"])
+            import io
+            import pstats
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(METRICS_CONFIG["PROFILE_TOP"])
+            report = buffer.getvalue()
+        elif profile == "sample":
+            profiler.stop()
+            profiler.write(Path(metrics.extra["profile"]))
+            report = profiler.top()
+        summary = metrics.summary()
+        if output is not None:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        if not quiet:
+            print(f"\n📊 运行指标（{name}）" + (f"→ {output}" if output is not None else ""))
+            print(format_table(summary))
+            if report:
+                print(f"\n🔥 剖析热点（完整结果: {metrics.extra['profile']}）\n{report.strip()}")
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    """为各脚本的命令行统一添加 --metrics / --profile"""
+    parser.add_argument("--metrics", default=None, metavar="PATH",
+                        help=f"指标 JSON 输出路径，如 {METRICS_CONFIG['OUTPUT_DIR']}/<脚本名>.json（默认只打印汇总表）")
+    parser.add_argument("--profile", choices=PROFILERS, default=None,
+                        help="cprofile：确定性剖析（.prof）；sample：低开销采样剖析（折叠栈 .folded）")
+
+
+def compare(baseline: dict, current: dict, tolerance: float = METRICS_CONFIG["REGRESSION_TOLERANCE"]) -> List[dict]:
+    """逐阶段比较两次运行的耗时与吞吐，返回退化超过 tolerance 的阶段"""
+    regressions = []
+    pairs = [("(total)", baseline["wall_seconds"], current["wall_seconds"])]
+    pairs += [(stage, baseline["stages"][stage]["seconds"], s["seconds"])
+              for stage, s in current["stages"].items() if stage in baseline["stages"]]
+    for stage, before, after in pairs:
+        if before >= METRICS_CONFIG["REGRESSION_MIN_SECONDS"] and after > before * (1 + tolerance):
+            regressions.append({"stage": stage, "baseline_seconds": before, "current_seconds": after,
+                                "change": after / before - 1})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="查看或比较运行指标 JSON（阶段耗时退化检查）")
+    parser.add_argument("current", help="本次运行的指标 JSON")
+    parser.add_argument("--baseline", default=None, help="基线指标 JSON；给定时检查退化")
+    parser.add_argument("--tolerance", type=float, default=METRICS_CONFIG["REGRESSION_TOLERANCE"])
+    args = parser.parse_args(argv)
+
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    print(format_table(current))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(baseline, current, args.tolerance)
+        for r in regressions:
+            print(f"⚠️ 退化: {r['stage']} {r['baseline_seconds']:.2f}s → {r['current_seconds']:.2f}s（+{r['change']:.0%}）")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ 无超过 {args.tolerance:.0%} 的阶段退化")
+
+
+if __name__ == "__main__":
+    main()
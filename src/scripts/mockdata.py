@@ -1,10 +1,20 @@
 # medical-ai-journey/scripts/generate_mock_pubmed.py (已修复语法)
+import argparse
 import gzip
+import os
 import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
 import xml.etree.ElementTree as ET  # 企业级 XML 验证
 
+from scripts.metrics import add_metrics_arguments, path_bytes, run_metrics
+
 # ===== 医药领域数据池 (优化版) =====
 MEDICAL_TERMS = [
     "aspirin", "ibuprofen", "penicillin", "insulin", "statin", 
@@ -36,10 +46,14 @@ RESULTS_TEMPLATES = [
     "The {outcome} was higher in {group} compared to control (OR={or_value})."
 ]
 
+@lru_cache(maxsize=None)
+def _template_params(template: str) -> frozenset:
+    """模板所需参数（每个模板只解析一次）"""
+    return frozenset(re.findall(r"\{(\w+)\}", template))
+
 def validate_template_params(template: str, **kwargs) -> bool:
     """企业级模板参数验证（医药数据必备）"""
-    import re
-    required_params = set(re.findall(r"\{(\w+)\}", template))
+    required_params = _template_params(template)
     provided_params = set(kwargs.keys())
     missing = required_params - provided_params
     
@@ -48,14 +62,14 @@ def validate_template_params(template: str, **kwargs) -> bool:
         return False
     return True
 
-def generate_medical_sentence():
-    """生成带希腊字母的医学句子（企业级加固）"""
+def generate_medical_sentence(rng=random):
+    """生成带希腊字母的医学句子（企业级加固）；rng 可传入 random.Random 实例以复现结果"""
     # ===== 1. 补全所有参数 =====
     params = {
-        "disease": random.choice(["hypertension", "diabetes", "asthma", "arthritis"]),
-        "drug": random.choice(MEDICAL_TERMS[:5]),
-        "population": random.choice(["millions worldwide", "elderly patients", "children under 12"]),
-        "specialty": random.choice(MEDICAL_SPECIALTIES)  # ← 关键修复：添加 specialty
+        "disease": rng.choice(["hypertension", "diabetes", "asthma", "arthritis"]),
+        "drug": rng.choice(MEDICAL_TERMS[:5]),
+        "population": rng.choice(["millions worldwide", "elderly patients", "children under 12"]),
+        "specialty": rng.choice(MEDICAL_SPECIALTIES)  # ← 关键修复：添加 specialty
     }
     
     # ===== 2. 安全选择模板 =====
@@ -70,7 +84,7 @@ def generate_medical_sentence():
         valid_templates = ["{disease} management is critical in modern medicine."]
     
     # ===== 3. 安全格式化 =====
-    template = random.choice(valid_templates)
+    template = rng.choice(valid_templates)
     try:
         return template.format(**params)
     except KeyError as e:
@@ -79,33 +93,33 @@ def generate_medical_sentence():
         params[e.args[0]] = "general medicine"  # 医药领域安全默认值
         return template.format(**params)
 
-def generate_abstract():
+def generate_abstract(rng=random):
     """生成结构化摘要（修复 f-string 语法）"""
     # ===== 修复关键：分离 format 操作 =====
-    background = "[BACKGROUND] " + generate_medical_sentence()
+    background = "[BACKGROUND] " + generate_medical_sentence(rng)
     
     # METHOD 段（安全 format）
-    method_template = random.choice(METHOD_TEMPLATES)
+    method_template = rng.choice(METHOD_TEMPLATES)
     method = "[METHOD] " + method_template.format(
-        study_type=random.choice(['randomized', 'prospective', 'cohort']),
-        sample_size=random.randint(100, 5000),
-        analysis_method=random.choice(['regression', 'meta-analysis']),
-        software=random.choice(['R', 'Python', 'SAS']),
-        intervention=random.choice(['treatment', 'intervention']),
-        drug=random.choice(MEDICAL_TERMS[:5]),
-        dose=random.randint(5, 100),
-        duration=random.choice(['4 weeks', '6 months', '1 year'])
+        study_type=rng.choice(['randomized', 'prospective', 'cohort']),
+        sample_size=rng.randint(100, 5000),
+        analysis_method=rng.choice(['regression', 'meta-analysis']),
+        software=rng.choice(['R', 'Python', 'SAS']),
+        intervention=rng.choice(['treatment', 'intervention']),
+        drug=rng.choice(MEDICAL_TERMS[:5]),
+        dose=rng.randint(5, 100),
+        duration=rng.choice(['4 weeks', '6 months', '1 year'])
     )
     
     # RESULTS 段（安全 format）
-    results_template = random.choice(RESULTS_TEMPLATES)
+    results_template = rng.choice(RESULTS_TEMPLATES)
     results = "[RESULTS] " + results_template.format(
-        drug=random.choice(MEDICAL_TERMS[:5]),
-        outcome=random.choice(['mortality', 'symptom severity', 'recovery rate']),
-        percent=random.randint(10, 50),
-        pvalue=round(random.uniform(0.001, 0.05), 3),
-        group=random.choice(['treatment', 'experimental']),
-        or_value=round(random.uniform(1.2, 3.5), 1)
+        drug=rng.choice(MEDICAL_TERMS[:5]),
+        outcome=rng.choice(['mortality', 'symptom severity', 'recovery rate']),
+        percent=rng.randint(10, 50),
+        pvalue=round(rng.uniform(0.001, 0.05), 3),
+        group=rng.choice(['treatment', 'experimental']),
+        or_value=round(rng.uniform(1.2, 3.5), 1)
     )
     
     return "\n".join([background, method, results])
@@ -115,7 +129,7 @@ def validate_medical_xml(xml_content: str):
     try:
         # 验证基本结构
         root = ET.fromstring(xml_content)
-        assert root.tag == "MedlineCitationSet", "根节点错误"
+        assert root.tag == "PubmedArticleSet", "根节点错误"
         
         # 验证希腊字母（医药数据核心）
         assert "β" in xml_content or "μ" in xml_content, "缺少希腊字母（医药数据失效）"
@@ -131,53 +145,169 @@ def validate_medical_xml(xml_content: str):
         print(f"❌ XML 验证失败: {str(e)}")
         return False
 
-def generate_pubmed_xml(num_records=100):
-    """生成合规 PubMed XML（带希腊字母强化）"""
-    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml += '<MedlineCitationSet>\n'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<PubmedArticleSet>\n'
+XML_FOOTER = '</PubmedArticleSet>\n'
+
+def render_article(pmid: int, rng=random) -> str:
+    """生成单篇 PubmedArticle（与解析器期望的结构一致，正文做 XML 转义）"""
+    title = f"Effect of {rng.choice(MEDICAL_TERMS)} on {rng.choice(['Cardiovascular', 'Metabolic', 'Neurological'])} Outcomes"
+    abstract = generate_abstract(rng)
     
-    for i in range(num_records):
-        pmid = 1000001 + i
-        title = f"Effect of {random.choice(MEDICAL_TERMS)} on {random.choice(['Cardiovascular', 'Metabolic', 'Neurological'])} Outcomes"
-        abstract = generate_abstract()
-        
-        # 强化希腊字母（医药数据必检项）
-        if "blocker" in title and random.random() > 0.3:
-            title = title.replace("blocker", "β-blocker")
-        if "mg" in abstract and random.random() > 0.4:
-            abstract = abstract.replace("mg", "μg")
-        
-        xml += f'''  <MedlineCitation>
+    # 强化希腊字母（医药数据必检项）
+    if "blocker" in title and rng.random() > 0.3:
+        title = title.replace("blocker", "β-blocker")
+    if "mg" in abstract and rng.random() > 0.4:
+        abstract = abstract.replace("mg", "μg")
+    
+    return f'''  <PubmedArticle>
     <PMID>{pmid}</PMID>
     <Article>
-      <ArticleTitle>{title}</ArticleTitle>
+      <ArticleTitle>{escape(title)}</ArticleTitle>
       <Abstract>
-        {abstract}
+        {escape(abstract)}
       </Abstract>
     </Article>
-  </MedlineCitation>\n'''
-    
-    xml += '</MedlineCitationSet>'
-    return xml
+  </PubmedArticle>
+'''
+
+def generate_pubmed_xml(num_records=100):
+    """生成合规 PubMed XML（带希腊字母强化）"""
+    parts = [XML_HEADER]
+    parts.extend(render_article(1000001 + i) for i in range(num_records))
+    parts.append(XML_FOOTER)
+    return "".join(parts)  # 一次拼接，避免 xml += 的平方级复制
+
+# ===== 大规模压测语料（流式 gzip + 多进程分片）=====
+CORPUS_CONFIG = {
+    "OUTPUT_DIR": "data/mock_corpus",
+    "FILE_PREFIX": "mock25n",     # 分片命名仿照 MEDLINE：mock25n0001.xml.gz
+    "ARTICLES_PER_SHARD": 30000,  # 与真实 baseline 单文件规模相当
+    "START_PMID": 1000001,
+    "COMPRESS_LEVEL": 1,          # 压测语料追求生成速度，压缩级别取 1
+    "WRITE_BATCH": 1000,          # 每 1000 篇合并一次写入
+}
 
-def main():
-    # 生成 100 条模拟数据
-    xml_content = generate_pubmed_xml(num_records=100)
+def iter_articles(start_pmid: int, count: int, rng) -> Iterator[str]:
+    for pmid in range(start_pmid, start_pmid + count):
+        yield render_article(pmid, rng)
+
+def write_shard(path: Path, start_pmid: int, count: int, seed: int,
+                compresslevel: int = CORPUS_CONFIG["COMPRESS_LEVEL"]) -> int:
+    """把 count 篇文章流式写入一个 .xml.gz 分片，返回未压缩字节数；同一 seed 输出完全一致"""
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    written = 0
+    # mtime=0：压缩文件逐字节可复现
+    with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=compresslevel, mtime=0) as gz:
+        articles = iter_articles(start_pmid, count, rng)
+        chunk = [XML_HEADER]
+        for i, article in enumerate(articles, 1):
+            chunk.append(article)
+            if i % CORPUS_CONFIG["WRITE_BATCH"] == 0:
+                data = "".join(chunk).encode("utf-8")
+                gz.write(data)
+                written += len(data)
+                chunk = []
+        chunk.append(XML_FOOTER)
+        data = "".join(chunk).encode("utf-8")
+        gz.write(data)
+        written += len(data)
+    os.replace(tmp_path, path)
+    return written
+
+def estimate_article_bytes(seed: int, sample: int = 2000) -> float:
+    """抽样估计单篇文章的未压缩字节数（用于按目标体积换算文章数）"""
+    rng = random.Random(seed)
+    return sum(len(a.encode("utf-8")) for a in iter_articles(0, sample, rng)) / sample
+
+def parse_size(text: str) -> int:
+    """解析 "10GB" / "500MB" / "1024" 为字节数"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)B?\s*", text.upper())
+    if not match:
+        raise ValueError(f"无法识别的大小: {text}")
+    return int(float(match.group(1)) * 1024 ** " KMGT".index(match.group(2) or " "))
+
+def generate_corpus(output_dir: str = CORPUS_CONFIG["OUTPUT_DIR"], num_articles: Optional[int] = None,
+                    target_bytes: Optional[int] = None, articles_per_shard: int = CORPUS_CONFIG["ARTICLES_PER_SHARD"],
+                    workers: Optional[int] = None, seed: int = 0) -> Tuple[List[Path], dict]:
+    """生成压测语料：按文章数或目标体积（未压缩）分片，多进程并行写入
+
+    分片 i 使用 seed + i 作为随机种子、PMID 连续编号，因此结果与进程数无关、可复现。
+    返回 (分片路径, {"articles": 实际写入的文章数, "bytes": 未压缩字节数, "seconds": 耗时})
+    """
+    if num_articles is None:
+        if target_bytes is None:
+            raise ValueError("需要指定 num_articles 或 target_bytes")
+        num_articles = int(target_bytes / estimate_article_bytes(seed))
+    
+    output_dir = Path(output_dir)
+    shards = []
+    for i, start in enumerate(range(0, num_articles, articles_per_shard)):
+        count = min(articles_per_shard, num_articles - start)
+        path = output_dir / f"{CORPUS_CONFIG['FILE_PREFIX']}{i + 1:04d}.xml.gz"
+        shards.append((path, CORPUS_CONFIG["START_PMID"] + start, count, seed + i))
     
-    # 企业级验证（医药数据合规性）
-    if not validate_medical_xml(xml_content):
-        print("⚠️ 生成数据不符合医药规范，重新生成...")
-        xml_content = generate_pubmed_xml(num_records=100)  # 重试一次
+    from tqdm import tqdm  # 仅语料生成需要进度条
     
-    # 保存为 gz 压缩文件
-    output_path = Path("data") / "medline19n0001.xml.gz"
-    output_path.parent.mkdir(exist_ok=True)
+    started = time.perf_counter()
+    total_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(write_shard, *shard): shard for shard in shards}
+        with tqdm(total=num_articles, desc="生成语料", unit="article", unit_scale=True) as bar:
+            for future in as_completed(futures):
+                total_bytes += future.result()
+                bar.update(futures[future][2])
     
-    with gzip.open(output_path, 'wt', encoding='utf-8') as f:
-        f.write(xml_content)
+    elapsed = time.perf_counter() - started
+    print(f"✅ 生成 {num_articles} 篇 / {len(shards)} 个分片 / 未压缩 {total_bytes / 1024 ** 3:.2f} GB，"
+          f"耗时 {elapsed:.1f}s ({num_articles / elapsed:.0f} 篇/秒)")
+    return [shard[0] for shard in shards], {"articles": num_articles, "bytes": total_bytes, "seconds": elapsed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成模拟 PubMed 数据")
+    parser.add_argument("--articles", type=int, default=None, help="压测语料：文章总数（如 5000000）")
+    parser.add_argument("--target-size", default=None, help="压测语料：未压缩目标体积（如 10GB）")
+    parser.add_argument("--shard-size", type=int, default=CORPUS_CONFIG["ARTICLES_PER_SHARD"], help="每个分片的文章数")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认=CPU核数）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（相同种子生成相同语料）")
+    parser.add_argument("--output-dir", default=CORPUS_CONFIG["OUTPUT_DIR"])
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
     
-    print(f"\n✅ 生成合规医药数据: {output_path} (100 条记录)")
-    print("💡 包含：希腊字母(β/μ)、结构化摘要、PMID 连续编号")
+    with run_metrics("mockdata", args.metrics, args.profile) as metrics:
+        if args.articles or args.target_size:
+            target_bytes = parse_size(args.target_size) if args.target_size else None
+            with metrics.stage("generate"):
+                shards, stats = generate_corpus(args.output_dir, args.articles, target_bytes, args.shard_size,
+                                                args.workers, args.seed)
+            # --target-size 时文章数由抽样估算得出，记录实际写入的篇数
+            metrics.count("generate", records=stats["articles"], bytes_out=sum(path_bytes(p) for p in shards))
+            return
+        
+        # 生成 100 条模拟数据
+        with metrics.stage("generate", records=100):
+            xml_content = generate_pubmed_xml(num_records=100)
+        
+        # 企业级验证（医药数据合规性）
+        with metrics.stage("validate"):
+            valid = validate_medical_xml(xml_content)
+        if not valid:
+            print("⚠️ 生成数据不符合医药规范，重新生成...")
+            xml_content = generate_pubmed_xml(num_records=100)  # 重试一次
+        
+        # 保存为 gz 压缩文件
+        output_path = Path("data") / "medline19n0001.xml.gz"
+        output_path.parent.mkdir(exist_ok=True)
+        
+        with metrics.stage("write", bytes_in=len(xml_content.encode("utf-8"))):
+            with gzip.open(output_path, 'wt', encoding='utf-8') as f:
+                f.write(xml_content)
+        metrics.count("write", bytes_out=path_bytes(output_path))
+        
+        print(f"\n✅ 生成合规医药数据: {output_path} (100 条记录)")
+        print("💡 包含：希腊字母(β/μ)、结构化摘要、PMID 连续编号")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,71 +1,55 @@
-from bs4 import BeautifulSoup
+from pathlib import Path
+import argparse
 import csv
-import re
 
-# 从文件读取XML数据并使用BeautifulSoup解析
-def parse_xml_file_with_bs4(file_path):
+from scripts.columnar import write_partition
+from scripts.medline import BACKENDS, iter_records
+from scripts.metrics import add_metrics_arguments, path_bytes, run_metrics
+
+# CSV/Parquet 输出的列名
+COLUMNS = ['PMID', 'ArticleTitle', 'Background', 'Method', 'Results']
+
+# 流式读取XML并逐条产出 [PMID, 标题, 背景, 方法, 结果]（支持 .xml / .xml.gz）
+def iter_xml_file_with_bs4(file_path, backend="bs4"):
+    # 统一解析核心：摘要段落优先取 NLM 的 Label/NlmCategory 属性，否则按 "[LABEL] 正文" 切分
+    for record in iter_records(file_path, backend=backend):
+        sections = record["sections"]
+        yield [
+            record["pmid"],
+            record["title"],
+            sections.get('BACKGROUND', ""),
+            sections.get('METHODS', ""),
+            sections.get('RESULTS', ""),
+        ]
+
+# 从文件读取XML数据并使用BeautifulSoup解析（支持 .xml / .xml.gz），返回 [PMID, 标题, 背景, 方法, 结果] 列表
+def parse_xml_file_with_bs4(file_path, backend="bs4"):
     try:
-        # 读取XML文件内容
-        with open(file_path, 'r', encoding='utf-8') as file:
-            xml_content = file.read()
-        
-        # 使用BeautifulSoup解析XML，指定'xml'解析器
-        soup = BeautifulSoup(xml_content, 'xml')
-        
-        # 查找所有PubmedArticle元素
-        articles = soup.find_all('PubmedArticle')
-        
-        # 准备存储数据的列表
-        data = []
-        
-        # 遍历每个文章
-        for article in articles:
-            # 提取PMID
-            pmid_elem = article.find('PMID')
-            pmid = pmid_elem.text.strip() if pmid_elem and pmid_elem.text else "N/A"
-            
-            # 提取文章标题
-            title_elem = article.find('ArticleTitle')
-            title = title_elem.text.strip() if title_elem and title_elem.text else "N/A"
-            
-            # 提取摘要文本
-            abstract_elem = article.find('Abstract')
-            abstract = abstract_elem.text.strip() if abstract_elem and abstract_elem.text else ""
-            
-            # 解析摘要中的各个部分
-            background = ""
-            method = ""
-            results = ""
-            
-            # 使用正则表达式提取各部分
-            background_match = re.search(r'\[BACKGROUND\](.*?)(?=\[|$)', abstract, re.DOTALL)
-            if background_match:
-                background = background_match.group(1).strip()
-            
-            method_match = re.search(r'\[METHOD\](.*?)(?=\[|$)', abstract, re.DOTALL)
-            if method_match:
-                method = method_match.group(1).strip()
-            
-            results_match = re.search(r'\[RESULTS\](.*?)(?=\[|$)', abstract, re.DOTALL)
-            if results_match:
-                results = results_match.group(1).strip()
-            
-            # 添加到数据列表
-            data.append([pmid, title, background, method, results])
-        
-        return data
+        return list(iter_xml_file_with_bs4(file_path, backend))
     
     except Exception as e:
         print(f"解析XML文件时出错: {e}")
         return []
 
+# 同上，但结果存入紧凑的列式 RecordStore（UTF-8 缓冲 + 偏移量），内存约为列表的几分之一
+# 行视图按 [PMID, 标题, 背景, 方法, 结果] 顺序迭代，可直接交给 write_to_csv
+def load_xml_file_with_bs4(file_path, backend="bs4"):
+    from scripts.recordstore import RecordStore
+
+    try:
+        return RecordStore.from_records(iter_xml_file_with_bs4(file_path, backend), COLUMNS)
+    
+    except Exception as e:
+        print(f"解析XML文件时出错: {e}")
+        return RecordStore(COLUMNS)
+
 # 将数据写入CSV文件
 def write_to_csv(data, output_file):
     try:
         with open(output_file, 'w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
             # 写入表头
-            writer.writerow(['PMID', 'ArticleTitle', 'Background', 'Method', 'Results'])
+            writer.writerow(COLUMNS)
             # 写入数据
             writer.writerows(data)
         
@@ -76,25 +60,59 @@ def write_to_csv(data, output_file):
         print(f"写入CSV文件时出错: {e}")
         return False
 
+# 边解析边写入 Parquet 数据集（按源文件分区，不在内存中攒全量数据）
+def write_to_parquet(rows, output_dir, source_file):
+    try:
+        records = (dict(zip(COLUMNS, row)) for row in rows)
+        total = write_partition(records, Path(output_dir), source_file, columns=COLUMNS)
+        print(f"Parquet数据已生成: {output_dir}，包含 {total} 条记录")
+        return True
+    
+    except Exception as e:
+        print(f"写入Parquet时出错: {e}")
+        return False
+
 # 主函数
-def main():
-    # 输入和输出文件路径
-    xml_file_path = 'data/medline19n0001.xml'  # 替换为您的XML文件路径
-    csv_file_path = 'data/pubmed_sample.csv'
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="解析PubMed XML并输出结构化摘要")
+    parser.add_argument("--input", default='data/medline19n0001.xml.gz', help="XML文件路径（.xml 或 .xml.gz）")
+    parser.add_argument("--output", default=None, help="输出路径（CSV文件或Parquet数据集目录）")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--backend", choices=BACKENDS, default="bs4", help="XML解析后端")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
     
-    # 解析XML文件
-    data = parse_xml_file_with_bs4(xml_file_path)
+    # 输入和输出文件路径
+    xml_file_path = args.input
     
-    if data:
-        # 写入CSV文件
-        write_to_csv(data, csv_file_path)
+    with run_metrics("parse_pubmed", args.metrics, args.profile) as metrics:
+        if args.format == "parquet":
+            parquet_dir = args.output or 'data/pubmed_sample.parquet'
+            rows = metrics.track("parse", iter_xml_file_with_bs4(xml_file_path, args.backend))
+            with metrics.stage("write"):  # 边解析边写，含解析耗时
+                write_to_parquet(rows, parquet_dir, Path(xml_file_path).name)
+            metrics.count("write", bytes_out=path_bytes(parquet_dir))
+            return
+        
+        csv_file_path = args.output or 'data/pubmed_sample.csv'
         
-        # 打印前几行数据作为预览
-        print("\n前几行数据预览:")
-        for i, row in enumerate(data[:2]):  # 显示前2条记录
-            print(f"记录 {i+1}: {row}")
-    else:
-        print("没有解析到数据，请检查XML文件路径和格式")
+        # 解析XML文件
+        with metrics.stage("parse", bytes_in=path_bytes(xml_file_path)):
+            data = load_xml_file_with_bs4(xml_file_path, args.backend)
+        metrics.count("parse", records=len(data))
+        
+        if data:
+            # 写入CSV文件
+            with metrics.stage("write", records=len(data)):
+                write_to_csv(data, csv_file_path)
+            metrics.count("write", bytes_out=path_bytes(csv_file_path))
+            
+            # 打印前几行数据作为预览
+            print("\n前几行数据预览:")
+            for i, row in enumerate(data[:2]):  # 显示前2条记录
+                print(f"记录 {i+1}: {row}")
+        else:
+            print("没有解析到数据，请检查XML文件路径和格式")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
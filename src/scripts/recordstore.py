@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import Iterable, Iterator, List, Sequence
+
+
+class StringColumn:
+    """一列字符串：连续的 UTF-8 字节缓冲 + int64 偏移量（即 Arrow large_string 的内存布局）"""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+
+    def append(self, text: str):
+        if not isinstance(text, str):
+            text = "" if text is None else str(text)
+        self.data += text.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class RecordView:
+    """只读行视图：不复制数据，按需从列缓冲解码；支持 view["title"]、dict(view)、按列顺序迭代"""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: "RecordStore", index: int):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, column: str) -> str:
+        return self._store.value(self._index, column)
+
+    def get(self, column: str, default=None):
+        return self[column] if column in self._store.columns else default
+
+    def keys(self) -> List[str]:
+        return list(self._store.columns)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._store.value(self._index, c) for c in self._store.columns)
+
+    def __len__(self) -> int:
+        return len(self._store.columns)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._store.columns, self))
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class RecordStore:
+    """紧凑的列式记录容器，替代 list[dict] / list[list]
+
+    每列一个 StringColumn，PMID 也按原样存成字符串（保留前导零与 "N/A" 等非数字值）。
+    每条记录只占字节本身 + 每列 8 字节偏移，没有逐条的 dict / str 对象开销。
+    to_arrow() / to_pandas() 直接引用这些缓冲区（零拷贝）；导出对象存活期间不能再 append
+    （bytearray 被导出后拒绝扩容，会抛 BufferError）。
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        self._strings = {c: StringColumn() for c in self.columns}
+
+    @classmethod
+    def from_records(cls, records: Iterable, columns: Sequence[str]) -> "RecordStore":
+        store = cls(columns)
+        store.extend(records)
+        return store
+
+    # ----- 写入 -----
+    def append(self, record: dict):
+        """追加一条 dict 记录（缺失的列记为空串）"""
+        self.append_row([record.get(c, "") for c in self.columns])
+
+    def append_row(self, values: Sequence):
+        """按列顺序追加一行（如 parse_pubmed 的 [PMID, 标题, 背景, 方法, 结果]）"""
+        for column, value in zip(self.columns, values):
+            self._strings[column].append(value)
+
+    def extend(self, records: Iterable):
+        """边解析边写入：records 为 dict 或按列顺序的序列，逐条追加，不在内存里攒中间列表"""
+        for record in records:
+            if isinstance(record, dict):
+                self.append(record)
+            else:
+                self.append_row(record)
+
+    # ----- 读取 -----
+    def __len__(self) -> int:
+        return len(self._strings[self.columns[0]])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [RecordView(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return RecordView(self, i)
+
+    def __iter__(self) -> Iterator[RecordView]:
+        return (RecordView(self, i) for i in range(len(self)))
+
+    def value(self, index: int, column: str) -> str:
+        return self._strings[column][index]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self._strings.values())
+
+    # ----- 导出 -----
+    def to_arrow(self):
+        """零拷贝导出为 pyarrow.Table：所有列（含 PMID）均为 large_string，偏移量数组直接作为 Arrow 缓冲区"""
+        from scripts.columnar import _require_pyarrow
+        pa, _ = _require_pyarrow()
+
+        n = len(self)
+        arrays = []
+        for column in self.columns:
+            strings = self._strings[column]
+            arrays.append(pa.Array.from_buffers(pa.large_string(), n, [
+                None, pa.py_buffer(strings.offsets), pa.py_buffer(strings.data)]))
+        return pa.Table.from_arrays(arrays, names=self.columns)
+
+    def to_pandas(self):
+        """导出 DataFrame：装有 pyarrow 时为 Arrow 支撑的列（零拷贝），否则退回普通 object 列"""
+        import pandas as pd
+        try:
+            return self.to_arrow().to_pandas(types_mapper=pd.ArrowDtype)
+        except ImportError:
+            data = {}
+            for column in self.columns:
+                strings = self._strings[column]
+                data[column] = [strings[i] for i in range(len(self))]
+            return pd.DataFrame(data, columns=self.columns)
+
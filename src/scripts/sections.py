@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+# ===== 结构化摘要分段 =====
+UNASSIGNED = "UNASSIGNED"  # 与 NLM 的 NlmCategory 取值一致
+NLM_CATEGORIES = ("BACKGROUND", "OBJECTIVE", "METHODS", "RESULTS", "CONCLUSIONS")
+
+# 常见标签写法 → NLM 类别（BACKGROUND/OBJECTIVE/METHODS/RESULTS/CONCLUSIONS）
+LABEL_ALIASES = {
+    "INTRODUCTION": "BACKGROUND",
+    "AIM": "OBJECTIVE", "AIMS": "OBJECTIVE", "OBJECTIVES": "OBJECTIVE", "PURPOSE": "OBJECTIVE",
+    "METHOD": "METHODS", "MATERIALS AND METHODS": "METHODS", "DESIGN": "METHODS",
+    "RESULT": "RESULTS", "FINDINGS": "RESULTS",
+    "CONCLUSION": "CONCLUSIONS", "INTERPRETATION": "CONCLUSIONS",
+}
+# 其余常见的结构化摘要标签（保留原名，不归并）
+_OTHER_LABELS = ("CONTEXT", "IMPORTANCE", "SETTING", "SETTINGS", "PARTICIPANTS", "PATIENTS", "INTERVENTIONS",
+                 "MEASUREMENTS", "MAIN OUTCOME MEASURES", "LIMITATIONS", "SIGNIFICANCE", "TRIAL REGISTRATION",
+                 "CASE PRESENTATION", "SUMMARY")
+
+# 行首标签：任意以字母开头的写法；"[3H]-labelled"、"[n=3]" 这类以数字/符号开头的不算
+_LABEL = r"[A-Za-z][A-Za-z /&,-]{0,60}"
+# 行内标签（如 "[BACKGROUND] ... [METHODS] ..." 写在同一行）：已知标签（不分大小写），
+# 或全大写的多词 / 6 个字母以上的单词；"[CI]"、"[HIV]" 这类正文中的缩写不会被当作段落
+_KNOWN = "|".join(re.escape(label) for label in
+                  sorted({*NLM_CATEGORIES, *LABEL_ALIASES, *_OTHER_LABELS}, key=len, reverse=True))
+_INLINE_LABEL = rf"(?i:{_KNOWN})|[A-Z]{{2,}}(?:[ /&,-]+[A-Z]{{2,}})+|[A-Z]{{6,}}"
+_BOUNDARY = rf"^[ \t]*\[(?P<label>{_LABEL})\]|\[(?P<inline>{_INLINE_LABEL})\]"
+
+# 一次扫描得到所有 (标签, 正文)；\A 分支捕获第一个标签之前的无标签正文；
+# 标签在 label（行首）或 inline（行内）组中，用 section_label() 读取
+SECTION_RE = re.compile(
+    rf"(?:(?:{_BOUNDARY})[ \t]*|\A)(?P<text>.*?)(?=^[ \t]*\[{_LABEL}\]|\[(?:{_INLINE_LABEL})\]|\Z)",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+def section_label(match: "re.Match") -> Optional[str]:
+    """SECTION_RE 匹配到的原始标签（无标签的开头正文为 None）"""
+    return match.group("label") or match.group("inline")
+
+
+def normalize_label(label: Optional[str]) -> str:
+    """标签归一化：大写 + 同义词合并，空标签记为 UNASSIGNED"""
+    if not label:
+        return UNASSIGNED
+    label = " ".join(label.upper().split())
+    return LABEL_ALIASES.get(label, label)
+
+
+def sections_from_pairs(pairs: Iterable[Tuple[Optional[str], str]]) -> Dict[str, str]:
+    """(标签, 正文) 序列 → {NLM类别: 正文}；同一类别出现多次时按顺序换行拼接"""
+    sections: Dict[str, str] = {}
+    for label, text in pairs:
+        text = text.strip()
+        if not text:
+            continue
+        key = normalize_label(label)
+        sections[key] = f"{sections[key]}\n{text}" if key in sections else text
+    return sections
+
+
+def split_sections(abstract: str) -> Dict[str, str]:
+    """单次扫描切分 "[LABEL] 正文" 格式的摘要，返回所有段落"""
+    return sections_from_pairs(
+        (section_label(m), m.group("text")) for m in SECTION_RE.finditer(abstract or "")
+    )
+
+
+def split_sections_series(abstracts):
+    """向量化切分整列摘要（pandas Series → 每个类别一列的 DataFrame，索引与输入对齐）"""
+    import pandas as pd
+
+    matches = abstracts.fillna("").str.extractall(SECTION_RE)
+    if matches.empty:
+        return pd.DataFrame(index=abstracts.index)
+    matches["text"] = matches["text"].fillna("").str.strip()
+    matches = matches[matches["text"] != ""]
+    labels = matches["label"].fillna(matches["inline"]).fillna("").str.upper().str.split().str.join(" ")
+    matches["label"] = labels.replace(LABEL_ALIASES).replace("", UNASSIGNED)
+    row = matches.index.get_level_values(0)
+    frame = matches.groupby([row, "label"], sort=False)["text"].agg("\n".join).unstack("label")
+    return frame.reindex(abstracts.index).fillna("")
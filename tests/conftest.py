@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# 未安装时直接从 src/ 导入 scripts / aitools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+class InFlight:
+    """并发计数器：`with in_flight as number:` 包住一次请求，number 为本次请求的序号（从 1 开始）
+
+    requests 为总次数，active 为在途数，peak 为峰值
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = self.active = self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.requests += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            return self.requests
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.active -= 1
+
+
+@pytest.fixture
+def in_flight():
+    return InFlight()
+
+
+@pytest.fixture
+def http_server():
+    """本地假服务工厂：http_server(Handler, **类属性) → (handler, base_url)
+
+    每次启动都派生一个新的 Handler 子类（类属性互不影响），并挂上独立的 handler.in_flight 计数器；
+    服务监听随机端口，测试结束后关闭。
+    """
+    servers = []
+
+    def start(handler_cls, **attrs):
+        handler = type(handler_cls.__name__, (handler_cls,), {"in_flight": InFlight(), **attrs})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return handler, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from aitools.batch_extract import BATCH_EXTRACT_CONFIG, ExtractionCache, cache_key, extract_corpus
+
+RECORDS = [{"pmid": str(1000 + i), "title": f"Trial {i}", "abstract": f"Patients received {i + 1}0 mg daily."}
+           for i in range(24)]
+
+_DOSAGE_RE = re.compile(r"\b\d+(?:\.\d+)?\s?(?:mg|mcg|µg|g|ml|mL|IU)\b")
+
+
+class OllamaStub(BaseHTTPRequestHandler):
+    """兼容 Ollama /api/generate 的模型桩：把文本中的剂量（如 10 mg）作为 dosage 抽取结果返回"""
+
+    latency = 0.0
+
+    def do_POST(self):
+        with self.in_flight:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            question = payload.get("prompt", "").rsplit("Q:", 1)[-1].rsplit("A:", 1)[0]  # 只看最后一个待抽取的文本
+            extractions = [{"dosage": m.group(), "dosage_attributes": {"medication_group": "unknown"}}
+                           for m in _DOSAGE_RE.finditer(question)]
+            time.sleep(self.latency)
+            body = json.dumps({"model": payload.get("model"), "done": True,
+                               "response": json.dumps({"extractions": extractions})}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(http_server):
+    return http_server(OllamaStub, latency=0.05)
+
+
+def ollama_extract(url):
+    """与 langextract 的 Ollama 后端相同的请求格式；返回 AnnotatedDocument 形式的字典"""
+    session = requests.Session()
+
+    def extract(text):
+        response = session.post(f"{url}/api/generate", json={"model": "stub", "prompt": f"Q: {text}\nA:"}, timeout=10)
+        response.raise_for_status()
+        return {"text": text, "extractions": json.loads(response.json()["response"])["extractions"]}
+    return extract
+
+
+def key_fn(text):
+    return cache_key(text, "prompt", [], "stub", 0.0)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return {doc["document_id"]: doc for doc in map(json.loads, f)}
+
+
+def test_extract_corpus_is_concurrent_and_cached(stub, tmp_path):
+    handler, url = stub
+    output = tmp_path / "extractions.jsonl"
+    with ExtractionCache(tmp_path / "cache.sqlite") as cache:
+        stats = extract_corpus(RECORDS, output, ollama_extract(url), cache, key_fn, workers=3, progress=False)
+    assert stats["extracted"] == len(RECORDS) and stats["cached"] == 0 and stats["failed"] == 0
+    assert 1 < handler.in_flight.peak <= 3
+    first = read_jsonl(output)
+    assert first["pmid_1004"]["extractions"] == [
+        {"dosage": "50 mg", "dosage_attributes": {"medication_group": "unknown"}}]
+
+    # 重跑（新进程打开同一缓存）：全部命中，不再请求模型，结果不变
+    requests_before = handler.in_flight.requests
+    with ExtractionCache(tmp_path / "cache.sqlite") as cache:
+        stats = extract_corpus(RECORDS, output, ollama_extract(url), cache, key_fn, workers=3, progress=False)
+    assert stats["cached"] == len(RECORDS) and stats["extracted"] == 0
+    assert handler.in_flight.requests == requests_before
+    assert read_jsonl(output) == first
+
+
+def test_in_flight_documents_are_bounded(stub, tmp_path):
+    _, url = stub
+    workers = 2
+    produced, started = [], []
+    lock = threading.Lock()
+    extract = ollama_extract(url)
+
+    def records():
+        for record in RECORDS:
+            produced.append(record["pmid"])
+            yield record
+
+    def tracked(text):
+        with lock:
+            started.append(len(produced))
+        return extract(text)
+
+    with ExtractionCache(tmp_path / "cache.sqlite") as cache:
+        stats = extract_corpus(records(), tmp_path / "out.jsonl", tracked, cache, key_fn, workers, progress=False)
+    assert stats["extracted"] == len(RECORDS)
+    # 第 i 个请求开始时，上游最多已读出 i + 在途上限 篇（不会把整个语料读进内存）
+    max_in_flight = workers * BATCH_EXTRACT_CONFIG["QUEUE_FACTOR"]
+    assert all(count <= i + max_in_flight for i, count in enumerate(started, 1))
+
+
+def test_cache_key_depends_on_prompt_model_and_temperature():
+    base = cache_key("text", "prompt", [], "gemma2:2b", 0.0)
+    assert base == cache_key("text", "prompt", [], "gemma2:2b", 0.0)
+    assert base != cache_key("text", "prompt v2", [], "gemma2:2b", 0.0)
+    assert base != cache_key("text", "prompt", [], "llama3", 0.0)
+    assert base != cache_key("text", "prompt", [], "gemma2:2b", 0.3)
+    assert base != cache_key("text", "prompt", [{"text": "example"}], "gemma2:2b", 0.0)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from scripts.chunking import chunk_corpus, chunk_record
+
+
+def sentences(prefix, count, words=9):
+    return " ".join(f"{prefix} sentence {i} " + " ".join(f"w{k}" for k in range(words - 3)) + "."
+                    for i in range(count))
+
+
+ABSTRACT = (f"[BACKGROUND] {sentences('Background', 12)}\n[METHODS] {sentences('Methods', 12)}\n"
+            f"[RESULTS] {sentences('Results', 12)}")
+
+
+def record(abstract, title="Aspirin", pmid="1"):
+    return {"pmid": pmid, "title": title, "abstract": abstract}
+
+
+def test_offsets_and_token_budget():
+    chunks = list(chunk_record(record(ABSTRACT), max_tokens=40, overlap_tokens=12, min_tokens=10))
+    assert len(chunks) > 3
+    assert [c["chunk_id"] for c in chunks] == [f"1#{n}" for n in range(len(chunks))]
+    for chunk in chunks:
+        assert chunk["tokens"] <= 40
+        assert chunk["tokens"] == len(chunk["text"].split())
+        assert "+" not in chunk["section"]  # 每段都足够长，不会合并段落
+        assert ABSTRACT[chunk["start"]:chunk["end"]] == chunk["text"]
+
+
+def test_overlap_stays_within_section():
+    chunks = list(chunk_record(record(ABSTRACT), max_tokens=40, overlap_tokens=12, min_tokens=10))
+    overlaps = 0
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur["start"] > prev["start"]  # 至少前进一句
+        if cur["start"] < prev["end"]:
+            overlaps += 1
+            assert cur["section"] == prev["section"]
+            assert "[" not in ABSTRACT[cur["start"]:prev["end"]]
+        else:
+            assert cur["section"] != prev["section"]  # 只有换段时才不重叠
+    assert overlaps > 0
+    assert [c["section"] for c in chunks if c["start"] >= ABSTRACT.index("[METHODS]")][0] == "METHODS"
+
+
+def test_short_sections_are_merged():
+    abstract = "[BACKGROUND] Short one. [METHODS] Short two. [RESULTS] Short three."
+    chunks = list(chunk_record(record(abstract), max_tokens=40, overlap_tokens=12, min_tokens=10))
+    assert len(chunks) == 1
+    assert chunks[0]["section"] == "BACKGROUND+METHODS+RESULTS"
+    assert chunks[0]["text"] == "Short one. Short two. Short three."
+
+
+def test_oversized_sentence_is_hard_split():
+    long_sentence = "Then " + " ".join(f"t{i}" for i in range(94)) + "."
+    abstract = f"Intro sentence here. {long_sentence}"
+    chunks = list(chunk_record(record(abstract), max_tokens=40, overlap_tokens=0, min_tokens=10))
+    assert all(c["tokens"] <= 40 for c in chunks)
+    covered = " ".join(c["text"] for c in chunks).split()
+    assert covered == abstract.split()  # 无重叠时各块恰好覆盖全文
+    assert [c["tokens"] for c in chunks] == [3, 40, 40, 15]
+
+
+def test_title_only_records_emit_a_title_chunk():
+    assert list(chunk_record(record("", title="Aspirin and pain"))) == [
+        {"chunk_id": "1#0", "pmid": "1", "title": "Aspirin and pain", "section": "TITLE", "start": 0, "end": 0,
+         "tokens": 3, "text": "Aspirin and pain"}]
+    assert list(chunk_record(record(None, title="Aspirin")))[0]["section"] == "TITLE"
+    assert list(chunk_record(record("", title=""))) == []
+
+
+def test_chunk_corpus_writes_jsonl_and_skips_existing(tmp_path, capsys):
+    path = tmp_path / "part.csv"
+    path.write_text('pmid,title,abstract\n1,Aspirin,"[RESULTS] Pain fell. It worked."\n2,Heparin only,\n',
+                    encoding="utf-8")
+    stats = chunk_corpus([path], tmp_path / "chunks", workers=1)
+    assert stats["records"] == 2 and stats["chunks"] == 2
+    lines = (tmp_path / "chunks" / "part.csv.chunks.jsonl").read_text(encoding="utf-8").splitlines()
+    chunks = [json.loads(line) for line in lines]
+    assert [(c["pmid"], c["section"], c["text"]) for c in chunks] == [
+        ("1", "RESULTS", "Pain fell. It worked."), ("2", "TITLE", "Heparin only")]
+
+    assert chunk_corpus([path], tmp_path / "chunks", workers=1)["chunks"] == 0
+    assert "跳过" in capsys.readouterr().out
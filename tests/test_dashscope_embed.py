@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler
+
+import numpy as np
+import pytest
+import requests
+
+from aitools.dashscope_embed import DASHSCOPE_CONFIG, DashScopeEncoder, TokenBucket, retry_after_seconds
+
+DIM = 8
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setitem(DASHSCOPE_CONFIG, "BACKOFF_BASE", 0.01)
+
+
+class DashScopeFake(BaseHTTPRequestHandler):
+    """与 DashScope 接口格式一致的假服务：前 throttle_first 个请求返回 429（或 error_status），之后正常返回向量"""
+
+    dim = DIM
+    throttle_first = 0
+    error_status = 429
+    retry_after = "0.1"  # 429 响应的 Retry-After（秒数或 HTTP 日期）
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", self.retry_after)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        with self.in_flight as number:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if number <= self.throttle_first:
+                self._send(self.error_status, {"code": "Throttling", "message": "scripted"})
+                return
+            contents = payload.get("input", {}).get("contents", [])
+            embeddings = []
+            for i, item in enumerate(contents):
+                # 同一文本总是得到同一向量
+                seed = int.from_bytes(hashlib.blake2b(item.get("text", "").encode("utf-8"), digest_size=8).digest(),
+                                      "little")
+                vector = np.random.default_rng(seed).normal(size=self.dim)
+                embeddings.append({"index": i, "embedding": vector.round(6).tolist(), "type": "text"})
+            tokens = sum(len(item.get("text", "")) // 4 + 1 for item in contents)
+            self._send(200, {"output": {"embeddings": embeddings}, "usage": {"input_tokens": tokens},
+                             "request_id": f"fake-{number}"})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake(http_server):
+    return lambda **attrs: http_server(DashScopeFake, **attrs)
+
+
+def make_encoder(base_url, **kwargs):
+    return DashScopeEncoder(api_key="test", base_url=base_url, dim=DIM, **{"rps": 1000.0, "burst": 1000, **kwargs})
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(10)]) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 30 个令牌，先用掉容量内的 5 个，其余按 50/s 补充
+    assert time.perf_counter() - start >= (30 - 5) / 50 * 0.95
+
+
+def test_encoder_respects_rate_limit(fake):
+    handler, url = fake()
+    encoder = make_encoder(url, rps=20.0, burst=2, batch_size=2, concurrency=4)
+    start = time.perf_counter()
+    vectors = encoder.encode([f"text {i}" for i in range(20)])
+    elapsed = time.perf_counter() - start
+    encoder.close()
+
+    assert vectors.shape == (20, DIM)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+    assert handler.in_flight.requests == 10
+    assert elapsed >= (10 - 2) / 20 * 0.95
+
+
+def test_retry_after_seconds_is_a_minimum(fake):
+    handler, url = fake(throttle_first=1, retry_after="1")
+    encoder = make_encoder(url)
+    start = time.perf_counter()
+    vectors = encoder.encode(["aspirin"])
+    elapsed = time.perf_counter() - start
+    encoder.close()
+
+    assert vectors.shape == (1, DIM)
+    assert handler.in_flight.requests == 2 and encoder.usage.retries == 1
+    assert elapsed >= 1.0  # 不得早于服务端要求的时间重试
+
+
+def test_retry_after_http_date(fake):
+    when = datetime.now(timezone.utc) + timedelta(seconds=2)
+    handler, url = fake(throttle_first=1, retry_after=format_datetime(when, usegmt=True))
+    encoder = make_encoder(url)
+    start = time.perf_counter()
+    encoder.encode(["aspirin"])
+    elapsed = time.perf_counter() - start
+    encoder.close()
+
+    assert handler.in_flight.requests == 2
+    assert elapsed >= 1.0  # HTTP 日期只精确到秒
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds("2.5") == 2.5
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # 已过去的时间
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= retry_after_seconds(future) <= 30
+
+
+def test_unparseable_retry_after_falls_back_to_backoff(fake):
+    handler, url = fake(throttle_first=2, retry_after="later")
+    encoder = make_encoder(url)
+    assert encoder.encode(["aspirin"]).shape == (1, DIM)
+    encoder.close()
+    assert handler.in_flight.requests == 3 and encoder.usage.retries == 2
+
+
+def test_client_errors_are_not_retried(fake):
+    handler, url = fake(throttle_first=1, error_status=400)
+    encoder = make_encoder(url)
+    with pytest.raises(RuntimeError):
+        encoder.encode(["aspirin"])
+    encoder.close()
+    assert handler.in_flight.requests == 1 and encoder.usage.retries == 0
+
+
+def test_connection_errors_are_retried(monkeypatch):
+    monkeypatch.setitem(DASHSCOPE_CONFIG, "MAX_RETRIES", 2)
+    with socket.socket() as sock:  # 取一个空闲端口，关闭后连接会被拒绝
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    encoder = make_encoder(f"http://127.0.0.1:{port}")
+    with pytest.raises(requests.ConnectionError):
+        encoder.encode(["aspirin"])
+    encoder.close()
+    assert encoder.usage.retries == 2
+
+
+def test_programming_errors_are_not_retried(fake, monkeypatch):
+    _, url = fake()
+    encoder = make_encoder(url)
+    monkeypatch.setattr(encoder, "_post", lambda texts: {}["output"])
+    with pytest.raises(KeyError):
+        encoder.encode(["aspirin"])
+    encoder.close()
+    assert encoder.usage.retries == 0
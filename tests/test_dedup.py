@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import numpy as np
+
+from scripts.dedup import MinHasher, _union, find_duplicates, lsh_clusters, record_tokens, write_duplicates
+
+VOCAB = [f"term{i}" for i in range(5000)]
+
+
+def document(rng, words=120):
+    return " ".join(rng.choice(VOCAB) for _ in range(words))
+
+
+def perturb(rng, text, edits=2):
+    words = text.split()
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = rng.choice(VOCAB)
+    return " ".join(words)
+
+
+def corpus():
+    """200 篇互不相关的文档，其中 3 篇在后面各有近重复（含重复的重复），另有两篇仅标题且标题相同"""
+    rng = random.Random(7)
+    records = [{"pmid": str(1000 + i), "title": f"Study {i}", "abstract": document(rng)} for i in range(200)]
+    records.append({"pmid": "2000", "title": "Study 5", "abstract": perturb(rng, records[5]["abstract"])})
+    records.append({"pmid": "2001", "title": "Study 42", "abstract": perturb(rng, records[42]["abstract"])})
+    records.append({"pmid": "2002", "title": "Study 5", "abstract": perturb(rng, records[200]["abstract"])})
+    records.append({"pmid": "2003", "title": "Study 9", "abstract": "[BACKGROUND] " + records[9]["abstract"]})
+    records.append({"pmid": "3000", "title": "Erratum for the same trial", "abstract": ""})
+    records.append({"pmid": "3001", "title": "Erratum for the same trial", "abstract": None})
+    return records
+
+
+def duplicate_map(result):
+    pmids, labels = result["pmids"], result["labels"]
+    return {pmids[i]: pmids[labels[i]] for i in np.flatnonzero(labels != np.arange(len(labels)))}
+
+
+def test_planted_duplicates_cluster_onto_earliest_pmid():
+    result = find_duplicates(corpus(), batch_size=64, progress=False)  # 跨批次签名可比较
+    assert duplicate_map(result) == {"2000": "1005", "2002": "1005", "2001": "1042", "2003": "1009"}
+    stats = result["stats"]
+    assert stats["documents"] == 206 and stats["duplicates"] == 4 and stats["clusters"] == 3
+    assert all(result["similarity"][i] >= 0.8 for i in range(200, 204))
+    assert result["similarity"][5] == 0.0  # 代表文档自身不算重复
+
+
+def test_empty_abstracts_are_never_duplicates(tmp_path):
+    result = find_duplicates(corpus(), progress=False)
+    assert "3000" not in duplicate_map(result) and "3001" not in duplicate_map(result)
+
+    out = tmp_path / "duplicates.csv"
+    assert write_duplicates(result, out) == 4
+    assert out.read_text(encoding="utf-8").splitlines()[0] == "pmid,duplicate_of,similarity"
+
+
+def test_signatures_estimate_jaccard():
+    hasher = MinHasher(num_perm=256)
+    rng = random.Random(3)
+    base = document(rng, 200).split()
+    near = base[:180] + document(rng, 20).split()
+    sigs = hasher.signatures([base, near, document(rng, 200).split(), []])
+    shingles = [set(zip(d, d[1:], d[2:])) for d in (base, near)]
+    jaccard = len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1])
+    assert abs((sigs[0] == sigs[1]).mean() - jaccard) < 0.1
+    assert (sigs[0] == sigs[2]).mean() < 0.05
+    assert (sigs[3] == 0xFFFFFFFF).all()
+    assert record_tokens({"title": "Aspirin", "abstract": "[RESULTS] Pain Fell."}) == ["aspirin", "pain", "fell"]
+
+
+def test_lsh_respects_valid_mask():
+    sigs = MinHasher().signatures([["same", "words", "here", "again"]] * 3)
+    labels, _ = lsh_clusters(sigs)
+    assert labels.tolist() == [0, 0, 0]
+    labels, _ = lsh_clusters(sigs, valid=np.array([True, False, True]))
+    assert labels.tolist() == [0, 1, 0]
+
+
+def test_union_merges_transitively_onto_smallest_index():
+    left, right = np.array([5, 3, 1, 7]), np.array([3, 1, 6, 8])
+    assert _union(9, left, right).tolist() == [0, 1, 2, 1, 4, 1, 1, 7, 7]
+    assert _union(3, np.array([], dtype=np.int64), np.array([], dtype=np.int64)).tolist() == [0, 1, 2]
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from scripts import delta
+from scripts.delta import PmidIndex
+
+
+def article(pmid, title, abstract=""):
+    return (f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article><ArticleTitle>{title}</ArticleTitle>"
+            f"<Abstract><AbstractText>{abstract}</AbstractText></Abstract></Article></MedlineCitation></PubmedArticle>")
+
+
+def deletion(*pmids):
+    return "<DeleteCitation>" + "".join(f"<PMID>{p}</PMID>" for p in pmids) + "</DeleteCitation>"
+
+
+def write(path, *events):
+    path.write_text("<PubmedArticleSet>" + "".join(events) + "</PubmedArticleSet>", encoding="utf-8")
+    return path
+
+
+def rows(index):
+    return {r["pmid"]: r for r in index.changed_since(0)}
+
+
+@pytest.fixture
+def index(tmp_path):
+    with PmidIndex(str(tmp_path / "pmid_index.sqlite")) as index:
+        yield index
+
+
+def test_revised_citation_updates_fingerprint(tmp_path, index):
+    baseline = write(tmp_path / "medline19n0001.xml", article(1, "Aspirin", "old"), article(2, "Heparin", "same"))
+    assert index.apply_file(baseline) == {"inserted": 2, "updated": 0, "unchanged": 0, "deleted": 0}
+    before = rows(index)
+
+    update = write(tmp_path / "medline19n0002.xml", article(1, "Aspirin", "revised"), article(2, "Heparin", "same"))
+    assert index.apply_file(update) == {"inserted": 0, "updated": 1, "unchanged": 1, "deleted": 0}
+    after = rows(index)
+    assert after["1"]["fingerprint"] != before["1"]["fingerprint"]
+    assert after["1"]["abstract"] == "revised" and after["1"]["version"] == 2
+    assert after["2"] == before["2"]  # 未变化的记录不重写，版本号不变
+    assert [r["pmid"] for r in index.changed_since(1)] == ["1"]
+
+
+def test_delete_then_reinsert(tmp_path, index):
+    index.apply_file(write(tmp_path / "medline19n0001.xml", article(1, "Aspirin"), article(2, "Heparin")))
+    stats = index.apply_file(write(tmp_path / "medline19n0002.xml", deletion(1, 99)))
+    assert stats["deleted"] == 1  # 不存在的 PMID 不计数
+    assert rows(index)["1"]["deleted"] and rows(index)["1"]["version"] == 2
+
+    # 同一文件内：先删除后重新收录，以最后一次为准
+    stats = index.apply_file(write(tmp_path / "medline19n0003.xml", deletion(2), article(2, "Heparin v2"),
+                                   article(1, "Aspirin")))
+    assert stats == {"inserted": 0, "updated": 2, "unchanged": 0, "deleted": 1}
+    current = rows(index)
+    assert not current["1"]["deleted"] and not current["2"]["deleted"]
+    assert current["2"]["title"] == "Heparin v2"
+
+    # 先收录后删除：最终不可见，之前不存在的 PMID 不落库
+    stats = index.apply_file(write(tmp_path / "medline19n0004.xml", article(3, "Statin"), deletion(3)))
+    assert stats == {"inserted": 1, "updated": 0, "unchanged": 0, "deleted": 1}
+    assert "3" not in rows(index)
+    out = tmp_path / "export.csv"
+    assert index.export_csv(out) == 2
+    assert "Statin" not in out.read_text(encoding="utf-8")
+
+
+def test_applied_file_is_skipped_and_force_reprocesses(tmp_path, index):
+    path = write(tmp_path / "medline19n0001.xml", article(1, "Aspirin"))
+    assert index.apply_file(path)["inserted"] == 1
+    assert index.apply_file(path) is None
+    assert index.current_version() == 1
+
+    write(path, article(1, "Aspirin corrected"), article(2, "Heparin"))  # 同名文件内容被替换
+    assert index.apply_file(path) is None
+    assert rows(index)["1"]["title"] == "Aspirin"
+    assert index.apply_file(path, force=True) == {"inserted": 1, "updated": 1, "unchanged": 0, "deleted": 0}
+    assert rows(index)["1"]["title"] == "Aspirin corrected"
+    assert index.conn.execute("SELECT COUNT(*) FROM applied_files").fetchone()[0] == 1
+    assert index.current_version() == 2  # 重新应用得到新的版本号，下游据此增量拉取
+
+
+def test_main_skips_and_forces(tmp_path, capsys):
+    path = write(tmp_path / "medline19n0001.xml", article(1, "Aspirin"))
+    db = str(tmp_path / "index.sqlite")
+    delta.main([str(path), "--index", db])
+    delta.main([str(path), "--index", db])
+    assert "已应用，跳过" in capsys.readouterr().out
+    delta.main([str(path), "--index", db, "--force", "--export", str(tmp_path / "out.csv")])
+    out = capsys.readouterr().out
+    assert "未变 1" in out and "导出 1 条记录" in out
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from scripts import crawler, downloader
+from scripts.downloader import ChecksumError, download_all, download_file, file_md5
+
+FILES = {f"medline19n{i:04d}.xml.gz": bytes(range(256)) * (40 + i) for i in range(1, 7)}
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    """最小的 NCBI 目录镜像：索引页、<文件>.md5、支持 Range 的文件下载，并统计并发请求数"""
+
+    files = FILES
+    md5 = {name: hashlib.md5(data).hexdigest() for name, data in FILES.items()}
+    latency = 0.0
+    ranges = []
+
+    def _reply(self, status, body=b"", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        name = self.path.rsplit("/", 1)[-1]
+        if not name:
+            links = "".join(f'<a href="{n}">{n}</a><a href="{n}.md5">{n}.md5</a>' for n in self.files)
+            return self._reply(200, f"<html><body>{links}</body></html>".encode())
+        if name.endswith(".md5") and name[:-4] in self.files:
+            return self._reply(200, f"MD5({name[:-4]})= {self.md5[name[:-4]]}\n".encode())
+        if name not in self.files:
+            return self._reply(404)
+
+        with self.in_flight:
+            time.sleep(self.latency)
+            data = self.files[name]
+            etag = [("ETag", f'"{hashlib.md5(data).hexdigest()}"')]
+            header = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if header and (if_range is None or if_range == etag[0][1]):
+                start = int(header[len("bytes="):].rstrip("-"))
+                self.ranges.append((name, start))
+                if start >= len(data):
+                    return self._reply(416)
+                return self._reply(206, data[start:], etag + [("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")])
+            return self._reply(200, data, etag)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mirror(http_server):
+    handler, url = http_server(_MirrorHandler, ranges=[])
+    return handler, url + "/"
+
+
+def test_resume_from_partial_file(mirror, tmp_path):
+    handler, base_url = mirror
+    name = "medline19n0001.xml.gz"
+    dest = tmp_path / name
+    (tmp_path / (name + ".part")).write_bytes(FILES[name][:1000])
+
+    assert download_file(base_url + name, dest, expected_md5=handler.md5[name]) == "downloaded"
+    assert dest.read_bytes() == FILES[name]
+    assert handler.ranges == [(name, 1000)]  # 只请求了缺少的部分
+    assert not (tmp_path / (name + ".part")).exists()
+
+
+def test_unchanged_file_is_skipped(mirror, tmp_path):
+    handler, base_url = mirror
+    name = "medline19n0002.xml.gz"
+    dest = tmp_path / name
+    assert download_file(base_url + name, dest, expected_md5=handler.md5[name]) == "downloaded"
+    assert download_file(base_url + name, dest, expected_md5=handler.md5[name]) == "skipped"
+    assert download_file(base_url + name, dest) == "skipped"  # 无 MD5 时比较 Content-Length
+
+
+def test_checksum_mismatch_discards_partial(mirror, tmp_path):
+    _, base_url = mirror
+    name = "medline19n0003.xml.gz"
+    dest = tmp_path / name
+    with pytest.raises(ChecksumError):
+        download_file(base_url + name, dest, expected_md5="0" * 32)
+    assert not dest.exists()
+    assert not (tmp_path / (name + ".part")).exists()  # 损坏的分段不能留下来续传
+
+
+def test_download_all_is_concurrent_and_verified(mirror, tmp_path):
+    handler, base_url = mirror
+    handler.latency = 0.2
+    paths, stats = download_all(base_url, tmp_path, workers=3)
+
+    assert [p.name for p in paths] == sorted(FILES)
+    for path in paths:
+        assert file_md5(path) == handler.md5[path.name]
+        assert (tmp_path / (path.name + ".md5")).read_text() == handler.md5[path.name]
+    assert 1 < handler.in_flight.peak <= 3
+    assert stats == {"downloaded": len(FILES), "skipped": 0, "failed": 0}
+
+
+def test_resume_without_md5_revalidates_with_if_range(mirror, tmp_path):
+    handler, base_url = mirror
+    name = "medline19n0004.xml.gz"
+    dest = tmp_path / name
+    part = tmp_path / (name + ".part")
+    part.write_bytes(b"x" * 1000)  # 旧版本远端文件的前半段
+    (tmp_path / (name + ".part.etag")).write_text('"stale"')
+
+    assert download_file(base_url + name, dest) == "downloaded"
+    assert dest.read_bytes() == FILES[name]  # ETag 不匹配：服务器返回全量，旧分段被覆盖
+    assert handler.ranges == []
+
+    part.write_bytes(b"y" * 1000)  # 没有 ETag 也没有 MD5：不续传
+    dest.unlink()
+    assert download_file(base_url + name, dest) == "downloaded"
+    assert dest.read_bytes() == FILES[name]
+    assert handler.ranges == []
+
+
+def test_interrupted_download_resumes_with_matching_etag(mirror, tmp_path):
+    handler, base_url = mirror
+    name = "medline19n0005.xml.gz"
+    dest = tmp_path / name
+    (tmp_path / (name + ".part")).write_bytes(FILES[name][:500])
+    (tmp_path / (name + ".part.etag")).write_text(f'"{handler.md5[name]}"')
+
+    assert download_file(base_url + name, dest) == "downloaded"
+    assert dest.read_bytes() == FILES[name]
+    assert handler.ranges == [(name, 500)]
+    assert not (tmp_path / (name + ".part.etag")).exists()
+
+
+def test_failed_downloads_are_not_returned(mirror, tmp_path):
+    handler, base_url = mirror
+    bad = "medline19n0006.xml.gz"
+    handler.md5 = {**handler.md5, bad: "0" * 32}  # 服务器上的 MD5 与内容不符
+    paths, stats = download_all(base_url, tmp_path, workers=3)
+
+    assert bad not in [p.name for p in paths]
+    assert all(p.exists() for p in paths)
+    assert stats["failed"] == 1
+
+    with pytest.raises(SystemExit) as exit_info:
+        downloader.main(["--base-url", base_url, "--output-dir", str(tmp_path), "--workers", "2"])
+    assert exit_info.value.code == 1
+
+
+def test_crawler_single_file_mode_is_offline(monkeypatch, tmp_path):
+    def fail(*args, **kwargs):
+        raise AssertionError("未指定 --download 时不应联网")
+
+    monkeypatch.setattr("scripts.downloader.download_file", fail)
+    output = tmp_path / "sample.csv"
+    crawler.main(["--output", str(output), "--max-records", "0"])
+    assert output.read_text(encoding="utf-8").strip() == "pmid,title,abstract"
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+import numpy as np
+
+from aitools.embedding import EmbeddingStore, embed_records
+
+
+def fake_encode(texts):
+    """确定性的伪编码：向量由文本哈希决定，便于断言"""
+    return np.stack([np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest()[:16], dtype=np.uint8)
+                     .astype(np.float32) for t in texts])
+
+
+def no_encode(texts):
+    raise AssertionError(f"不应重新编码: {texts}")
+
+
+def record(pmid, title, abstract):
+    return {"pmid": str(pmid), "title": title, "abstract": abstract}
+
+
+def test_unchanged_records_are_not_reencoded(tmp_path):
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return fake_encode(texts)
+
+    with EmbeddingStore(tmp_path, "fake", 16) as store:
+        stats = embed_records([record(1, "A", "aaa"), record(2, "B", "bbb")], store, encode)
+        assert stats["encoded"] == 2
+        stats = embed_records([record(1, "A", "aaa"), record(2, "B", "bbb")], store, encode)
+        assert stats["unchanged"] == 2 and stats["encoded"] == 0
+    assert len(calls) == 1
+
+
+def test_same_text_is_copied_instead_of_encoded(tmp_path):
+    with EmbeddingStore(tmp_path, "fake", 16) as store:
+        embed_records([record(1, "A", "aaa")], store, fake_encode)
+        stats = embed_records([record(2, "A", "aaa")], store, no_encode)
+        assert stats["copied"] == 1
+        np.testing.assert_array_equal(store.vectors[store.row_of(2)], fake_encode(["A\naaa"])[0])
+
+
+def test_copy_source_changed_in_same_batch(tmp_path):
+    """复制源所属 PMID 在同一批中内容变化时，复制的仍是旧文本的向量"""
+    with EmbeddingStore(tmp_path, "fake", 16) as store:
+        embed_records([record(1, "X", "aaa")], store, fake_encode)
+        stats = embed_records([record(1, "Y", "bbb"), record(2, "X", "aaa")], store, fake_encode)
+        assert stats["encoded"] == 1 and stats["copied"] == 1
+        np.testing.assert_array_equal(store.vectors[store.row_of(1)], fake_encode(["Y\nbbb"])[0])
+        np.testing.assert_array_equal(store.vectors[store.row_of(2)], fake_encode(["X\naaa"])[0])
+
+        # PMID 2 缓存在 "X\naaa" 的哈希下，后续批次复制到的也必须是 X 的向量
+        embed_records([record(3, "X", "aaa")], store, no_encode)
+        np.testing.assert_array_equal(store.vectors[store.row_of(3)], fake_encode(["X\naaa"])[0])
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+import pytest
+
+from aitools.keyword_index import KeywordIndex, build_shard, tokenize
+
+
+def add(index, name, records):
+    meta = build_shard(records, index.dir / "shards" / name)
+    index.add_shard(name, meta)
+
+
+def doc(pmid, text):
+    return {"pmid": str(pmid), "title": text, "abstract": ""}
+
+
+def test_newer_file_overrides_older(tmp_path):
+    index = KeywordIndex(tmp_path)
+    add(index, "medline19n0001.xml.gz", [doc(1, "aspirin"), doc(2, "heparin")])
+    add(index, "medline19n0002.xml.gz", [doc(1, "warfarin")])
+
+    assert index.search("aspirin") == []
+    assert [pmid for pmid, _ in index.search("warfarin")] == ["1"]
+    assert [pmid for pmid, _ in index.search("heparin")] == ["2"]
+
+
+def test_rebuilt_older_shard_does_not_override_newer(tmp_path):
+    """--force 重建较旧的文件后，较新的文件中的修订仍然有效"""
+    index = KeywordIndex(tmp_path)
+    add(index, "medline19n0001.xml.gz", [doc(1, "aspirin"), doc(2, "heparin")])
+    add(index, "medline19n0002.xml.gz", [doc(1, "warfarin")])
+    add(index, "medline19n0001.xml.gz", [doc(1, "aspirin"), doc(2, "heparin")])
+
+    assert [s["name"] for s in index.manifest["shards"]] == ["medline19n0001.xml.gz", "medline19n0002.xml.gz"]
+    assert index.search("aspirin") == []
+    assert [pmid for pmid, _ in index.search("warfarin")] == ["1"]
+
+    # 重新打开（alive.npy 已落盘）结果一致
+    reopened = KeywordIndex(tmp_path)
+    assert reopened.search("aspirin") == []
+    assert [pmid for pmid, _ in reopened.search("warfarin")] == ["1"]
+
+
+def test_rebuilt_newer_shard_revives_dropped_pmids(tmp_path):
+    index = KeywordIndex(tmp_path)
+    add(index, "medline19n0001.xml.gz", [doc(1, "aspirin"), doc(2, "heparin")])
+    add(index, "medline19n0002.xml.gz", [doc(1, "warfarin")])
+    add(index, "medline19n0002.xml.gz", [doc(3, "statin")])  # 新版本不再包含 PMID 1
+
+    assert [pmid for pmid, _ in index.search("aspirin")] == ["1"]
+    assert index.search("warfarin") == []
+
+
+def reference_bm25(docs, query, k1=1.2, b=0.75):
+    """逐篇文档直接按公式计算的 BM25，作为对照"""
+    tokenized = {pmid: tokenize(text) for pmid, text in docs.items()}
+    n = len(docs)
+    avgdl = sum(len(t) for t in tokenized.values()) / n
+    scores = {}
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(term in t for t in tokenized.values())
+        idf = math.log1p((n - df + 0.5) / (df + 0.5))
+        for pmid, tokens in tokenized.items():
+            tf = tokens.count(term)
+            if tf:
+                norm = k1 * (1 - b + b * len(tokens) / avgdl)
+                scores[pmid] = scores.get(pmid, 0.0) + idf * (k1 + 1) * tf / (tf + norm)
+    return scores
+
+
+def test_bm25_scores_match_reference(tmp_path):
+    docs = {"1": "aspirin reduces pain in adults", "2": "aspirin aspirin and heparin for thrombosis",
+            "3": "heparin dosing in renal failure patients with thrombosis", "4": "metformin for diabetes",
+            "5": "low dose aspirin 100 mg daily for prevention of thrombosis in elderly adults"}
+    index = KeywordIndex(tmp_path)
+    # 分两个分片：全局 df / 平均长度跨分片统计
+    add(index, "a.csv", [doc(p, t) for p, t in list(docs.items())[:2]])
+    add(index, "b.csv", [doc(p, t) for p, t in list(docs.items())[2:]])
+
+    for query in ("aspirin thrombosis", "heparin", "adults pain aspirin", "100 mg aspirin"):
+        expected = reference_bm25(docs, query)
+        hits = index.search(query, top_k=10)
+        assert [pmid for pmid, _ in hits] == sorted(expected, key=lambda p: -expected[p])
+        for pmid, score in hits:
+            assert score == pytest.approx(expected[pmid], rel=1e-5)
+
+
+def test_tokenize_keeps_decimals_and_doses():
+    assert tokenize("p < 0.05, 1.5-fold, 0,5 mg") == ["p", "0.05", "1.5", "fold", "0.5mg"]
+    assert tokenize("β-blocker 500 MG") == ["beta", "blocker", "betablocker", "500mg"]
+
+
+def write_csv(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("pmid,title,abstract\n" + "".join(f"{p},{t},\n" for p, t in rows), encoding="utf-8")
+    return path
+
+
+def test_add_files_skips_built_files_and_keys_on_full_path(tmp_path, capsys):
+    index = KeywordIndex(tmp_path / "index")
+    first = write_csv(tmp_path / "a" / "part.csv", [(1, "aspirin"), (2, "heparin")])
+    other = write_csv(tmp_path / "b" / "part.csv", [(3, "statin")])  # 同名文件，不同目录
+
+    assert index.add_files([first], workers=1) == 2
+    assert index.add_files([first], workers=1) == 0
+    assert "跳过" in capsys.readouterr().out
+    assert index.add_files([first, other], workers=1) == 1
+    assert len(index.manifest["shards"]) == 2
+    assert [p for p, _ in index.search("heparin")] == ["2"] and [p for p, _ in index.search("statin")] == ["3"]
+
+    write_csv(first, [(1, "aspirin"), (2, "warfarin")])
+    assert index.add_files([first], workers=1) == 0  # 未指定 --force 时不重建
+    assert index.add_files([first], workers=1, force=True) == 2
+    reopened = KeywordIndex(tmp_path / "index")
+    assert reopened.search("heparin") == [] and [p for p, _ in reopened.search("warfarin")] == ["2"]
+    assert len(reopened.manifest["shards"]) == 2
+
+
+def article(pmid, title):
+    return (f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article><ArticleTitle>{title}</ArticleTitle>"
+            f"</Article></MedlineCitation></PubmedArticle>")
+
+
+def test_delete_citations_are_tombstones(tmp_path):
+    baseline = tmp_path / "medline19n0001.xml"
+    baseline.write_text(f"<PubmedArticleSet>{article(1, 'aspirin')}{article(2, 'heparin')}"
+                        f"{article(3, 'statin')}</PubmedArticleSet>", encoding="utf-8")
+    update = tmp_path / "medline19n0002.xml"
+    # 2 被删除；3 先删除后重新收录；4 先收录后删除
+    update.write_text(f"<PubmedArticleSet>{article(4, 'insulin')}<DeleteCitation><PMID>2</PMID><PMID>3</PMID>"
+                      f"<PMID>4</PMID></DeleteCitation>{article(3, 'rosuvastatin')}</PubmedArticleSet>",
+                      encoding="utf-8")
+    index = KeywordIndex(tmp_path / "index")
+    index.add_files([update, baseline], workers=1)
+
+    assert [p for p, _ in index.search("aspirin")] == ["1"]
+    assert index.search("heparin") == []
+    assert index.search("statin") == [] and [p for p, _ in index.search("rosuvastatin")] == ["3"]
+    assert index.search("insulin") == []
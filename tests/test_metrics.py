@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from scripts.metrics import compare, run_metrics
+
+
+def test_metrics_file_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with run_metrics("job", quiet=True) as metrics, metrics.stage("parse", records=3):
+        pass
+    assert list(tmp_path.iterdir()) == []  # 默认不写任何文件
+
+    output = tmp_path / "out" / "job.json"
+    with run_metrics("job", str(output), quiet=True) as metrics, metrics.stage("parse", records=3):
+        pass
+    summary = json.loads(output.read_text(encoding="utf-8"))
+    assert summary["stages"]["parse"]["records"] == 3 and summary["stages"]["parse"]["calls"] == 1
+
+
+def test_profile_written_next_to_metrics(tmp_path):
+    output = tmp_path / "job.json"
+    with run_metrics("job", str(output), profile="cprofile", quiet=True):
+        sum(range(1000))
+    assert (tmp_path / "job.prof").exists()
+
+
+def test_compare_ignores_short_stages():
+    baseline = {"wall_seconds": 10.0, "stages": {"parse": {"seconds": 8.0}, "write": {"seconds": 0.1}}}
+    current = {"wall_seconds": 10.5, "stages": {"parse": {"seconds": 9.5}, "write": {"seconds": 0.5}}}
+    assert [r["stage"] for r in compare(baseline, current)] == ["parse"]
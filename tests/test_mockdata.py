@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import json
+
+from scripts import mockdata
+
+
+def count_articles(paths):
+    total = 0
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            total += f.read().count("<PubmedArticle>")
+    return total
+
+
+def test_target_size_records_articles_written(tmp_path):
+    output = tmp_path / "corpus"
+    metrics = tmp_path / "mockdata.json"
+    mockdata.main(["--target-size", "200KB", "--shard-size", "50", "--workers", "2",
+                   "--output-dir", str(output), "--metrics", str(metrics)])
+
+    shards = sorted(output.glob("*.xml.gz"))
+    written = count_articles(shards)
+    assert written > 50 and len(shards) == -(-written // 50)
+    assert json.loads(metrics.read_text(encoding="utf-8"))["stages"]["generate"]["records"] == written
+
+
+def test_generate_corpus_is_reproducible(tmp_path):
+    first, stats = mockdata.generate_corpus(str(tmp_path / "a"), num_articles=30, articles_per_shard=20, workers=1)
+    second, _ = mockdata.generate_corpus(str(tmp_path / "b"), num_articles=30, articles_per_shard=20, workers=2)
+    assert stats["articles"] == count_articles(first) == 30
+    assert [p.read_bytes() for p in first] == [p.read_bytes() for p in second]
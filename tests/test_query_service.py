@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import numpy as np
+import pytest
+
+from aitools.query_service import MicroBatcher, QueryService, make_handler, reciprocal_rank_fusion
+
+
+class FakeKeywordIndex:
+    def search(self, query, top_k):
+        return [("101", 2.0), ("102", 1.0)][:top_k]
+
+
+class FakeVectorIndex:
+    """固定的稠密排名，与 BM25 的排名不同"""
+
+    def query(self, vector, top_k):
+        return {"matches": [{"id": i, "score": 1.0} for i in ["102", "103", "101"][:top_k]]}
+
+
+class CountingEncoder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def service():
+    return QueryService(keyword_index=FakeKeywordIndex())
+
+
+def test_unknown_mode_raises(service):
+    assert [r["id"] for r in service.search("aspirin", mode="lexical")] == ["101", "102"]
+    with pytest.raises(ValueError):
+        service.search("aspirin", mode="sparse")
+
+
+def test_http_bad_request(service):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with urlopen(f"{base}/search?q=aspirin&mode=lexical") as response:
+            assert [r["id"] for r in json.load(response)["results"]] == ["101", "102"]
+        for query in ("q=aspirin&mode=sparse", "q=aspirin&k=ten"):
+            with pytest.raises(HTTPError) as error:
+                urlopen(f"{base}/search?{query}")
+            assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_reciprocal_rank_fusion_order():
+    fused = reciprocal_rank_fusion({"dense": ["a", "b", "c"], "lexical": ["b", "d"]}, k=60)
+    assert [doc_id for doc_id, _, _ in fused] == ["b", "a", "d", "c"]
+    scores = {doc_id: score for doc_id, score, _ in fused}
+    assert scores["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0][2] == {"dense": 2, "lexical": 1}
+
+
+def test_hybrid_search_fuses_both_rankings():
+    service = QueryService(CountingEncoder(), FakeVectorIndex(), FakeKeywordIndex(), dense_budget_ms=None)
+    results = service.search("aspirin")
+    # 101: 稠密第3 + 词法第1；102: 稠密第1 + 词法第2；103: 只在稠密第2
+    assert [r["id"] for r in results] == ["102", "101", "103"]
+    assert results[0]["ranks"] == {"dense": 1, "lexical": 2}
+
+
+def test_embed_and_result_caches():
+    encoder = CountingEncoder()
+    service = QueryService(encoder, FakeVectorIndex(), FakeKeywordIndex(), dense_budget_ms=None)
+    first = service.search("aspirin", top_k=2)
+    assert service.search("aspirin", top_k=2) == first  # 结果缓存命中，不再编码
+    assert service.result_cache.hits == 1
+    service.search("aspirin", top_k=3)  # 结果未命中，但查询向量命中
+    assert encoder.calls == [["aspirin"]]
+    assert service.embed_cache.hits == 1
+
+    first[0]["id"] = "mutated"
+    first[0]["ranks"]["dense"] = 99
+    cached = service.search("aspirin", top_k=2)
+    assert cached[0]["id"] == "102" and cached[0]["ranks"]["dense"] == 1  # 修改返回值不会污染缓存
+
+
+def test_micro_batcher_coalesces_concurrent_queries():
+    encoder = CountingEncoder()
+    batcher = MicroBatcher(encoder, window_ms=100, max_batch=64)
+    futures = [batcher.submit(f"q{i}") for i in range(20)]
+    vectors = [f.result(timeout=5) for f in futures]
+    assert len(vectors) == 20 and all(v.shape == (4,) for v in vectors)
+    assert sum(len(call) for call in encoder.calls) == 20
+    assert len(encoder.calls) < 20 and batcher.batches == len(encoder.calls)
+
+    batcher = MicroBatcher(CountingEncoder(), window_ms=100, max_batch=8)  # 凑满 max_batch 即发车
+    for f in [batcher.submit(f"q{i}") for i in range(20)]:
+        f.result(timeout=5)
+    assert max(len(call) for call in batcher.encode.calls) <= 8
+
+
+def test_dense_over_budget_falls_back_to_lexical():
+    service = QueryService(CountingEncoder(delay=0.5), FakeVectorIndex(), FakeKeywordIndex(), dense_budget_ms=50)
+    start = time.perf_counter()
+    results = service.search("aspirin")
+    assert time.perf_counter() - start < 0.4
+    assert [r["id"] for r in results] == ["101", "102"]
+    assert all(set(r["ranks"]) == {"lexical"} for r in results)
+    assert service.metrics()["dense_fallbacks"] == 1
+    assert service.result_cache.get(("aspirin", 10, "hybrid")) is None  # 退化结果不缓存
+
+    service = QueryService(CountingEncoder(delay=0.2), FakeVectorIndex(), None, dense_budget_ms=50)
+    assert [r["id"] for r in service.search("aspirin", mode="dense")] == ["102", "103", "101"]  # 无可退化时等待
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from scripts import parse_pubmed
+from scripts.crawler import iter_medline_records, parse_medline_xml
+from scripts.recordstore import RecordStore
+
+SAMPLE = Path(__file__).resolve().parent.parent / "data" / "medline19n0001.xml.gz"
+
+
+def test_pmids_are_kept_verbatim():
+    store = RecordStore.from_records([{"pmid": "00123", "title": "a"}, {"pmid": "N/A", "title": "b"},
+                                      ["PMC42", "c"]], ["pmid", "title"])
+    assert [row["pmid"] for row in store] == ["00123", "N/A", "PMC42"]
+    assert store[1].to_dict() == {"pmid": "N/A", "title": "b"}
+    assert list(store[-1]) == ["PMC42", "c"]
+
+
+def test_to_pandas_keeps_string_pmids():
+    frame = RecordStore.from_records([{"pmid": "00123", "title": "a"}, {"pmid": "N/A", "title": ""}],
+                                     ["pmid", "title"]).to_pandas()
+    assert frame["pmid"].tolist() == ["00123", "N/A"]
+    assert frame["title"].tolist() == ["a", ""]
+
+
+def test_to_arrow_shares_buffers_and_needs_no_numpy():
+    pa = pytest.importorskip("pyarrow")
+    store = RecordStore.from_records([["00123", "α"], ["N/A", ""]], ["pmid", "title"])
+    table = store.to_arrow()
+    assert table.schema.types == [pa.large_string(), pa.large_string()]
+    assert table.column("pmid").to_pylist() == ["00123", "N/A"]
+    with pytest.raises(BufferError):  # 缓冲区被 Arrow 引用（未复制）时不能再追加
+        store.append_row(["7", "b"])
+
+    src = str(Path(__file__).resolve().parent.parent / "src")
+    code = "import sys; import scripts.recordstore; print('numpy' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=src, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+@pytest.mark.skipif(not SAMPLE.exists(), reason="缺少样例 MEDLINE 文件")
+def test_parse_medline_xml_matches_records():
+    records = list(iter_medline_records(SAMPLE, 20))
+    frame = parse_medline_xml(SAMPLE, 20)
+    assert frame["pmid"].tolist() == [r["pmid"] for r in records]
+    assert all(isinstance(pmid, str) for pmid in frame["pmid"])
+    assert frame["title"].tolist() == [r["title"] for r in records]
+
+
+@pytest.mark.skipif(not SAMPLE.exists(), reason="缺少样例 MEDLINE 文件")
+def test_parse_pubmed_helpers(tmp_path):
+    rows = parse_pubmed.parse_xml_file_with_bs4(SAMPLE)
+    assert isinstance(rows, list) and all(isinstance(row, list) and len(row) == 5 for row in rows)
+
+    store = parse_pubmed.load_xml_file_with_bs4(SAMPLE)
+    assert [list(view) for view in store] == rows
+
+    # 两种容器写出的 CSV 完全相同
+    parse_pubmed.write_to_csv(rows, tmp_path / "rows.csv")
+    parse_pubmed.write_to_csv(store, tmp_path / "store.csv")
+    assert (tmp_path / "rows.csv").read_bytes() == (tmp_path / "store.csv").read_bytes()
+    with open(tmp_path / "rows.csv", encoding="utf-8") as f:
+        assert next(csv.reader(f)) == parse_pubmed.COLUMNS
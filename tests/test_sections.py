@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from scripts.sections import UNASSIGNED, split_sections, split_sections_series
+
+ABSTRACTS = [
+    "[BACKGROUND] Aspirin is common. [METHODS] We enrolled 40 patients. [RESULTS] Pain fell.",
+    "[Background] Tracer uptake.\n[Materials and Methods] [3H]-labelled ligand was used [n=3].\n[CONCLUSION] It binds.",
+    "Plain abstract without labels, 95% confidence interval [CI] 1.2-3.4.",
+    "Lead text.\n[OBJECTIVE] Assess X.\n[RESULTS] First part.\n[RESULTS] Second part.",
+    "",
+    None,
+]
+
+
+def test_inline_labels_split_each_section():
+    assert split_sections(ABSTRACTS[0]) == {
+        "BACKGROUND": "Aspirin is common.", "METHODS": "We enrolled 40 patients.", "RESULTS": "Pain fell."}
+
+
+def test_bracketed_body_text_is_not_a_label():
+    sections = split_sections(ABSTRACTS[1])
+    assert sections["METHODS"] == "[3H]-labelled ligand was used [n=3]."
+    assert sections["CONCLUSIONS"] == "It binds."
+    assert split_sections(ABSTRACTS[2]) == {UNASSIGNED: ABSTRACTS[2]}
+
+
+def test_repeated_labels_and_leading_text():
+    assert split_sections(ABSTRACTS[3]) == {
+        UNASSIGNED: "Lead text.", "OBJECTIVE": "Assess X.", "RESULTS": "First part.\nSecond part."}
+    assert split_sections("") == {} and split_sections(None) == {}
+
+
+def test_series_matches_per_record_split():
+    series = pd.Series(ABSTRACTS, index=[10, 11, 12, 13, 14, 15])
+    frame = split_sections_series(series)
+    assert list(frame.index) == list(series.index)
+    for index, abstract in zip(series.index, ABSTRACTS):
+        row = {label: text for label, text in frame.loc[index].items() if text}
+        assert row == split_sections(abstract)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import numpy as np
+import pytest
+import requests
+
+from aitools import upsert
+from aitools.embedding import EmbeddingStore, embed_records
+from aitools.upsert import UPSERT_CONFIG, MockVectorService, TransientError, bulk_upsert, is_transient
+from aitools.vectorstore import LocalIndex
+
+DIM = 8
+
+
+def make_vectors(n, produced=None):
+    for i in range(n):
+        if produced is not None:
+            produced.append(i)
+        yield {"id": str(i), "values": [float(i)] * DIM}
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setitem(UPSERT_CONFIG, "BACKOFF_BASE", 0.001)
+
+
+class CountingService(MockVectorService):
+    """记录同时在途的请求数，以及每次请求开始时上游已产出的向量数"""
+
+    def __init__(self, *args, in_flight, produced, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = in_flight
+        self.produced = produced
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.backlog = []
+
+    def upsert(self, vectors, **kwargs):
+        with self.in_flight:
+            with self.lock:
+                self.backlog.append(len(self.produced) - self.completed)
+            try:
+                return super().upsert(vectors, **kwargs)
+            finally:
+                with self.lock:
+                    self.completed += len(vectors)
+
+
+def test_in_flight_batches_are_bounded(in_flight):
+    produced = []
+    service = CountingService(LocalIndex(DIM), latency=0.02, in_flight=in_flight, produced=produced)
+    stats = bulk_upsert(service, make_vectors(500, produced), batch_size=10, concurrency=3, progress=False)
+
+    assert stats["vectors"] == 500 and stats["batches"] == 50
+    assert service.index.count == 500
+    assert 1 < in_flight.peak <= 3 and in_flight.requests == 50
+    # 背压：上游最多领先已完成部分 concurrency 个在途批次 + 1 个正在攒的批次（外加切批时多读的 1 条）
+    assert max(service.backlog) <= (3 + 1) * 10 + 1
+
+
+def test_transient_failures_are_retried():
+    service = MockVectorService(LocalIndex(DIM), latency=0.0, failure_rate=0.3, seed=7)
+    stats = bulk_upsert(service, make_vectors(400), batch_size=20, concurrency=4, max_retries=10, progress=False)
+
+    assert stats["retries"] > 0
+    assert stats["failed_batches"] == 0
+    assert service.index.count == 400
+    assert service.requests == stats["batches"] + stats["retries"]
+
+
+class FlakyHttpIndex:
+    """模拟基于 requests 的客户端：前几次调用抛出网络异常"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.upserted = []
+
+    def upsert(self, vectors):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.upserted.extend(vectors)
+
+
+def test_requests_network_errors_are_retried():
+    errors = [requests.ConnectionError("reset"), requests.ReadTimeout("slow"),
+              requests.exceptions.ChunkedEncodingError("truncated")]
+    index = FlakyHttpIndex(errors)
+    stats = bulk_upsert(index, make_vectors(5), batch_size=5, concurrency=1, progress=False)
+
+    assert stats["retries"] == 3 and stats["failed_batches"] == 0
+    assert len(index.upserted) == 5
+
+
+def test_permanent_errors_fail_without_retry():
+    index = FlakyHttpIndex([ValueError("bad vector")])
+    stats = bulk_upsert(index, make_vectors(5), batch_size=5, concurrency=1, progress=False)
+
+    assert stats["retries"] == 0 and stats["failed_batches"] == 1
+    assert stats["failed_ids"] == [str(i) for i in range(5)]
+
+
+def test_is_transient():
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.HTTPError(response=response)
+
+    assert is_transient(TransientError("503"))
+    assert is_transient(requests.ConnectTimeout())
+    assert is_transient(http_error(429)) and is_transient(http_error(503))
+    assert not is_transient(http_error(400))
+    assert not is_transient(requests.exceptions.InvalidURL())
+    assert not is_transient(KeyError("id"))
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    def encode(texts):
+        return np.stack([np.eye(DIM, dtype=np.float32)[len(t) % DIM] for t in texts])
+
+    records = [{"pmid": str(p), "title": f"Title {p}", "abstract": "x" * p} for p in (1, 2, 3)]
+    with EmbeddingStore(tmp_path / "store", "fake", DIM) as store:
+        embed_records(records, store, encode)
+        store.delete(2)
+    (tmp_path / "dataset.csv").write_text("pmid,title,abstract\n1,Aspirin,\n3,Heparin,\n", encoding="utf-8")
+    return tmp_path
+
+
+def test_local_target_indexes_the_store_in_place(store_dir):
+    output = store_dir / "index"
+    upsert.main(["--store", str(store_dir / "store"), "--target", "local", "--output", str(output),
+                 "--dataset", str(store_dir / "dataset.csv")])
+    assert not (output / "vectors.npy").exists()  # 只记录 vectors.bin 的路径，不复制矩阵
+
+    index = LocalIndex.load(str(output))
+    assert index.count == 3 and index._alive.tolist() == [True, False, True]
+    with EmbeddingStore(store_dir / "store") as store:
+        match = index.query(store.vectors[store.row_of(3)], top_k=1, include_metadata=True)["matches"][0]
+    assert match["id"] == "3" and match["metadata"] == {"title": "Heparin"}
+
+
+def test_failed_batches_exit_non_zero(store_dir):
+    with pytest.raises(SystemExit) as exit_info:
+        upsert.main(["--store", str(store_dir / "store"), "--target", "mock", "--failure-rate", "1",
+                     "--max-retries", "0"])
+    assert exit_info.value.code == 1
+    upsert.main(["--store", str(store_dir / "store"), "--target", "mock"])  # 全部成功时正常返回
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import numpy as np
+
+from aitools.vectorstore import LocalIndex
+
+
+def clustered_vectors(count=3000, dim=32, clusters=40, seed=0):
+    """带簇结构的随机向量（IVF 在真实嵌入上面对的也是这种分布）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.3 * rng.normal(size=(count, dim))
+    return vectors.astype(np.float32)
+
+
+def items(vectors, start=0, metadata=False):
+    return [{"id": str(start + i), "values": v.tolist(), **({"metadata": {"n": start + i}} if metadata else {})}
+            for i, v in enumerate(vectors)]
+
+
+def test_ivf_recall_against_exact_search():
+    vectors = clustered_vectors()
+    index = LocalIndex(vectors.shape[1])
+    index.upsert(items(vectors))
+    index.build(seed=1)
+
+    queries = clustered_vectors(50, seed=2)
+    recall = []
+    for q in queries:
+        exact = set(index.search(q, 10, exact=True)[0].tolist())
+        approx = set(index.search(q, 10, nprobe=16)[0].tolist())
+        recall.append(len(exact & approx) / 10)
+    assert np.mean(recall) >= 0.9
+    # 探查全部桶时与暴力搜索完全一致
+    full = len(index._ivf[0])
+    for q in queries[:5]:
+        np.testing.assert_array_equal(index.search(q, 10, nprobe=full)[0], index.search(q, 10, exact=True)[0])
+
+
+def test_save_load_round_trip(tmp_path):
+    vectors = clustered_vectors(500)
+    index = LocalIndex(vectors.shape[1])
+    index.upsert(items(vectors, metadata=True))
+    index.build(seed=0)
+    index.save(tmp_path / "index")
+
+    loaded = LocalIndex.load(tmp_path / "index")
+    assert (loaded.dim, loaded.metric, loaded.count) == (index.dim, index.metric, index.count)
+    for q in clustered_vectors(10, seed=3):
+        assert loaded.query(q, 5, include_metadata=True) == index.query(q, 5, include_metadata=True)
+    match = loaded.query(vectors[7], 1, include_metadata=True)["matches"][0]
+    assert match["id"] == "7" and match["metadata"] == {"n": 7}
+
+
+def test_upsert_overwrite_and_delete():
+    vectors = clustered_vectors(200)
+    index = LocalIndex(vectors.shape[1])
+    index.upsert(items(vectors))
+    index.build(seed=0)
+
+    # 覆盖：同一批内重复的 id 以最后一条为准，旧向量不再命中
+    target = vectors[100]
+    index.upsert([{"id": "5", "values": (-target).tolist()}, {"id": "5", "values": target.tolist()}])
+    ids = [m["id"] for m in index.query(target, 3)["matches"]]
+    assert set(ids[:2]) == {"100", "5"}
+    assert index.query(vectors[5], 1)["matches"][0]["id"] != "5"  # 旧向量已失效
+
+    index.delete(["100", "5"])
+    ids = [m["id"] for m in index.query(target, 10)["matches"]]
+    assert "100" not in ids and "5" not in ids
+
+    index.build(seed=0)  # 合并增量区后结果不变
+    assert index.count == 198
+    ids = [m["id"] for m in index.query(target, 10)["matches"]]
+    assert "100" not in ids and "5" not in ids
+
+
+def test_search_during_concurrent_upserts_keeps_every_block():
+    dim = 16
+    vectors = clustered_vectors(2000, dim)
+    index = LocalIndex(dim)
+    stop = threading.Event()
+    errors = []
+
+    def searcher():
+        while not stop.is_set():
+            try:
+                index.search(vectors[0], 5)
+            except Exception as exc:  # 行数不一致时会抛 IndexError
+                errors.append(exc)
+
+    def writer(part):
+        for start in range(part * 500, (part + 1) * 500, 10):
+            index.upsert(items(vectors[start:start + 10], start))
+
+    threads = [threading.Thread(target=searcher) for _ in range(2)]
+    for t in threads:
+        t.start()
+    writers = [threading.Thread(target=writer, args=(p,)) for p in range(4)]
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert index.count == 2000
+    assert len(index._extra_matrix()) == 2000  # 没有被并发合并丢掉的块
+    for i in (0, 777, 1999):
+        assert index.query(vectors[i], 1)["matches"][0]["id"] == str(i)